@@ -1,32 +1,56 @@
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
-import torch
-
-# Puedes cambiar este modelo por otro compatible con Transformers
-MODEL_NAME = "mistralai/Mistral-7B-Instruct-v0.1"
-
-# Carga del modelo solo una vez
-print("🧠 Cargando modelo local desde Hugging Face...")
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-model = AutoModelForCausalLM.from_pretrained(
-    MODEL_NAME,
-    torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
-    device_map="auto"
-)
-llm_pipeline = pipeline(
-    "text-generation",
-    model=model,
-    tokenizer=tokenizer,
-    device=0 if torch.cuda.is_available() else -1
-)
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.llm.backends import LLMBackend, create_llm_backend
+
+# Backend por defecto (LLM_BACKEND en config: transformers, ollama o fake).
+# Carga diferida: el backend se crea en el primer uso y el modelo de
+# Transformers solo se carga en la primera generación
+_backend: Optional[LLMBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> LLMBackend:
+    """Backend LLM compartido (se crea en el primer uso, thread-safe)"""
+    global _backend
+
+    if _backend is not None:
+        return _backend
+
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_llm_backend()
+    return _backend
+
+
+def set_backend(backend: Optional[LLMBackend]):
+    """Reemplaza el backend por defecto (None vuelve a leer la configuración)"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def is_model_loaded() -> bool:
+    """True si el backend ya tiene el modelo en memoria"""
+    return _backend is not None and _backend.is_loaded()
+
 
 def generate_response(prompt: str, max_tokens: int = 1024, temperature: float = 0.1, top_p: float = 0.9) -> str:
-    print("🤖 Generando respuesta LLM...")
-    response = llm_pipeline(
-        prompt,
-        max_new_tokens=max_tokens,
-        do_sample=True,
-        temperature=temperature,
-        top_p=top_p,
-        pad_token_id=tokenizer.eos_token_id
-    )
-    return response[0]['generated_text']
\ No newline at end of file
+    return get_backend().generate(prompt, max_tokens=max_tokens, temperature=temperature, top_p=top_p)
+
+
+def generate_batch(prompts: List[str], max_tokens: int = 1024, temperature: float = 0.1, top_p: float = 0.9) -> List[Dict[str, Any]]:
+    """
+    Genera varias respuestas en una sola llamada al backend
+
+    Returns:
+        Lista (mismo orden que prompts) de {'text': generated_text, 'new_tokens': int}
+    """
+    return get_backend().generate_batch(prompts, max_tokens=max_tokens, temperature=temperature, top_p=top_p)
+
+
+def stream_response(prompt: str, max_tokens: int = 1024, temperature: float = 0.1, top_p: float = 0.9,
+                    stop_event: Optional[threading.Event] = None) -> Iterator[str]:
+    """Genera en streaming: produce fragmentos de texto nuevo a medida que salen"""
+    return get_backend().stream(prompt, max_tokens=max_tokens, temperature=temperature, top_p=top_p,
+                                stop_event=stop_event)
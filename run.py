@@ -34,10 +34,9 @@ def main():
         print("✅ Dependencias OK")
         
         print("\n📁 Verificando estructura...")
-        data_dir = Path("data/documentos")
-        if not data_dir.exists():
-            print(f"⚠️  Creando directorio: {data_dir}")
-            data_dir.mkdir(parents=True)
+        from src.utils import config
+        config.ensure_directories()
+        config.print_config()
         print("✅ Estructura OK")
         
         print("\n🎯 SISTEMA LISTO PARA USAR")
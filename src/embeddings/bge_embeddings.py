@@ -6,18 +6,33 @@ Maneja embeddings locales gratuitos con alta calidad
 from FlagEmbedding import BGEM3FlagModel
 import numpy as np
 import torch
-from typing import List, Union, Optional
+from typing import Dict, List, Union, Optional
 import os
 from pathlib import Path
 
+from src.embeddings.embedding_cache import EmbeddingCache, QueryEmbeddingCache
+from src.utils.micro_batcher import MicroBatcher
+
 class BGEEmbeddings:
-    def __init__(self, model_name: str = "BAAI/bge-m3", device: Optional[str] = None):
+    def __init__(self, 
+                 model_name: str = "BAAI/bge-m3", 
+                 device: Optional[str] = None,
+                 cache_dir: Optional[str] = None,
+                 cache_dtype: str = "float32",
+                 max_length: int = 1024,
+                 query_cache_size: int = 1024,
+                 query_cache_ttl: Optional[float] = 3600.0):
         """
         Inicializa BGE-M3 para embeddings de alta calidad
         
         Args:
             model_name: Modelo BGE a usar (default: bge-m3)
             device: 'cuda', 'cpu' o None (auto-detect)
+            cache_dir: Directorio de la caché persistente de embeddings (None = sin caché)
+            cache_dtype: 'float32' o 'float16' para los vectores en caché
+            max_length: Longitud máxima de tokens por documento
+            query_cache_size: Máximo de consultas en la LRU en memoria (0 = desactivada)
+            query_cache_ttl: Segundos de vida de cada consulta en caché (None = sin expiración)
         """
         
         # Auto-detectar dispositivo si no se especifica
@@ -26,6 +41,8 @@ class BGEEmbeddings:
         
         self.device = device
         self.model_name = model_name
+        self.max_length = max_length
+        self._dimension: Optional[int] = None
         
         print(f"🔄 Inicializando BGE-M3...")
         print(f"   📋 Modelo: {model_name}")
@@ -55,6 +72,24 @@ class BGEEmbeddings:
             except Exception as e2:
                 print(f"❌ Error en fallback: {e2}")
                 raise Exception(f"No se pudo cargar BGE-M3: {e2}")
+        
+        # Caché persistente: solo se codifican chunks nuevos o modificados
+        self.cache = None
+        if cache_dir:
+            self.cache = EmbeddingCache(
+                cache_dir=cache_dir,
+                model_name=model_name,
+                max_length=max_length,
+                dimension=self.get_dimension(),
+                dtype=cache_dtype
+            )
+        
+        # LRU de consultas: preguntas repetidas no pasan por el modelo
+        self.query_cache = QueryEmbeddingCache(
+            max_size=query_cache_size,
+            ttl_seconds=query_cache_ttl
+        )
+        self.query_batcher = None
     
     def embed_documents(self, texts: List[str], batch_size: int = 4) -> np.ndarray:
         """
@@ -71,6 +106,33 @@ class BGEEmbeddings:
         if not texts:
             return np.array([])
         
+        if self.cache is None:
+            return self._encode_documents(texts, batch_size)[0]
+        
+        cached, missing = self.cache.lookup(texts)
+        print(f"💾 Caché de embeddings: {len(cached)} aciertos, {len(missing)} por calcular")
+        
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            new_embeddings, cacheable = self._encode_documents(missing_texts, batch_size)
+            
+            # Los vectores dummy del fallback secuencial no se persisten
+            if cacheable:
+                self.cache.store(missing_texts, new_embeddings)
+            
+            for i, embedding in zip(missing, new_embeddings):
+                cached[i] = embedding
+        
+        return np.vstack([cached[i] for i in range(len(texts))]).astype(np.float32)
+    
+    def _encode_documents(self, texts: List[str], batch_size: int):
+        """
+        Codifica documentos con BGE-M3
+        
+        Returns:
+            (embeddings densos, True si todos provienen del modelo)
+        """
+        
         print(f"🔄 Creando embeddings para {len(texts)} documentos...")
         
         try:
@@ -78,7 +140,7 @@ class BGEEmbeddings:
             embeddings = self.model.encode(
                 texts,
                 batch_size=batch_size,
-                max_length=1024,        # Reducido para compatibilidad
+                max_length=self.max_length,  # Reducido para compatibilidad
                 return_dense=True,      # Solo embeddings densos
                 return_sparse=False,    
                 return_colbert_vecs=False
@@ -88,12 +150,12 @@ class BGEEmbeddings:
             dense_embeddings = embeddings['dense_vecs']
             
             print(f"✅ Embeddings creados: {dense_embeddings.shape}")
-            return dense_embeddings
+            return dense_embeddings, True
             
         except Exception as e:
             print(f"❌ Error creando embeddings: {e}")
             print("🔄 Intentando procesamiento secuencial...")
-            return self._embed_documents_sequential(texts)
+            return self._embed_documents_sequential(texts), False
     
     def embed_query(self, query: str) -> np.ndarray:
         """
@@ -106,21 +168,144 @@ class BGEEmbeddings:
             numpy array con embedding de la consulta
         """
         
+        cached = self.query_cache.get(query)
+        if cached is not None:
+            return cached
+        
+        # Con micro-batching activo, consultas concurrentes comparten un encode
+        if self.query_batcher is not None:
+            return self.query_batcher.process(query)
+        
+        # Directo al modelo: embed_queries volvería a consultar la caché y contaría otro fallo
+        return self._encode_queries([query])[0]
+    
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Crea embeddings para varias consultas en una sola pasada del modelo
+        
+        Args:
+            queries: Consultas de usuario
+            
+        Returns:
+            numpy array (n_consultas, dimensión)
+        """
+        
+        if not queries:
+            return np.zeros((0, self.get_dimension()), dtype=np.float32)
+        
+        results = {}
+        pending = {}  # consulta normalizada -> posiciones
+        for i, query in enumerate(queries):
+            cached = self.query_cache.get(query)
+            if cached is not None:
+                results[i] = cached
+            else:
+                key = self.query_cache.normalize_query(query)
+                pending.setdefault(key, []).append(i)
+        
+        if pending:
+            to_encode = [queries[positions[0]] for positions in pending.values()]
+            dense_vecs = self._encode_queries(to_encode)
+            
+            for positions, query_embedding in zip(pending.values(), dense_vecs):
+                for i in positions:
+                    results[i] = query_embedding
+        
+        return np.vstack([results[i] for i in range(len(queries))]).astype(np.float32)
+    
+    def _encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Codifica consultas sin pasar por la caché y guarda el resultado en ella"""
+        
         try:
             # Usar encode simple para consultas
             embedding = self.model.encode(
-                [query],
+                queries,
+                batch_size=len(queries),
                 return_dense=True,
                 return_sparse=False,
                 return_colbert_vecs=False
             )
+            dense_vecs = embedding['dense_vecs']
             
-            return embedding['dense_vecs'][0]
+            for query, query_embedding in zip(queries, dense_vecs):
+                self.query_cache.put(query, query_embedding)
+            
+            return dense_vecs
             
         except Exception as e:
             print(f"❌ Error creando embedding de consulta: {e}")
             # Fallback: embedding dummy
-            return np.random.random(self.get_dimension()).astype(np.float32)
+            return np.random.random((len(queries), self.get_dimension())).astype(np.float32)
+    
+    def embed_lexical(self, texts: List[str], batch_size: int = 4) -> List[Dict[str, float]]:
+        """
+        Pesos léxicos (sparse) de BGE-M3 por texto, para el índice disperso
+        
+        Returns:
+            Lista de diccionarios token_id → peso
+        """
+        
+        if not texts:
+            return []
+        
+        output = self.model.encode(
+            texts,
+            batch_size=batch_size,
+            max_length=self.max_length,
+            return_dense=False,
+            return_sparse=True,
+            return_colbert_vecs=False
+        )
+        return [{str(token): float(weight) for token, weight in weights.items()}
+                for weights in output['lexical_weights']]
+    
+    def embed_colbert(self, texts: List[str], batch_size: int = 4) -> List[np.ndarray]:
+        """
+        Vectores ColBERT (uno por token) de BGE-M3, para el reranking multi-vector
+        
+        Returns:
+            Lista de arrays (tokens, dimensión) normalizados
+        """
+        
+        if not texts:
+            return []
+        
+        output = self.model.encode(
+            texts,
+            batch_size=batch_size,
+            max_length=self.max_length,
+            return_dense=False,
+            return_sparse=False,
+            return_colbert_vecs=True
+        )
+        return [np.asarray(vectors, dtype=np.float32) for vectors in output['colbert_vecs']]
+    
+    def enable_query_batching(self, max_batch_size: int = 16, max_wait_ms: float = 5.0):
+        """
+        Activa el micro-batching de consultas concurrentes
+        
+        Las llamadas a embed_query desde varios hilos que lleguen dentro de
+        max_wait_ms se codifican juntas en un único model.encode.
+        
+        Args:
+            max_batch_size: Máximo de consultas por lote
+            max_wait_ms: Ventana de espera desde la primera consulta del lote
+        """
+        
+        self.disable_query_batching()
+        self.query_batcher = MicroBatcher(
+            self._encode_queries,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            name="bge-query-batcher"
+        )
+        print(f"⚡ Micro-batching de consultas: lote {max_batch_size}, espera {max_wait_ms}ms")
+    
+    def disable_query_batching(self):
+        """Detiene el micro-batching y vuelve a codificar consulta por consulta"""
+        if self.query_batcher is not None:
+            self.query_batcher.close()
+            self.query_batcher = None
     
     def _embed_documents_sequential(self, texts: List[str]) -> np.ndarray:
         """Fallback: procesar documentos uno por uno"""
@@ -140,13 +325,27 @@ class BGEEmbeddings:
             except Exception as e:
                 print(f"   ⚠️  Error en documento {i}: {e}")
                 # Embedding dummy para mantener indexing
-                embeddings.append(np.random.random(1024).astype(np.float32))
+                embeddings.append(np.random.random(self.get_dimension()).astype(np.float32))
         
         return np.array(embeddings)
     
     def get_dimension(self) -> int:
-        """Retorna dimensión de los embeddings BGE-M3"""
-        return 1024  # BGE-M3 produce embeddings de 1024 dimensiones
+        """Dimensión de los embeddings densos, leída del modelo cargado (1024 en BGE-M3)"""
+        
+        if self._dimension is None:
+            config = getattr(getattr(getattr(self.model, 'model', None), 'model', None), 'config', None)
+            hidden_size = getattr(config, 'hidden_size', None)
+            if isinstance(hidden_size, int):
+                self._dimension = hidden_size
+            else:
+                # Sin config accesible: se codifica un texto de prueba una sola vez
+                try:
+                    probe = self.model.encode(["dimension"], return_dense=True, return_sparse=False,
+                                              return_colbert_vecs=False)['dense_vecs']
+                    self._dimension = int(np.asarray(probe).shape[-1])
+                except Exception:
+                    self._dimension = 1024
+        return self._dimension
     
     def calculate_similarity(self, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
         """Calcula similitud coseno entre dos embeddings"""
@@ -167,7 +366,10 @@ class BGEEmbeddings:
             'embedding_dimension': self.get_dimension(),
             'supports_batch': True,
             'multilingual': True,
-            'status': 'loaded'
+            'status': 'loaded',
+            'embedding_cache': self.cache.get_stats() if self.cache else None,
+            'query_cache': self.query_cache.get_stats(),
+            'query_batching': self.query_batcher.get_stats() if self.query_batcher else None
         }
 
 # Test básico del módulo
@@ -0,0 +1,296 @@
+"""
+Cachés de embeddings para BGE-M3
+- EmbeddingCache: persistente y direccionada por contenido para documentos
+- QueryEmbeddingCache: LRU en memoria con TTL para consultas repetidas
+"""
+
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+CACHE_KEY = re.compile(r'[0-9a-f]{64}')  # sha256 hex de text_key
+
+
+class EmbeddingCache:
+    def __init__(self,
+                 cache_dir: str,
+                 model_name: str,
+                 max_length: int,
+                 dimension: int,
+                 dtype: str = "float32"):
+        """
+        Caché en disco de embeddings densos
+
+        Cada (modelo, max_length, dimensión, dtype) vive en su propio
+        namespace con dos archivos append-only:
+            keys.txt    -> un hash de texto normalizado por línea
+            vectors.bin -> filas float32/float16 en el mismo orden (memmap)
+
+        Args:
+            cache_dir: Directorio raíz de la caché
+            model_name: Modelo que produjo los embeddings
+            max_length: Longitud máxima de tokens usada al codificar
+            dimension: Dimensión de los embeddings
+            dtype: 'float32' o 'float16' para almacenamiento
+        """
+
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"❌ dtype no soportado para caché: {dtype}")
+
+        self.model_name = model_name
+        self.max_length = max_length
+        self.dimension = dimension
+        self.dtype = np.dtype(dtype)
+
+        namespace = hashlib.sha256(
+            f"{model_name}|{max_length}|{dimension}|{dtype}".encode('utf-8')
+        ).hexdigest()[:16]
+        self.cache_path = Path(cache_dir) / namespace
+        self.cache_path.mkdir(parents=True, exist_ok=True)
+
+        self._keys_file = self.cache_path / "keys.txt"
+        self._vectors_file = self.cache_path / "vectors.bin"
+        self._row_bytes = self.dimension * self.dtype.itemsize
+
+        self._lock = threading.Lock()
+        self._index: Dict[str, int] = {}
+        self._rows = 0
+        self._vectors: Optional[np.memmap] = None
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'writes': 0
+        }
+
+        self._load()
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """Normaliza unicode y espacios para que textos equivalentes compartan clave"""
+        text = unicodedata.normalize('NFC', text)
+        return re.sub(r'\s+', ' ', text).strip()
+
+    @classmethod
+    def text_key(cls, text: str) -> str:
+        """Hash del texto normalizado"""
+        return hashlib.sha256(cls.normalize_text(text).encode('utf-8')).hexdigest()
+
+    def _load(self):
+        """Carga el índice de claves y mapea los vectores existentes"""
+
+        keys = []
+        torn_line = False
+        if self._keys_file.exists():
+            with open(self._keys_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+            keys = content.split('\n')
+            # Una última línea sin "\n" es una clave a medio escribir: el próximo append se pegaría a ella
+            torn_line = keys[-1] != ''
+            keys = keys[:-1]
+
+        stored_bytes = 0
+        if self._vectors_file.exists():
+            stored_bytes = self._vectors_file.stat().st_size
+        stored_rows = stored_bytes // self._row_bytes
+
+        # Si una escritura quedó a medias, solo confiar en filas completas con clave
+        valid_rows = min(len(keys), stored_rows)
+        if stored_bytes > valid_rows * self._row_bytes:
+            with open(self._vectors_file, 'r+b') as f:
+                f.truncate(valid_rows * self._row_bytes)
+        if len(keys) > valid_rows or torn_line:
+            with open(self._keys_file, 'w', encoding='utf-8') as f:
+                f.writelines(f"{key}\n" for key in keys[:valid_rows])
+
+        # Cada línea ocupa su fila aunque la clave sea inválida, así las siguientes no se desplazan
+        self._rows = valid_rows
+        self._index = {key: row for row, key in enumerate(keys[:valid_rows]) if CACHE_KEY.fullmatch(key)}
+        self._remap(valid_rows)
+
+        if valid_rows:
+            print(f"💾 Caché de embeddings: {valid_rows} vectores en {self.cache_path}")
+
+    def _remap(self, rows: int):
+        """Re-abre el memmap tras crecer el archivo de vectores"""
+        if rows == 0:
+            self._vectors = None
+            return
+        self._vectors = np.memmap(
+            self._vectors_file,
+            dtype=self.dtype,
+            mode='r',
+            shape=(rows, self.dimension)
+        )
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def lookup(self, texts: List[str]) -> Tuple[Dict[int, np.ndarray], List[int]]:
+        """
+        Busca textos en la caché
+
+        Returns:
+            (posición -> embedding float32 para aciertos, posiciones faltantes)
+        """
+
+        found = {}
+        missing = []
+
+        with self._lock:
+            for i, text in enumerate(texts):
+                row = self._index.get(self.text_key(text))
+                if row is None:
+                    missing.append(i)
+                else:
+                    found[i] = np.array(self._vectors[row], dtype=np.float32)
+
+            self.stats['hits'] += len(found)
+            self.stats['misses'] += len(missing)
+
+        return found, missing
+
+    def store(self, texts: List[str], embeddings: np.ndarray):
+        """Agrega embeddings nuevos al final de la caché"""
+
+        if len(texts) != len(embeddings):
+            raise ValueError("❌ Longitudes de texts y embeddings deben coincidir")
+
+        embeddings = np.asarray(embeddings).reshape(len(texts), self.dimension)
+
+        with self._lock:
+            new_keys = []
+            new_rows = []
+            seen = set()
+            for text, embedding in zip(texts, embeddings):
+                key = self.text_key(text)
+                if key in self._index or key in seen:
+                    continue
+                seen.add(key)
+                new_keys.append(key)
+                new_rows.append(embedding)
+
+            if not new_keys:
+                return
+
+            start_row = self._rows
+
+            # Vectores primero: una clave nunca apunta a una fila inexistente
+            with open(self._vectors_file, 'ab') as f:
+                f.write(np.asarray(new_rows, dtype=self.dtype).tobytes())
+            with open(self._keys_file, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(new_keys) + '\n')
+
+            for offset, key in enumerate(new_keys):
+                self._index[key] = start_row + offset
+            self._rows += len(new_keys)
+            self._remap(self._rows)
+
+            self.stats['writes'] += len(new_keys)
+
+    def get_stats(self) -> dict:
+        """Estadísticas de uso de la caché"""
+        total = self.stats['hits'] + self.stats['misses']
+        return {
+            'entries': len(self._index),
+            'dtype': self.dtype.name,
+            'path': str(self.cache_path),
+            'hits': self.stats['hits'],
+            'misses': self.stats['misses'],
+            'writes': self.stats['writes'],
+            'hit_rate': self.stats['hits'] / total if total else 0.0
+        }
+
+
+class QueryEmbeddingCache:
+    def __init__(self, max_size: int = 1024, ttl_seconds: Optional[float] = 3600.0):
+        """
+        LRU en memoria para embeddings de consultas con expiración
+
+        Args:
+            max_size: Máximo de consultas retenidas (0 desactiva la caché)
+            ttl_seconds: Vida de cada entrada en segundos (None = sin expiración)
+        """
+
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, np.ndarray]]" = OrderedDict()
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0
+        }
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Normaliza consultas casi idénticas (mayúsculas, espacios, signos de apertura/cierre)"""
+        query = EmbeddingCache.normalize_text(query).lower()
+        return query.strip('¿?¡!.,;: ')
+
+    def get(self, query: str) -> Optional[np.ndarray]:
+        """Embedding en caché o None si no existe / expiró"""
+
+        if self.max_size <= 0:
+            return None
+
+        key = self.normalize_query(query)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+
+            stored_at, embedding = entry
+            if self.ttl_seconds is not None and now - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.stats['expirations'] += 1
+                self.stats['misses'] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return embedding.copy()
+
+    def put(self, query: str, embedding: np.ndarray):
+        """Guarda el embedding de una consulta, expulsando la menos reciente"""
+
+        if self.max_size <= 0:
+            return
+
+        key = self.normalize_query(query)
+
+        with self._lock:
+            self._entries[key] = (time.monotonic(), np.array(embedding, dtype=np.float32))
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        """Contadores de aciertos/fallos de la caché de consultas"""
+        total = self.stats['hits'] + self.stats['misses']
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl_seconds': self.ttl_seconds,
+            **self.stats,
+            'hit_rate': self.stats['hits'] / total if total else 0.0
+        }
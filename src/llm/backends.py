@@ -0,0 +1,503 @@
+"""
+Backends de generación LLM intercambiables
+Transformers local, servidor HTTP compatible con Ollama y un fake determinista
+"""
+
+import hashlib
+import http.client
+import importlib.util
+import json
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import urlparse
+
+
+class LLMBackend:
+    """Interfaz común: generate, generate_batch y stream"""
+
+    name = "base"
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    @property
+    def cache_namespace(self) -> str:
+        """Identifica backend + modelo en claves de caché"""
+        return f"{self.name}:{self.model_name}"
+
+    def generate(self, prompt: str, max_tokens: int = 1024, temperature: float = 0.1, top_p: float = 0.9) -> str:
+        """Texto nuevo generado (sin eco del prompt)"""
+        raise NotImplementedError
+
+    def generate_batch(self, prompts: List[str], max_tokens: int = 1024, temperature: float = 0.1,
+                       top_p: float = 0.9) -> List[Dict[str, Any]]:
+        """Lista (mismo orden) de {'text', 'new_tokens'}; por defecto, una llamada por prompt"""
+        outputs = []
+        for prompt in prompts:
+            text = self.generate(prompt, max_tokens=max_tokens, temperature=temperature, top_p=top_p)
+            outputs.append({'text': text, 'new_tokens': len(text.split())})
+        return outputs
+
+    def stream(self, prompt: str, max_tokens: int = 1024, temperature: float = 0.1, top_p: float = 0.9,
+               stop_event: Optional[threading.Event] = None) -> Iterator[str]:
+        """Fragmentos de texto a medida que se generan; por defecto, todo de una vez"""
+        yield self.generate(prompt, max_tokens=max_tokens, temperature=temperature, top_p=top_p)
+
+    def is_available(self) -> bool:
+        """Comprobación barata (no carga el modelo)"""
+        return True
+
+    def is_loaded(self) -> bool:
+        return True
+
+    def is_ready(self) -> bool:
+        """Utilizable ya sin cargar un modelo (criterio del modo de chunking "auto")"""
+        return self.is_available()
+
+    def get_info(self) -> Dict[str, Any]:
+        return {'backend': self.name, 'model_name': self.model_name}
+
+
+class TransformersBackend(LLMBackend):
+    """Pipeline de Hugging Face en proceso, cargado en el primer uso"""
+
+    name = "transformers"
+
+    def __init__(self, model_name: str = "mistralai/Mistral-7B-Instruct-v0.1", timeout: float = 120.0):
+        """
+        Args:
+            model_name: Modelo de Hugging Face
+            timeout: Espera máxima entre fragmentos en stream (segundos)
+        """
+        super().__init__(model_name)
+        self.timeout = timeout
+        self._tokenizer = None
+        self._pipeline = None
+        self._load_lock = threading.Lock()
+
+    def _load_pipeline(self):
+        """Carga tokenizer, modelo y pipeline una sola vez (thread-safe)"""
+
+        if self._pipeline is not None:
+            return self._pipeline
+
+        with self._load_lock:
+            # Otro hilo pudo terminar la carga mientras esperábamos el lock
+            if self._pipeline is not None:
+                return self._pipeline
+
+            from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
+            import torch
+
+            print("🧠 Cargando modelo local desde Hugging Face...")
+            tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            # Generación por lotes: padding a la izquierda con EOS (Mistral no trae pad token)
+            tokenizer.padding_side = "left"
+            if tokenizer.pad_token is None:
+                tokenizer.pad_token = tokenizer.eos_token
+            model = AutoModelForCausalLM.from_pretrained(
+                self.model_name,
+                torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
+                device_map="auto"
+            )
+            llm_pipeline = pipeline(
+                "text-generation",
+                model=model,
+                tokenizer=tokenizer,
+                device=0 if torch.cuda.is_available() else -1
+            )
+
+            self._tokenizer = tokenizer
+            self._pipeline = llm_pipeline
+
+        return self._pipeline
+
+    def generate(self, prompt: str, max_tokens: int = 1024, temperature: float = 0.1, top_p: float = 0.9) -> str:
+        llm_pipeline = self._load_pipeline()
+        print("🤖 Generando respuesta LLM...")
+        response = llm_pipeline(
+            prompt,
+            max_new_tokens=max_tokens,
+            do_sample=True,
+            temperature=temperature,
+            top_p=top_p,
+            pad_token_id=self._tokenizer.eos_token_id,
+            return_full_text=False  # Solo los tokens nuevos, sin eco del prompt
+        )
+        return response[0]['generated_text']
+
+    def generate_batch(self, prompts: List[str], max_tokens: int = 1024, temperature: float = 0.1,
+                       top_p: float = 0.9) -> List[Dict[str, Any]]:
+        """Varias respuestas en una sola llamada padded al pipeline"""
+        if not prompts:
+            return []
+
+        llm_pipeline = self._load_pipeline()
+        print(f"🤖 Generando lote LLM de {len(prompts)} prompts...")
+        responses = llm_pipeline(
+            list(prompts),
+            batch_size=len(prompts),
+            max_new_tokens=max_tokens,
+            do_sample=True,
+            temperature=temperature,
+            top_p=top_p,
+            pad_token_id=self._tokenizer.pad_token_id,
+            return_full_text=False
+        )
+
+        outputs = []
+        for response in responses:
+            text = response[0]['generated_text']
+            outputs.append({
+                'text': text,
+                'new_tokens': len(self._tokenizer(text, add_special_tokens=False)['input_ids'])
+            })
+        return outputs
+
+    def stream(self, prompt: str, max_tokens: int = 1024, temperature: float = 0.1, top_p: float = 0.9,
+               stop_event: Optional[threading.Event] = None) -> Iterator[str]:
+        """
+        La generación corre en un hilo aparte y se detiene en el siguiente token
+        cuando se activa stop_event o cuando el consumidor deja de iterar.
+        Si el hilo falla, su excepción se relanza aquí; si no llega ningún
+        fragmento en `timeout` segundos se lanza TimeoutError.
+        """
+        from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+
+        llm_pipeline = self._load_pipeline()
+        stop_event = stop_event or threading.Event()
+
+        class _StopOnEvent(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kwargs) -> bool:
+                return stop_event.is_set()
+
+        streamer = TextIteratorStreamer(self._tokenizer, skip_prompt=True, skip_special_tokens=True,
+                                        timeout=self.timeout)
+        errors: List[BaseException] = []
+
+        def run_generation():
+            try:
+                llm_pipeline(
+                    prompt,
+                    max_new_tokens=max_tokens,
+                    do_sample=True,
+                    temperature=temperature,
+                    top_p=top_p,
+                    pad_token_id=self._tokenizer.eos_token_id,
+                    return_full_text=False,
+                    streamer=streamer,
+                    stopping_criteria=StoppingCriteriaList([_StopOnEvent()])
+                )
+            except BaseException as e:
+                errors.append(e)
+                # Sin esto el consumidor esperaría la señal de fin hasta el timeout
+                streamer.end()
+
+        generation = threading.Thread(target=run_generation, daemon=True)
+
+        print("🤖 Generando respuesta LLM (streaming)...")
+        generation.start()
+        try:
+            try:
+                for text in streamer:
+                    yield text
+            except queue.Empty:
+                raise TimeoutError(f"❌ El LLM no produjo texto en {self.timeout:g}s")
+            if errors:
+                raise errors[0]
+        finally:
+            stop_event.set()
+            generation.join(timeout=self.timeout)
+
+    def is_available(self) -> bool:
+        return importlib.util.find_spec("transformers") is not None
+
+    def is_loaded(self) -> bool:
+        return self._pipeline is not None
+
+    def is_ready(self) -> bool:
+        # Tener transformers instalado no basta: cargar Mistral-7B en CPU no es una opción automática
+        return self.is_loaded()
+
+
+class OllamaBackend(LLMBackend):
+    """Servidor HTTP compatible con la API de Ollama (/api/generate), con pool de conexiones"""
+
+    name = "ollama"
+
+    def __init__(self,
+                 model_name: str = "mistral",
+                 base_url: str = "http://localhost:11434",
+                 timeout: float = 120.0,
+                 pool_size: int = 4):
+        """
+        Args:
+            model_name: Modelo servido (p.ej. "mistral")
+            base_url: URL del servidor de inferencia
+            timeout: Timeout de socket por petición (segundos)
+            pool_size: Conexiones keep-alive reutilizables y peticiones
+                       concurrentes en generate_batch
+        """
+        super().__init__(model_name)
+
+        parsed = urlparse(base_url)
+        self.base_url = base_url
+        self._host = parsed.hostname or "localhost"
+        self._port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        self._connection_class = (
+            http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+        )
+        self.timeout = timeout
+        self.pool_size = pool_size
+
+        self._pool: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue(maxsize=pool_size)
+        self._stats_lock = threading.Lock()
+        self.stats = {'requests': 0, 'connections_opened': 0, 'connections_reused': 0}
+
+    def _acquire(self) -> http.client.HTTPConnection:
+        try:
+            connection = self._pool.get_nowait()
+            self._add_stat('connections_reused')
+            return connection
+        except queue.Empty:
+            self._add_stat('connections_opened')
+            return self._connection_class(self._host, self._port, timeout=self.timeout)
+
+    def _release(self, connection: http.client.HTTPConnection):
+        try:
+            self._pool.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def _add_stat(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None):
+        """Envía la petición; reintenta una vez si la conexión keep-alive estaba cerrada"""
+        body = json.dumps(payload) if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+
+        for attempt in range(2):
+            connection = self._acquire()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                self._add_stat('requests')
+                return connection, response
+            except (http.client.HTTPException, ConnectionError):
+                connection.close()
+                if attempt == 1:
+                    raise
+            except BaseException:
+                # Timeout u otro error: la conexión queda en estado desconocido
+                connection.close()
+                raise
+
+    def _payload(self, prompt: str, max_tokens: int, temperature: float, top_p: float, stream: bool) -> Dict[str, Any]:
+        return {
+            'model': self.model_name,
+            'prompt': prompt,
+            'stream': stream,
+            'options': {'num_predict': max_tokens, 'temperature': temperature, 'top_p': top_p}
+        }
+
+    def _generate_raw(self, prompt: str, max_tokens: int, temperature: float, top_p: float) -> Dict[str, Any]:
+        connection, response = self._request(
+            "POST", "/api/generate", self._payload(prompt, max_tokens, temperature, top_p, stream=False)
+        )
+        try:
+            data = response.read()
+        except BaseException:
+            # Lectura a medias: la conexión no se puede devolver al pool
+            connection.close()
+            raise
+        self._release(connection)
+
+        if response.status != 200:
+            raise RuntimeError(f"❌ Servidor LLM respondió {response.status}: {data[:200]!r}")
+        return json.loads(data)
+
+    def generate(self, prompt: str, max_tokens: int = 1024, temperature: float = 0.1, top_p: float = 0.9) -> str:
+        return self._generate_raw(prompt, max_tokens, temperature, top_p)['response']
+
+    def generate_batch(self, prompts: List[str], max_tokens: int = 1024, temperature: float = 0.1,
+                       top_p: float = 0.9) -> List[Dict[str, Any]]:
+        """Peticiones concurrentes (hasta pool_size); el servidor agrupa en su lado"""
+        if not prompts:
+            return []
+
+        def generate_one(prompt: str) -> Dict[str, Any]:
+            data = self._generate_raw(prompt, max_tokens, temperature, top_p)
+            return {'text': data['response'], 'new_tokens': data.get('eval_count', len(data['response'].split()))}
+
+        with ThreadPoolExecutor(max_workers=min(self.pool_size, len(prompts))) as executor:
+            return list(executor.map(generate_one, prompts))
+
+    def stream(self, prompt: str, max_tokens: int = 1024, temperature: float = 0.1, top_p: float = 0.9,
+               stop_event: Optional[threading.Event] = None) -> Iterator[str]:
+        """Lee el NDJSON de Ollama; si se corta antes de 'done' se cierra la conexión"""
+        connection, response = self._request(
+            "POST", "/api/generate", self._payload(prompt, max_tokens, temperature, top_p, stream=True)
+        )
+        if response.status != 200:
+            data = response.read()
+            self._release(connection)
+            raise RuntimeError(f"❌ Servidor LLM respondió {response.status}: {data[:200]!r}")
+
+        finished = False
+        try:
+            for line in response:
+                if stop_event is not None and stop_event.is_set():
+                    break
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if event.get('response'):
+                    yield event['response']
+                if event.get('done'):
+                    finished = True
+                    break
+        finally:
+            if finished:
+                response.read()
+                self._release(connection)
+            else:
+                # Respuesta a medias: la conexión no se puede reutilizar
+                connection.close()
+
+    def is_available(self) -> bool:
+        try:
+            connection = self._connection_class(self._host, self._port, timeout=2.0)
+            connection.request("GET", "/api/tags")
+            available = connection.getresponse().status == 200
+            connection.close()
+            return available
+        except (OSError, http.client.HTTPException):
+            return False
+
+    def get_info(self) -> Dict[str, Any]:
+        info = super().get_info()
+        info['base_url'] = self.base_url
+        with self._stats_lock:
+            info.update(self.stats)
+        return info
+
+
+class FakeLLMBackend(LLMBackend):
+    """
+    Backend determinista sin modelo: mismo prompt, misma respuesta
+
+    Para prompts de chunking (PROGRAMA/CONTENIDO) devuelve un plan JSON de chunks
+    derivado de los párrafos del programa; sirve para tests y para medir el
+    pipeline sin GPU. token_latency_ms simula el coste por token.
+    """
+
+    name = "fake"
+
+    def __init__(self, model_name: str = "fake-llm", token_latency_ms: float = 0.0):
+        super().__init__(model_name)
+        self.token_latency = token_latency_ms / 1000.0
+        self._calls_lock = threading.Lock()
+        self.calls = 0
+
+    def _chunk_plan(self, prompt: str) -> str:
+        name_match = re.search(r'PROGRAMA: ([^\n]+)', prompt)
+        content_match = re.search(r'CONTENIDO:\n(.*?)\n\s*INSTRUCCIONES:', prompt, re.DOTALL)
+
+        if not name_match or not content_match:
+            digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12]
+            return json.dumps({'chunks': [{'content': f"respuesta {digest}", 'type': 'program_overview',
+                                           'metadata': {}}]}, ensure_ascii=False)
+
+        program_name = name_match.group(1).strip()
+        paragraphs = [p.strip() for p in content_match.group(1).split('\n\n') if p.strip()]
+
+        chunks = []
+        for paragraph in paragraphs[:6]:
+            if 'Costo' in paragraph:
+                chunk_type = 'fee'
+            elif 'Perfil' in paragraph:
+                chunk_type = 'occupational_profile'
+            elif 'Semestre' in paragraph:
+                chunk_type = 'curriculum_semester'
+            elif not chunks:
+                chunk_type = 'program_overview'
+            else:
+                chunk_type = 'curriculum_summary'
+            chunks.append({
+                'content': f"{program_name}\n\n{paragraph[:400]}",
+                'type': chunk_type,
+                'metadata': {'program_name': program_name, 'chunk_strategy': 'llm_semantic'}
+            })
+
+        return json.dumps({'chunks': chunks}, ensure_ascii=False)
+
+    def _pieces(self, text: str) -> List[str]:
+        # "Tokens" simulados: palabras con su espacio
+        return re.findall(r'\S+\s*|\s+', text)
+
+    def generate(self, prompt: str, max_tokens: int = 1024, temperature: float = 0.1, top_p: float = 0.9) -> str:
+        with self._calls_lock:
+            self.calls += 1
+        text = self._chunk_plan(prompt)
+        if self.token_latency:
+            time.sleep(self.token_latency * min(len(self._pieces(text)), max_tokens))
+        return text
+
+    def generate_batch(self, prompts: List[str], max_tokens: int = 1024, temperature: float = 0.1,
+                       top_p: float = 0.9) -> List[Dict[str, Any]]:
+        """Simula un lote padded: cuesta lo que la respuesta más larga"""
+        with self._calls_lock:
+            self.calls += len(prompts)
+        texts = [self._chunk_plan(prompt) for prompt in prompts]
+        token_counts = [min(len(self._pieces(text)), max_tokens) for text in texts]
+        if self.token_latency and token_counts:
+            time.sleep(self.token_latency * max(token_counts))
+        return [{'text': text, 'new_tokens': count} for text, count in zip(texts, token_counts)]
+
+    def stream(self, prompt: str, max_tokens: int = 1024, temperature: float = 0.1, top_p: float = 0.9,
+               stop_event: Optional[threading.Event] = None) -> Iterator[str]:
+        with self._calls_lock:
+            self.calls += 1
+        for piece in self._pieces(self._chunk_plan(prompt))[:max_tokens]:
+            if stop_event is not None and stop_event.is_set():
+                break
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            yield piece
+
+
+LLM_BACKENDS = {
+    'transformers': TransformersBackend,
+    'ollama': OllamaBackend,
+    'fake': FakeLLMBackend,
+}
+
+
+def create_llm_backend(backend: Optional[str] = None, **kwargs) -> LLMBackend:
+    """
+    Construye el backend indicado o el de la configuración (LLM_BACKEND)
+
+    Sin kwargs explícitos se usan los valores de src/utils/config.py.
+    """
+    from src.utils import config
+
+    backend = (backend or config.LLM_BACKEND).lower()
+    if backend not in LLM_BACKENDS:
+        raise ValueError(f"❌ Backend LLM desconocido: {backend} (disponibles: {', '.join(LLM_BACKENDS)})")
+
+    if backend == 'transformers':
+        kwargs.setdefault('model_name', config.LLM_MODEL_NAME)
+        kwargs.setdefault('timeout', config.LLM_TIMEOUT)
+    elif backend == 'ollama':
+        kwargs.setdefault('model_name', config.OLLAMA_MODEL)
+        kwargs.setdefault('base_url', config.OLLAMA_BASE_URL)
+        kwargs.setdefault('timeout', config.LLM_TIMEOUT)
+        kwargs.setdefault('pool_size', config.LLM_HTTP_POOL_SIZE)
+
+    return LLM_BACKENDS[backend](**kwargs)
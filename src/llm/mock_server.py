@@ -0,0 +1,136 @@
+"""
+Servidor local compatible con la API de Ollama respaldado por FakeLLMBackend
+Sirve para tests del OllamaBackend y como sustituto del servidor de inferencia
+
+Uso: python -m src.llm.mock_server [puerto]
+"""
+
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from src.llm.backends import FakeLLMBackend, LLMBackend
+
+
+class _OllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: el cliente puede reutilizar la conexión
+
+    def setup(self):
+        super().setup()
+        with self.server.stats_lock:
+            self.server.stats['connections'] += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json(200, {'models': [{'name': self.server.backend.model_name}]})
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self._send_json(404, {'error': 'not found'})
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        with self.server.stats_lock:
+            self.server.stats['requests'] += 1
+
+        backend: LLMBackend = self.server.backend
+        options = request.get('options', {})
+        params = {
+            'max_tokens': options.get('num_predict', 1024),
+            'temperature': options.get('temperature', 0.1),
+            'top_p': options.get('top_p', 0.9)
+        }
+
+        if not request.get('stream', True):
+            text = backend.generate(request.get('prompt', ''), **params)
+            self._send_json(200, {'model': backend.model_name, 'response': text, 'done': True,
+                                  'eval_count': len(text.split())})
+            return
+
+        # Streaming NDJSON con transfer-encoding chunked, como Ollama
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        eval_count = 0
+        try:
+            for piece in backend.stream(request.get('prompt', ''), **params):
+                eval_count += 1
+                self._write_chunk((json.dumps({'response': piece, 'done': False}) + "\n").encode('utf-8'))
+            self._write_chunk((json.dumps({'response': '', 'done': True, 'eval_count': eval_count}) + "\n").encode('utf-8'))
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # El cliente cortó el stream (p.ej. JSON ya cerrado)
+            self.close_connection = True
+
+
+class MockOllamaServer:
+    def __init__(self, backend: Optional[LLMBackend] = None, host: str = "127.0.0.1", port: int = 0):
+        """
+        Args:
+            backend: Backend que genera las respuestas (por defecto FakeLLMBackend)
+            port: 0 elige un puerto libre
+        """
+        self.server = ThreadingHTTPServer((host, port), _OllamaHandler)
+        self.server.daemon_threads = True
+        self.server.backend = backend or FakeLLMBackend()
+        self.server.stats_lock = threading.Lock()
+        self.server.stats = {'connections': 0, 'requests': 0}
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def stats(self) -> dict:
+        with self.server.stats_lock:
+            return dict(self.server.stats)
+
+    def start(self) -> "MockOllamaServer":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="mock-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "MockOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 11434
+    mock = MockOllamaServer(port=port)
+    print(f"🧪 Servidor LLM simulado en {mock.base_url} (Ctrl+C para salir)")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        mock.server.server_close()
@@ -0,0 +1,365 @@
+"""
+Reranking multi-vector (late interaction) con vectores ColBERT de BGE-M3
+Los vectores por token de cada chunk se guardan comprimidos (float16 o códigos
+PQ de 1 byte por subespacio) en un archivo mapeado en memoria; los N mejores
+candidatos de la búsqueda densa se reordenan con MaxSim en NumPy
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from src.rag.store_utils import make_chunk_ids
+
+
+def _kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """k-means simple (Lloyd) para entrenar un codebook PQ"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        # ||v||² no cambia el argmin: basta con ||c||² - 2·v·c
+        assignment = ((centroids ** 2).sum(1)[None, :] - 2 * vectors @ centroids.T).argmin(1)
+        counts = np.bincount(assignment, minlength=k)
+        sums = np.stack([np.bincount(assignment, weights=vectors[:, j], minlength=k)
+                         for j in range(vectors.shape[1])], axis=1)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+class ColbertReranker:
+    def __init__(self,
+                 persist_path: str,
+                 dimension: int = 1024,
+                 pq_subspaces: Optional[int] = None,
+                 pq_train_size: int = 10000):
+        """
+        Args:
+            persist_path: Directorio del archivo de tokens e índice
+            dimension: Dimensión de los vectores por token
+            pq_subspaces: Subespacios PQ (None = float16 sin cuantizar); debe dividir la dimensión
+            pq_train_size: Tokens máximos usados para entrenar los codebooks
+        """
+
+        if pq_subspaces and dimension % pq_subspaces:
+            raise ValueError(f"❌ pq_subspaces ({pq_subspaces}) debe dividir la dimensión ({dimension})")
+
+        self.persist_path = Path(persist_path)
+        self.persist_path.mkdir(parents=True, exist_ok=True)
+        self.dimension = dimension
+        self.pq_subspaces = pq_subspaces or None
+        self.pq_train_size = pq_train_size
+
+        # id → (primer token, nº de tokens) dentro del archivo
+        self._spans: Dict[str, List[int]] = {}
+        self._total_tokens = 0
+        self._codebooks: Optional[np.ndarray] = None  # (subespacios, 256, dim/subespacios)
+        self._mmap: Optional[np.memmap] = None
+        self._mmap_tokens = 0
+
+        self.stats = {'queries_reranked': 0, 'candidates_scored': 0, 'compactions': 0}
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._spans
+
+    # ------------------------------------------------------------------
+    # Almacenamiento
+    # ------------------------------------------------------------------
+
+    @property
+    def _tokens_file(self) -> Path:
+        return self.persist_path / ("codes.u8" if self.pq_subspaces else "tokens.f16")
+
+    @property
+    def _row_width(self) -> int:
+        return self.pq_subspaces or self.dimension
+
+    @property
+    def _row_dtype(self):
+        return np.uint8 if self.pq_subspaces else np.float16
+
+    def _load(self):
+        index_file = self.persist_path / "index.json"
+        if not index_file.exists():
+            return
+
+        with open(index_file, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('dimension') != self.dimension or index.get('pq_subspaces') != self.pq_subspaces:
+            print(f"⚠️  Vectores ColBERT con otra configuración en {self.persist_path}: se descartan")
+            self.clear()
+            return
+
+        self._spans = index['spans']
+        self._total_tokens = index['total_tokens']
+        codebooks_file = self.persist_path / "codebooks.npy"
+        if self.pq_subspaces and codebooks_file.exists():
+            self._codebooks = np.load(codebooks_file)
+
+    def _save_index(self):
+        tmp_file = self.persist_path / "index.tmp.json"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'dimension': self.dimension,
+                'pq_subspaces': self.pq_subspaces,
+                'total_tokens': self._total_tokens,
+                'spans': self._spans
+            }, f)
+        os.replace(tmp_file, self.persist_path / "index.json")
+
+    def _rows(self) -> np.ndarray:
+        """Archivo de tokens mapeado en memoria (se vuelve a mapear si creció)"""
+        if self._mmap is None or self._mmap_tokens != self._total_tokens:
+            self._mmap = np.memmap(self._tokens_file, dtype=self._row_dtype, mode='r',
+                                   shape=(self._total_tokens, self._row_width))
+            self._mmap_tokens = self._total_tokens
+        return self._mmap
+
+    def _train_codebooks(self, vectors: np.ndarray):
+        rng = np.random.default_rng(0)
+        if len(vectors) > self.pq_train_size:
+            vectors = vectors[rng.choice(len(vectors), size=self.pq_train_size, replace=False)]
+        k = min(256, len(vectors))
+        sub_dim = self.dimension // self.pq_subspaces
+        self._codebooks = np.stack([
+            _kmeans(vectors[:, s * sub_dim:(s + 1) * sub_dim], k) for s in range(self.pq_subspaces)
+        ]).astype(np.float32)
+        np.save(self.persist_path / "codebooks.npy", self._codebooks)
+        print(f"🧮 Codebooks PQ entrenados: {self.pq_subspaces} subespacios x {k} centroides ({len(vectors)} tokens)")
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        if not self.pq_subspaces:
+            return vectors.astype(np.float16)
+
+        sub_dim = self.dimension // self.pq_subspaces
+        codes = np.empty((len(vectors), self.pq_subspaces), dtype=np.uint8)
+        for s, codebook in enumerate(self._codebooks):
+            sub = vectors[:, s * sub_dim:(s + 1) * sub_dim]
+            codes[:, s] = ((codebook ** 2).sum(1)[None, :] - 2 * sub @ codebook.T).argmin(1)
+        return codes
+
+    def _decode(self, rows: np.ndarray) -> np.ndarray:
+        """Filas guardadas → vectores; las float16 se convierten al copiarlas al buffer float32"""
+        if not self.pq_subspaces:
+            return rows
+        return self._codebooks[np.arange(self.pq_subspaces), rows].reshape(len(rows), self.dimension)
+
+    def add(self, ids: List[str], token_vectors: List[np.ndarray]):
+        """Agrega (o reemplaza) los vectores por token de cada chunk al final del archivo"""
+
+        if not ids:
+            return
+
+        vectors = np.concatenate([np.asarray(v, dtype=np.float32).reshape(-1, self.dimension)
+                                  for v in token_vectors])
+        if self.pq_subspaces and self._codebooks is None:
+            # Los codebooks se entrenan con el primer lote escrito
+            self._train_codebooks(vectors)
+
+        with open(self._tokens_file, 'ab') as f:
+            f.write(np.ascontiguousarray(self._encode(vectors)).tobytes())
+
+        start = self._total_tokens
+        for chunk_id, chunk_vectors in zip(ids, token_vectors):
+            length = len(chunk_vectors)
+            self._spans[chunk_id] = [start, length]
+            start += length
+        self._total_tokens = start
+        self._save_index()
+
+        # Los reemplazos dejan huecos: se compacta cuando superan a los tokens vivos
+        if self.garbage_tokens() > self.live_tokens():
+            self.compact()
+
+    def delete(self, ids: List[str]):
+        removed = [self._spans.pop(chunk_id, None) for chunk_id in ids]
+        if any(span is not None for span in removed):
+            self._save_index()
+
+    def clear(self):
+        self._spans = {}
+        self._total_tokens = 0
+        self._codebooks = None
+        self._mmap = None
+        for name in ("tokens.f16", "codes.u8", "codebooks.npy"):
+            (self.persist_path / name).unlink(missing_ok=True)
+        self._save_index()
+
+    def live_tokens(self) -> int:
+        return sum(length for _, length in self._spans.values())
+
+    def garbage_tokens(self) -> int:
+        return self._total_tokens - self.live_tokens()
+
+    def compact(self):
+        """Reescribe el archivo solo con los tokens de chunks vigentes"""
+
+        rows = self._rows()
+        tmp_file = self._tokens_file.with_suffix('.tmp')
+        spans, start = {}, 0
+        with open(tmp_file, 'wb') as f:
+            for chunk_id, (span_start, length) in self._spans.items():
+                f.write(np.ascontiguousarray(rows[span_start:span_start + length]).tobytes())
+                spans[chunk_id] = [start, length]
+                start += length
+
+        del rows
+        self._mmap = None  # el mapeo debe cerrarse antes de reemplazar el archivo
+        os.replace(tmp_file, self._tokens_file)
+        self._spans, self._total_tokens = spans, start
+        self._save_index()
+        self.stats['compactions'] += 1
+
+    # ------------------------------------------------------------------
+    # MaxSim
+    # ------------------------------------------------------------------
+
+    def maxsim(self, query_vectors: np.ndarray, ids: List[str]) -> np.ndarray:
+        """
+        Puntaje MaxSim medio por token de la consulta para cada ID
+
+        Los tokens de todos los candidatos se juntan en una matriz y se
+        multiplican una sola vez por los de la consulta; el máximo por chunk se
+        toma con np.maximum.reduceat. IDs sin vectores reciben -inf.
+        """
+
+        scores = np.full(len(ids), -np.inf, dtype=np.float32)
+        known = [(position, self._spans[chunk_id]) for position, chunk_id in enumerate(ids)
+                 if chunk_id in self._spans and self._spans[chunk_id][1] > 0]
+        if not known:
+            return scores
+
+        # Los tokens se decodifican directo en un buffer float32 (sin concatenar una copia intermedia)
+        rows = self._rows()
+        lengths = [length for _, (_, length) in known]
+        tokens = np.empty((sum(lengths), self.dimension), dtype=np.float32)
+        offset = 0
+        for _, (start, length) in known:
+            tokens[offset:offset + length] = self._decode(rows[start:start + length])
+            offset += length
+
+        query = np.asarray(query_vectors, dtype=np.float32).reshape(-1, self.dimension)
+        similarities = tokens @ query.T                                       # (tokens candidatos, tokens consulta)
+        boundaries = np.cumsum([0] + lengths[:-1])
+        per_chunk = np.maximum.reduceat(similarities, boundaries, axis=0)     # (candidatos, tokens consulta)
+
+        scores[[position for position, _ in known]] = per_chunk.mean(axis=1)
+        self.stats['candidates_scored'] += len(known)
+        return scores
+
+    def rerank(self, query_vectors: np.ndarray, results: Dict[str, List], n_results: int = 5) -> Dict[str, List]:
+        """
+        Reordena resultados crudos de vector_store.search por MaxSim
+
+        La distancia devuelta es 1 - MaxSim; los candidatos sin vectores quedan
+        al final en su orden original con su distancia densa.
+        """
+
+        if not results['ids']:
+            return results
+
+        scores = self.maxsim(query_vectors, results['ids'])
+        known = ~np.isinf(scores)
+        scored = np.flatnonzero(known)
+        order = [*scored[np.argsort(-scores[scored], kind='stable')], *np.flatnonzero(~known)][:n_results]
+        self.stats['queries_reranked'] += 1
+
+        reranked = {key: [values[i] for i in order] for key, values in results.items() if isinstance(values, list)}
+        reranked['distances'] = [float(1.0 - scores[i]) if known[i] else results['distances'][i] for i in order]
+        return reranked
+
+    def get_stats(self) -> Dict[str, Any]:
+        bytes_per_token = self._row_width * np.dtype(self._row_dtype).itemsize
+        return {
+            'chunks': len(self._spans),
+            'tokens': self.live_tokens(),
+            'garbage_tokens': self.garbage_tokens(),
+            'storage': f"pq{self.pq_subspaces}" if self.pq_subspaces else "float16",
+            'bytes_per_token': bytes_per_token,
+            'file_bytes': self._total_tokens * bytes_per_token,
+            **self.stats
+        }
+
+
+class ColbertIndexedStore:
+    """
+    Vector store con vectores ColBERT asociados para reranking
+
+    Igual que SparseIndexedStore: las escrituras también codifican y guardan
+    los vectores por token, y el resto de métodos se delegan al store envuelto.
+    """
+
+    def __init__(self,
+                 store,
+                 reranker: ColbertReranker,
+                 colbert_fn: Callable[[List[str]], List[np.ndarray]],
+                 candidates: int = 20):
+        """
+        Args:
+            store: Vector store (o SparseIndexedStore) a envolver
+            reranker: Almacén de vectores por token
+            colbert_fn: Vectores ColBERT por texto (documentos y consultas)
+            candidates: Candidatos de la primera etapa que se reordenan
+        """
+
+        self.store = store
+        self.reranker = reranker
+        self.colbert_fn = colbert_fn
+        self.candidates = candidates
+
+        if len(reranker) != store.count():
+            print(f"⚠️  Vectores ColBERT para {len(reranker)} chunks y vector store con {store.count()}: "
+                  f"recarga los datos para sincronizarlos")
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    def add_documents(self, texts, metadatas, embeddings, ids: Optional[List[str]] = None) -> bool:
+        ids = ids if ids is not None else make_chunk_ids(texts, metadatas)
+        success = self.store.add_documents(texts, metadatas, embeddings, ids=ids)
+        if success:
+            pending = [i for i, chunk_id in enumerate(ids) if chunk_id not in self.reranker]
+            self.reranker.add([ids[i] for i in pending], self.colbert_fn([texts[i] for i in pending]))
+        return success
+
+    def upsert_documents(self, texts, metadatas, embeddings, ids: Optional[List[str]] = None) -> bool:
+        ids = ids if ids is not None else make_chunk_ids(texts, metadatas)
+        success = self.store.upsert_documents(texts, metadatas, embeddings, ids=ids)
+        if success:
+            self.reranker.add(ids, self.colbert_fn(texts))
+        return success
+
+    def delete_documents(self, ids: List[str]) -> bool:
+        success = self.store.delete_documents(ids)
+        if success:
+            self.reranker.delete(ids)
+        return success
+
+    def clear_collection(self) -> bool:
+        success = self.store.clear_collection()
+        if success:
+            self.reranker.clear()
+        return success
+
+    def rerank_batch(self, queries: List[str], results: List[Dict[str, List]], n_results: int = 5) -> List[Dict[str, List]]:
+        """Reordena los candidatos de cada consulta; los vectores de consulta se codifican en un lote"""
+        if not queries:
+            return []
+        query_vectors = self.colbert_fn(queries)
+        return [self.reranker.rerank(vectors, result, n_results=n_results)
+                for vectors, result in zip(query_vectors, results)]
+
+    def rerank(self, query: str, results: Dict[str, List], n_results: int = 5) -> Dict[str, List]:
+        return self.rerank_batch([query], [results], n_results=n_results)[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.store.get_stats()
+        stats['colbert'] = self.reranker.get_stats()
+        return stats
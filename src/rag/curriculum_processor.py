@@ -3,13 +3,62 @@ Procesador USC - LÓGICA EXACTA QUE FUNCIONA
 Basado en el análisis manual exitoso
 """
 
-import re
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple
 from pathlib import Path
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from src.rag.patterns import FEE, OCCUPATIONAL_PROFILE, SEMESTER, SUBJECT
+
+# Encabezados de sección y tipo de programa que contienen
+SECTION_HEADERS = {
+    "## PROGRAMAS DE TECNOLOGIA": 'technology',
+    "## ESTUDIOS DE PREGRADO": 'undergraduate'
+}
+
+
+def is_program_header(stripped_line: str) -> bool:
+    """Un `### ` que no sea un encabezado de semestre abre un programa"""
+    if not stripped_line.startswith('### '):
+        return False
+    lowered = stripped_line.lower()
+    return 'semestre' not in lowered and 'semester' not in lowered
+
+
+# Procesador propio de cada proceso worker (se crea en la primera tarea)
+_worker_processor = None
+
+
+def _chunk_program_block(block: Tuple[str, str, str]) -> Optional[Tuple[Dict[str, Any], List[Dict[str, Any]], Dict[str, int]]]:
+    """
+    Tarea del ProcessPoolExecutor: valida, parsea y trocea un bloque de programa
+    
+    Devuelve (resumen del programa, chunks, delta de stats) o None si el bloque
+    no es un programa válido. Debe ser una función de módulo para poder serializarse.
+    """
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = USCCurriculumProcessor(verbose=False)
+    
+    program_name, program_content, section_type = block
+    if not _worker_processor._is_valid_program(program_content):
+        return None
+    
+    program = _worker_processor._parse_program(program_name, program_content, section_type)
+    if not program:
+        return None
+    
+    semester_chunks_before = _worker_processor.stats['semester_chunks']
+    chunks = _worker_processor._create_all_chunks(program, section_type)
+    
+    summary = {'name': program_name, 'type': section_type, 'total_semesters': program['total_semesters']}
+    stats_delta = {'semester_chunks': _worker_processor.stats['semester_chunks'] - semester_chunks_before}
+    return summary, chunks, stats_delta
+
 
 class USCCurriculumProcessor:
-    def __init__(self):
+    def __init__(self, verbose: bool = True):
+        self.verbose = verbose
         self.stats = {
             'programs_processed': 0,
             'chunks_created': 0,
@@ -19,112 +68,45 @@ class USCCurriculumProcessor:
             'processing_time': None
         }
         
-        print("🧠 Procesador USC - LÓGICA EXACTA QUE FUNCIONA")
+        if verbose:
+            print("🧠 Procesador USC - LÓGICA EXACTA QUE FUNCIONA")
     
-    def process_curriculum_file(self, file_path: str) -> List[Dict[str, Any]]:
-        """Usa la MISMA lógica que el análisis manual exitoso"""
-        
-        start_time = datetime.now()
-        print(f"📄 Procesando: {file_path}")
-        
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            print(f"✅ Archivo leído: {len(content)} caracteres")
-        except Exception as e:
-            print(f"❌ Error: {e}")
-            return []
-        
-        lines = content.split('\n')
-        
-        # PASO 1: Encontrar límites de secciones (IGUAL que análisis)
-        tech_start = None
-        undergrad_start = None
+    def process_curriculum_file(self, file_path: str, workers: int = 1) -> List[Dict[str, Any]]:
+        """
+        Usa la MISMA lógica que el análisis manual exitoso
         
-        for i, line in enumerate(lines):
-            if line.strip() == "## PROGRAMAS DE TECNOLOGIA":
-                tech_start = i
-            elif line.strip() == "## ESTUDIOS DE PREGRADO":
-                undergrad_start = i
-        
-        print(f"✅ Tecnología: línea {tech_start}")
-        print(f"✅ Pregrado: línea {undergrad_start}")
-        
-        all_chunks = []
+        Args:
+            file_path: Ruta al archivo .md de currículums
+            workers: Con más de 1, reparte los programas en un ProcessPoolExecutor
+                     (el orden de los chunks sigue siendo el del archivo)
+        """
+        return self.process_curriculum_files([file_path], workers=workers)
+    
+    def process_curriculum_files(self, file_paths: List[str], workers: int = 1) -> List[Dict[str, Any]]:
+        """Procesa varios archivos del catálogo; los chunks salen en orden de archivo y programa"""
         
-        # PASO 2: Extraer programas de tecnología (IGUAL que análisis manual)
-        if tech_start is not None and undergrad_start is not None:
-            print(f"🔍 Buscando en tecnología: líneas {tech_start} a {undergrad_start}")
-            
-            tech_programs = []
-            # Buscar EXACTAMENTE como en el análisis manual
-            for i in range(tech_start, undergrad_start):
-                line = lines[i].strip()
-                if line.startswith('### ') and not any(word in line.lower() for word in ['semestre', 'semester']):
-                    program_name = line.replace('###', '').strip()
-                    
-                    # Extraer contenido del programa
-                    program_lines = [line]  # Empezar con la línea del título
-                    
-                    # Buscar hasta el siguiente programa o fin de sección
-                    for j in range(i + 1, undergrad_start):
-                        next_line = lines[j].strip()
-                        if next_line.startswith('### ') and not any(word in next_line.lower() for word in ['semestre', 'semester']):
-                            break  # Encontró el siguiente programa
-                        program_lines.append(lines[j])
-                    
-                    program_content = '\n'.join(program_lines)
-                    
-                    # Validar y parsear
-                    if self._is_valid_program(program_content):
-                        program_data = self._parse_program(program_name, program_content, 'technology')
-                        if program_data:
-                            tech_programs.append(program_data)
-                            print(f"   📚 {program_name} ({len(program_data.get('semesters', []))} semestres) - technology")
-            
-            # Crear chunks para programas de tecnología
-            for program in tech_programs:
-                chunks = self._create_all_chunks(program, 'technology')
-                all_chunks.extend(chunks)
-                self.stats['technology_programs'] += 1
-                self.stats['programs_processed'] += 1
+        start_time = datetime.now()
         
-        # PASO 3: Extraer programas de pregrado
-        if undergrad_start is not None:
-            print(f"🔍 Buscando en pregrado: línea {undergrad_start} en adelante")
-            
-            undergrad_programs = []
-            for i in range(undergrad_start, len(lines)):
-                line = lines[i].strip()
-                if line.startswith('### ') and not any(word in line.lower() for word in ['semestre', 'semester']):
-                    program_name = line.replace('###', '').strip()
-                    
-                    # Extraer contenido del programa
-                    program_lines = [line]
-                    
-                    # Buscar hasta el siguiente programa o fin
-                    for j in range(i + 1, len(lines)):
-                        if j < len(lines):
-                            next_line = lines[j].strip()
-                            if next_line.startswith('### ') and not any(word in next_line.lower() for word in ['semestre', 'semester']):
-                                break
-                            program_lines.append(lines[j])
-                    
-                    program_content = '\n'.join(program_lines)
-                    
-                    # Validar y parsear
-                    if self._is_valid_program(program_content):
-                        program_data = self._parse_program(program_name, program_content, 'undergraduate')
-                        if program_data:
-                            undergrad_programs.append(program_data)
-                            print(f"   📚 {program_name} ({len(program_data.get('semesters', []))} semestres) - undergraduate")
+        if workers > 1:
+            lines_per_file = []
+            for file_path in file_paths:
+                print(f"📄 Procesando: {file_path}")
+                try:
+                    with open(file_path, 'r', encoding='utf-8') as f:
+                        content = f.read()
+                    print(f"✅ Archivo leído: {len(content)} caracteres")
+                except Exception as e:
+                    print(f"❌ Error: {e}")
+                    continue
+                lines_per_file.append(content.split('\n'))
             
-            # Crear chunks para programas de pregrado
-            for program in undergrad_programs:
-                chunks = self._create_all_chunks(program, 'undergraduate')
-                all_chunks.extend(chunks)
-                self.stats['undergraduate_programs'] += 1
-                self.stats['programs_processed'] += 1
+            if not lines_per_file:
+                return []
+            all_chunks = self._process_blocks_parallel(lines_per_file, workers)
+        else:
+            all_chunks = list(self.iter_chunks(file_paths))
+            if not all_chunks:
+                return []
         
         self.stats['chunks_created'] = len(all_chunks)
         self.stats['processing_time'] = (datetime.now() - start_time).total_seconds()
@@ -139,6 +121,110 @@ class USCCurriculumProcessor:
         
         return all_chunks
     
+    def iter_chunks(self, file_paths: List[str]) -> Iterator[Dict[str, Any]]:
+        """
+        Emite los chunks programa a programa leyendo cada archivo línea a línea
+        
+        Nunca materializa el archivo ni la lista completa de chunks, así una
+        etapa posterior (embeddings, vector store) puede empezar de inmediato.
+        """
+        for file_path in file_paths:
+            print(f"📄 Procesando: {file_path}")
+            try:
+                f = open(file_path, 'r', encoding='utf-8')
+            except Exception as e:
+                print(f"❌ Error: {e}")
+                continue
+            
+            with f:
+                # Una sola pasada: cada programa se parsea y se trocea en cuanto se cierra su bloque
+                for program in self.iter_programs(f):
+                    section_type = program['type']
+                    print(f"   📚 {program['name']} ({len(program.get('semesters', []))} semestres) - {section_type}")
+                    
+                    chunks = self._create_all_chunks(program, section_type)
+                    self.stats[f'{section_type}_programs'] += 1
+                    self.stats['programs_processed'] += 1
+                    self.stats['chunks_created'] += len(chunks)
+                    yield from chunks
+    
+    def _process_blocks_parallel(self, lines_per_file: List[List[str]], workers: int) -> List[Dict[str, Any]]:
+        """Reparte los bloques entre procesos y fusiona resultados en orden de origen"""
+        
+        # La detección de bloques es una pasada lineal barata; el trabajo regex va a los workers
+        blocks = [block for lines in lines_per_file for block in self.iter_program_blocks(lines)]
+        chunksize = max(1, len(blocks) // (workers * 4))
+        print(f"⚙️  Repartiendo {len(blocks)} bloques en {workers} procesos (chunksize={chunksize})")
+        
+        all_chunks = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # executor.map conserva el orden de entrada: salida determinista
+            for result in executor.map(_chunk_program_block, blocks, chunksize=chunksize):
+                if result is None:
+                    continue
+                
+                summary, chunks, stats_delta = result
+                section_type = summary['type']
+                print(f"   📚 {summary['name']} ({summary['total_semesters']} semestres) - {section_type}")
+                
+                all_chunks.extend(chunks)
+                self.stats[f'{section_type}_programs'] += 1
+                self.stats['programs_processed'] += 1
+                for key, value in stats_delta.items():
+                    self.stats[key] += value
+        
+        return all_chunks
+    
+    def iter_program_blocks(self, lines: Iterable[str]) -> Iterator[Tuple[str, str, str]]:
+        """
+        Máquina de estados de una sola pasada (tiempo lineal)
+        
+        Recorre las líneas una vez y emite (nombre, contenido, sección) al cerrarse
+        cada bloque de programa: al encontrar el siguiente programa, una nueva
+        sección o el final. Acepta cualquier iterable de líneas (lista o archivo abierto).
+        """
+        section_type = None
+        program_name = None
+        program_lines: List[str] = []
+        raw_line = ""
+        
+        for i, raw_line in enumerate(lines):
+            line = raw_line[:-1] if raw_line.endswith('\n') else raw_line
+            stripped = line.strip()
+            
+            if stripped in SECTION_HEADERS:
+                if program_name is not None:
+                    yield program_name, '\n'.join(program_lines), section_type
+                    program_name, program_lines = None, []
+                section_type = SECTION_HEADERS[stripped]
+                print(f"✅ {'Tecnología' if section_type == 'technology' else 'Pregrado'}: línea {i}")
+                continue
+            
+            if section_type is None:
+                continue
+            
+            if is_program_header(stripped):
+                if program_name is not None:
+                    yield program_name, '\n'.join(program_lines), section_type
+                program_name = stripped.replace('###', '').strip()
+                program_lines = [stripped]  # Empezar con la línea del título
+            elif program_name is not None:
+                program_lines.append(line)
+        
+        if program_name is not None:
+            # Un archivo que termina en salto de línea equivale a un último elemento '' de split('\n')
+            if raw_line.endswith('\n'):
+                program_lines.append('')
+            yield program_name, '\n'.join(program_lines), section_type
+    
+    def iter_programs(self, lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """Valida y parsea cada bloque emitido por iter_program_blocks"""
+        for program_name, program_content, section_type in self.iter_program_blocks(lines):
+            if self._is_valid_program(program_content):
+                program_data = self._parse_program(program_name, program_content, section_type)
+                if program_data:
+                    yield program_data
+    
     def _is_valid_program(self, content: str) -> bool:
         """Valida que sea un programa real"""
         if len(content) < 200:
@@ -153,7 +239,7 @@ class USCCurriculumProcessor:
         # Extraer costo
         cost_amount = 0
         cost_raw = ""
-        cost_match = re.search(r'\*\*Costo Matricula:\*\* \$([0-9,\.]+) \(💰cop\)', content)
+        cost_match = FEE.search(content)
         if cost_match:
             cost_raw = cost_match.group(1)
             cost_str = cost_raw.replace(',', '').replace('.', '')
@@ -161,16 +247,16 @@ class USCCurriculumProcessor:
         
         # Extraer perfil
         profile = ""
-        profile_match = re.search(r'\*\*Perfil Ocupacional:\*\*\s*(.*?)(?=\*\*Curriculo:|$)', content, re.DOTALL)
+        profile_match = OCCUPATIONAL_PROFILE.search(content)
         if profile_match:
             profile = profile_match.group(1).strip()
         
         # Extraer semestres
-        semester_matches = re.findall(r'#### Semestre ([IVX\d]+)\s*\n((?:- [^\n]+\n)*)', content)
+        semester_matches = SEMESTER.findall(content)
         
         semesters = []
         for sem_num, sem_content in semester_matches:
-            subjects = re.findall(r'- ([^|]+) \| (\d+) Créditos', sem_content)
+            subjects = SUBJECT.findall(sem_content)
             if subjects:
                 semester_data = {
                     'number': sem_num,
@@ -265,7 +351,8 @@ class USCCurriculumProcessor:
             
             self.stats['semester_chunks'] += 1
         
-        print(f"      ✅ {len(chunks)} chunks creados para {program_name}")
+        if self.verbose:
+            print(f"      ✅ {len(chunks)} chunks creados para {program_name}")
         return chunks
     
     def get_processing_stats(self) -> Dict[str, Any]:
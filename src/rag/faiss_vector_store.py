@@ -0,0 +1,600 @@
+"""
+Vector store FAISS para USC Curriculum RAG
+Índice ANN configurable por factory string (Flat, IVF, HNSW, PQ) con
+persistencia en disco y tabla de metadatos paralela
+"""
+
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+
+from src.rag.numpy_vector_store import MetadataMaskIndex, append_rows
+from src.rag.store_utils import make_chunk_ids, normalize_rows, similarity_to_distance
+
+# FAISS es opcional: solo se requiere al usar este backend
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+# Componente PQ de un factory string: "PQ<m>" o "PQ<m>x<nbits>" (OPQ<m> es solo la rotación)
+PQ_FACTORY = re.compile(r'(?<![A-Za-z])PQ(\d+)(?:x(\d+))?')
+
+
+class FaissVectorStore:
+    def __init__(self,
+                 collection_name: str = "usc_curriculum",
+                 persist_directory: str = "./data/vectorstore",
+                 index_factory: str = "Flat",
+                 nprobe: int = 8,
+                 ef_search: int = 64):
+        """
+        Inicializa un índice FAISS persistente
+
+        Los índices que requieren entrenamiento (IVF, PQ) acumulan los vectores
+        hasta tener puntos suficientes (39 por centroide, el mínimo que recomienda
+        FAISS) o hasta el flush final de la ingesta, y entonces entrenan con todos;
+        mientras tanto la búsqueda es exacta sobre los vectores acumulados.
+
+        Args:
+            collection_name: Nombre de la colección
+            persist_directory: Directorio base de persistencia
+            index_factory: Factory string de FAISS, p.ej. "Flat", "IVF256,Flat",
+                           "HNSW32", "IVF256,PQ64" (métrica: producto interno)
+            nprobe: Listas invertidas visitadas por consulta (índices IVF)
+            ef_search: Tamaño de la cola de búsqueda (índices HNSW)
+        """
+
+        if not FAISS_AVAILABLE:
+            raise ImportError("faiss no está instalado. Solución: pip install faiss-cpu")
+
+        self.collection_name = collection_name
+        self.persist_directory = Path(persist_directory)
+        self.collection_path = self.persist_directory / f"{collection_name}_faiss"
+        self.index_factory = index_factory
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+
+        print(f"🔄 Inicializando FAISS vector store...")
+        print(f"   📂 Directorio: {self.collection_path}")
+        print(f"   📝 Colección: {collection_name}")
+        print(f"   🧮 Índice: {index_factory}")
+
+        self.collection_path.mkdir(parents=True, exist_ok=True)
+
+        self.index = None
+        self._next_id = 0
+        self._int_ids: List[int] = []
+        self._records: Dict[int, Dict[str, Any]] = {}
+        self._doc_to_int: Dict[str, int] = {}
+        self._mask_index: Optional[MetadataMaskIndex] = None
+
+        # Vectores a la espera del entrenamiento (mismo orden que _int_ids mientras no hay índice entrenado)
+        self._pending: Optional[np.ndarray] = None
+        self._pending_ids: List[int] = []
+
+        self._selector_support: Dict[type, bool] = {}
+
+        self._lock = threading.RLock()
+        self._deferred = 0
+        self._dirty = False
+
+        self.stats = {
+            'documents_added': 0,
+            'queries_processed': 0,
+            'last_update': None
+        }
+
+        self._load()
+        print(f"✅ Colección cargada: {self.count()} documentos")
+
+    def _index_file(self) -> Path:
+        return self.collection_path / "index.faiss"
+
+    def _records_file(self) -> Path:
+        return self.collection_path / "records.json"
+
+    def _pending_file(self) -> Path:
+        return self.collection_path / "pending.npy"
+
+    def _load(self):
+        if not (self._index_file().exists() and self._records_file().exists()):
+            return
+
+        with open(self._records_file(), 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+
+        if stored['index_factory'] != self.index_factory:
+            print(f"⚠️  Índice persistido usa '{stored['index_factory']}', se conserva ese tipo")
+            self.index_factory = stored['index_factory']
+
+        self.index = faiss.read_index(str(self._index_file()))
+        self._next_id = stored['next_id']
+        self._records = {int(int_id): record for int_id, record in stored['records'].items()}
+        self._int_ids = sorted(self._records)
+        self._pending_ids = stored.get('pending_ids', [])
+        if self._pending_ids:
+            self._pending = np.load(self._pending_file())
+        self._reindex()
+
+    def _save(self):
+        """Escritura atómica del índice y de la tabla de metadatos"""
+
+        index_tmp = self.collection_path / "index.tmp.faiss"
+        records_tmp = self.collection_path / "records.tmp.json"
+
+        if self.index is not None:
+            faiss.write_index(self.index, str(index_tmp))
+        with open(records_tmp, 'w', encoding='utf-8') as f:
+            json.dump({
+                'index_factory': self.index_factory,
+                'next_id': self._next_id,
+                'records': {str(int_id): record for int_id, record in self._records.items()},
+                'pending_ids': self._pending_ids
+            }, f, ensure_ascii=False)
+
+        if self._pending_ids:
+            pending_tmp = self.collection_path / "pending.tmp.npy"
+            np.save(pending_tmp, self._pending[:len(self._pending_ids)])
+            os.replace(pending_tmp, self._pending_file())
+        elif self._pending_file().exists():
+            self._pending_file().unlink()
+
+        if self.index is not None:
+            os.replace(index_tmp, self._index_file())
+        elif self._index_file().exists():
+            self._index_file().unlink()
+        os.replace(records_tmp, self._records_file())
+
+    def flush(self):
+        """Entrena con los vectores acumulados si alcanzan el mínimo y guarda los cambios pendientes"""
+        with self._lock:
+            self._train_pending(final=True)
+            if self._dirty:
+                self._save()
+                self._dirty = False
+
+    @contextmanager
+    def deferred_writes(self):
+        """Agrupa escrituras con un solo entrenamiento/guardado al salir (ver NumpyVectorStore)"""
+        with self._lock:
+            self._deferred += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._deferred -= 1
+                if not self._deferred:
+                    self.flush()
+
+    def _after_write(self):
+        self._mask_index = None
+        self._dirty = True
+        if not self._deferred:
+            self.flush()
+
+    def _reindex(self):
+        self._doc_to_int = {record['id']: int_id for int_id, record in self._records.items()}
+        self._mask_index = None
+
+    def _mask(self, where: Optional[Dict]) -> Optional[np.ndarray]:
+        if where and self._mask_index is None:
+            self._mask_index = MetadataMaskIndex([self._records[int_id]['metadata'] for int_id in self._int_ids])
+        return self._mask_index.mask(where) if where else None
+
+    def _new_index(self, dimension: int):
+        base = faiss.index_factory(dimension, self.index_factory, faiss.METRIC_INNER_PRODUCT)
+        # Los IVF guardan IDs propios y borran sin renumerar; envolverlos en IDMap2 desalinea el mapa
+        if faiss.try_extract_index_ivf(base) is not None:
+            return base
+        return faiss.IndexIDMap2(base)
+
+    def _base_index(self):
+        if isinstance(self.index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+            return faiss.downcast_index(self.index.index)
+        return self.index
+
+    def _training_points(self):
+        """(mínimo, recomendado) de vectores para entrenar: 1 y 39 por centroide (IVF y/o PQ)"""
+        ivf = faiss.try_extract_index_ivf(self._base_index())
+        centroids = ivf.nlist if ivf is not None else 0
+        # PQ puede ir dentro de IVF, HNSW o solo ("PQ8", "HNSW16,PQ8x4"): 2^nbits centroides por subespacio
+        for match in PQ_FACTORY.finditer(self.index_factory):
+            centroids = max(centroids, 2 ** int(match.group(2) or 8))
+        return max(centroids, 1), 39 * max(centroids, 1)
+
+    def _add_to_index(self, vectors: np.ndarray, int_ids: np.ndarray):
+        """Agrega al índice entrenado o acumula hasta poder entrenar"""
+        if self.index.is_trained:
+            self.index.add_with_ids(vectors, int_ids)
+            return
+        self._pending = append_rows(self._pending, len(self._pending_ids), vectors)
+        self._pending_ids.extend(int_ids.tolist())
+        self._train_pending(final=False)
+
+    def _train_pending(self, final: bool):
+        """
+        Entrena con todos los vectores acumulados y los pasa al índice
+
+        Durante la ingesta espera al número recomendado de puntos; en el flush
+        final basta el mínimo (un centroide por punto). Por debajo del mínimo los
+        vectores siguen acumulados y la búsqueda sobre ellos es exacta.
+        """
+        if self.index is None or self.index.is_trained or not self._pending_ids:
+            return
+
+        minimum, recommended = self._training_points()
+        count = len(self._pending_ids)
+        if count < (minimum if final else recommended):
+            if final:
+                print(f"⚠️  {count} vectores no alcanzan para entrenar '{self.index_factory}' "
+                      f"(mínimo {minimum}); búsqueda exacta hasta tener más")
+            return
+
+        vectors = self._pending[:count]
+        print(f"🏋️  Entrenando índice {self.index_factory} con {count} vectores...")
+        try:
+            self.index.train(vectors)
+        except RuntimeError as e:
+            raise ValueError(
+                f"❌ No hay suficientes vectores para entrenar '{self.index_factory}': {e}"
+            )
+        self.index.add_with_ids(vectors, np.asarray(self._pending_ids, dtype=np.int64))
+        self._pending, self._pending_ids = None, []
+
+    def _clean_metadata(self, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Mismas reglas de tipos que ChromaDB: str, int, float, bool"""
+        return {key: value if isinstance(value, (str, int, float, bool)) else str(value)
+                for key, value in metadata.items()}
+
+    def _add_vectors(self, texts, metadatas, vectors, ids):
+        if self.index is None:
+            self.index = self._new_index(vectors.shape[1])
+
+        int_ids = np.arange(self._next_id, self._next_id + len(ids), dtype=np.int64)
+        self._next_id += len(ids)
+        previous = {doc_id: self._doc_to_int[doc_id] for doc_id in ids if doc_id in self._doc_to_int}
+
+        for int_id, text, metadata, doc_id in zip(int_ids.tolist(), texts, metadatas, ids):
+            self._records[int_id] = {
+                'id': doc_id,
+                'document': text,
+                'metadata': self._clean_metadata(metadata)
+            }
+            self._doc_to_int[doc_id] = int_id
+            self._int_ids.append(int_id)
+
+        try:
+            self._add_to_index(vectors, int_ids)
+        except Exception:
+            # Si el entrenamiento o el add fallan, los documentos no quedan a medias en la tabla
+            added = set(int_ids.tolist())
+            for int_id in added:
+                self._records.pop(int_id, None)
+            for doc_id in ids:
+                if doc_id in previous:
+                    self._doc_to_int[doc_id] = previous[doc_id]
+                else:
+                    self._doc_to_int.pop(doc_id, None)
+            self._int_ids = [int_id for int_id in self._int_ids if int_id not in added]
+            self._drop_pending(added)
+            raise
+
+    def _drop_pending(self, removed: Set[int]):
+        if not self._pending_ids:
+            return
+        keep = [row for row, int_id in enumerate(self._pending_ids) if int_id not in removed]
+        self._pending = self._pending[keep] if keep else None
+        self._pending_ids = [self._pending_ids[row] for row in keep]
+
+    def _remove_int_ids(self, int_ids: List[int]):
+        if not int_ids:
+            return
+
+        removed = set(int_ids)
+        if self._pending_ids:
+            self._drop_pending(removed)
+        elif self.index.is_trained:
+            try:
+                self.index.remove_ids(np.array(int_ids, dtype=np.int64))
+            except RuntimeError:
+                # HNSW no soporta borrado: reconstruir con los vectores restantes
+                remaining = [int_id for int_id in self._int_ids if int_id not in removed]
+                vectors = np.vstack([self.index.reconstruct(int_id) for int_id in remaining]) if remaining else None
+                self.index = self._new_index(self.index.d)
+                if vectors is not None:
+                    self._add_to_index(vectors, np.array(remaining, dtype=np.int64))
+
+        for int_id in int_ids:
+            record = self._records.pop(int_id, None)
+            # En un upsert el ID ya apunta a la versión nueva
+            if record is not None and self._doc_to_int.get(record['id']) == int_id:
+                del self._doc_to_int[record['id']]
+        self._int_ids = [int_id for int_id in self._int_ids if int_id not in removed]
+
+    def add_documents(self,
+                      texts: List[str],
+                      metadatas: List[Dict[str, Any]],
+                      embeddings: np.ndarray,
+                      ids: Optional[List[str]] = None) -> bool:
+        """Agrega documentos al índice (IDs existentes se ignoran, como en ChromaDB)"""
+
+        if len(texts) != len(metadatas) or len(texts) != len(embeddings):
+            raise ValueError("❌ Longitudes de texts, metadatas y embeddings deben coincidir")
+
+        print(f"🔄 Agregando {len(texts)} documentos al vector store...")
+
+        try:
+            if ids is None:
+                ids = make_chunk_ids(texts, metadatas)
+
+            with self._lock:
+                keep = [i for i, doc_id in enumerate(ids) if doc_id not in self._doc_to_int]
+                if len(keep) < len(ids):
+                    print(f"⚠️  {len(ids) - len(keep)} IDs ya existentes ignorados")
+
+                if keep:
+                    vectors = normalize_rows(np.asarray(embeddings)[keep])
+                    self._add_vectors([texts[i] for i in keep], [metadatas[i] for i in keep],
+                                      vectors, [ids[i] for i in keep])
+                    self._after_write()
+
+            self.stats['documents_added'] += len(keep)
+            self.stats['last_update'] = datetime.now().isoformat()
+            print(f"✅ Documentos agregados exitosamente")
+            print(f"   📊 Total en colección: {self.count()}")
+
+            return True
+
+        except Exception as e:
+            print(f"❌ Error agregando documentos: {e}")
+            return False
+
+    def upsert_documents(self,
+                         texts: List[str],
+                         metadatas: List[Dict[str, Any]],
+                         embeddings: np.ndarray,
+                         ids: Optional[List[str]] = None) -> bool:
+        """Inserta o reemplaza documentos por ID"""
+
+        if len(texts) != len(metadatas) or len(texts) != len(embeddings):
+            raise ValueError("❌ Longitudes de texts, metadatas y embeddings deben coincidir")
+
+        try:
+            if ids is None:
+                ids = make_chunk_ids(texts, metadatas)
+
+            with self._lock:
+                # Primero se agrega: si falla, las versiones anteriores siguen intactas
+                replaced = [self._doc_to_int[doc_id] for doc_id in ids if doc_id in self._doc_to_int]
+                self._add_vectors(texts, metadatas, normalize_rows(embeddings), ids)
+                self._remove_int_ids(replaced)
+                self._after_write()
+
+            self.stats['documents_added'] += len(texts)
+            self.stats['last_update'] = datetime.now().isoformat()
+            print(f"✅ {len(texts)} documentos insertados/actualizados")
+
+            return True
+
+        except Exception as e:
+            print(f"❌ Error en upsert de documentos: {e}")
+            return False
+
+    def delete_documents(self, ids: List[str]) -> bool:
+        """Elimina documentos por ID"""
+
+        if not ids:
+            return True
+
+        try:
+            with self._lock:
+                int_ids = [self._doc_to_int[doc_id] for doc_id in ids if doc_id in self._doc_to_int]
+                self._remove_int_ids(int_ids)
+                self._after_write()
+
+            self.stats['last_update'] = datetime.now().isoformat()
+            print(f"🗑️  {len(int_ids)} documentos eliminados")
+            return True
+
+        except Exception as e:
+            print(f"❌ Error eliminando documentos: {e}")
+            return False
+
+    def clear_collection(self) -> bool:
+        """Limpia todos los documentos de la colección"""
+
+        try:
+            with self._lock:
+                self.index = None
+                self._next_id = 0
+                self._int_ids = []
+                self._records = {}
+                self._pending, self._pending_ids = None, []
+                self._reindex()
+                self._dirty = True
+                self.flush()
+
+            print(f"🗑️  Colección {self.collection_name} limpiada")
+            return True
+
+        except Exception as e:
+            print(f"❌ Error limpiando colección: {e}")
+            return False
+
+    def get_ids(self) -> Set[str]:
+        """IDs de todos los documentos almacenados"""
+        with self._lock:
+            return set(self._doc_to_int)
+
+    def count(self) -> int:
+        """Número de documentos en la colección"""
+        return len(self._int_ids)
+
+    def _search_parameters(self, selector=None):
+        """Parámetros de búsqueda según el tipo de índice base (nprobe / efSearch + filtro)"""
+
+        base = self._base_index()
+        kwargs = {'sel': selector} if selector is not None else {}
+
+        try:
+            faiss.extract_index_ivf(base)
+            return faiss.SearchParametersIVF(nprobe=self.nprobe, **kwargs)
+        except RuntimeError:
+            pass
+
+        if isinstance(base, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(efSearch=self.ef_search, **kwargs)
+
+        return faiss.SearchParameters(**kwargs) if selector is not None else None
+
+    def _supports_selector(self) -> bool:
+        """Algunos índices (p.ej. IndexPQ) rechazan SearchParameters con sel; se prueba una vez por tipo"""
+        index_type = type(self._base_index())
+        if index_type not in self._selector_support:
+            probe = np.zeros((1, self.index.d), dtype=np.float32)
+            try:
+                self.index.search(probe, 1, params=self._search_parameters(faiss.IDSelectorBatch(
+                    np.asarray(self._int_ids[:1], dtype=np.int64))))
+                self._selector_support[index_type] = True
+            except RuntimeError:
+                self._selector_support[index_type] = False
+        return self._selector_support[index_type]
+
+    def _search_post_filtered(self, queries: np.ndarray, k: int, allowed: np.ndarray):
+        """Sin selector: pide más candidatos (duplicando) y descarta los que no pasan el filtro"""
+        allowed_set = set(allowed.tolist())
+        fetch = min(self.count(), max(k * 10, k))
+        while True:
+            params = self._search_parameters()
+            scores, int_ids = (self.index.search(queries, fetch, params=params) if params is not None
+                               else self.index.search(queries, fetch))
+            keep = np.isin(int_ids, allowed)
+            if fetch >= self.count() or (keep.sum(axis=1) >= min(k, len(allowed_set))).all():
+                break
+            fetch = min(self.count(), fetch * 2)
+
+        # Orden estable: los permitidos primero, conservando el ranking del índice
+        order = np.argsort(~keep, axis=1, kind='stable')[:, :k]
+        scores = np.take_along_axis(scores, order, axis=1)
+        int_ids = np.where(np.take_along_axis(keep, order, axis=1), np.take_along_axis(int_ids, order, axis=1), -1)
+        return scores, int_ids
+
+    def _search_pending(self, queries: np.ndarray, k: int, allowed: Optional[np.ndarray]):
+        """Búsqueda exacta sobre los vectores que esperan el entrenamiento del índice"""
+        vectors = self._pending[:len(self._pending_ids)]
+        int_ids = np.asarray(self._pending_ids, dtype=np.int64)
+        if allowed is not None:
+            keep = np.isin(int_ids, allowed)
+            vectors, int_ids = vectors[keep], int_ids[keep]
+        scores = queries @ vectors.T
+        top = np.argsort(-scores, axis=1, kind='stable')[:, :k]
+        return np.take_along_axis(scores, top, axis=1), int_ids[top]
+
+    def _empty_results(self) -> Dict[str, List]:
+        return {
+            'documents': [],
+            'metadatas': [],
+            'distances': [],
+            'ids': []
+        }
+
+    def search(self,
+               query_embedding: np.ndarray,
+               n_results: int = 5,
+               where: Optional[Dict] = None) -> Dict[str, List]:
+        """Busca documentos similares (ANN según el índice configurado)"""
+
+        return self.search_batch([query_embedding], n_results=n_results, where=where)[0]
+
+    def search_batch(self,
+                     query_embeddings: List[np.ndarray],
+                     n_results: int = 5,
+                     where: Optional[Dict] = None) -> List[Dict[str, List]]:
+        """Busca varias consultas en una sola llamada a index.search"""
+
+        if len(query_embeddings) == 0:
+            return []
+
+        with self._lock:
+            if self.count() == 0:
+                print("⚠️  Vector store vacío")
+                return [self._empty_results() for _ in query_embeddings]
+
+            try:
+                selector, allowed = None, None
+                mask = self._mask(where)
+                if mask is not None:
+                    allowed = np.asarray(self._int_ids, dtype=np.int64)[mask]
+                    if allowed.size == 0:
+                        self.stats['queries_processed'] += len(query_embeddings)
+                        return [self._empty_results() for _ in query_embeddings]
+                    selector = faiss.IDSelectorBatch(allowed)
+
+                k = min(n_results, self.count())
+                queries = normalize_rows(np.vstack(query_embeddings))
+                if self._pending_ids:
+                    scores, int_ids = self._search_pending(queries, k, allowed)
+                elif selector is not None and not self._supports_selector():
+                    scores, int_ids = self._search_post_filtered(queries, k, allowed)
+                else:
+                    params = self._search_parameters(selector)
+                    if params is not None:
+                        scores, int_ids = self.index.search(queries, k, params=params)
+                    else:
+                        scores, int_ids = self.index.search(queries, k)
+
+                self.stats['queries_processed'] += len(queries)
+
+                formatted_results = []
+                for query_scores, query_ids in zip(scores, int_ids):
+                    hits = [(score, int_id) for score, int_id in zip(query_scores, query_ids) if int_id != -1]
+                    distances = similarity_to_distance(np.array([score for score, _ in hits], dtype=np.float32))
+                    formatted_results.append({
+                        'documents': [self._records[int_id]['document'] for _, int_id in hits],
+                        'metadatas': [self._records[int_id]['metadata'] for _, int_id in hits],
+                        'distances': distances.tolist(),
+                        'ids': [self._records[int_id]['id'] for _, int_id in hits]
+                    })
+
+                print(f"🔍 Búsqueda completada: {len(formatted_results)} consultas")
+
+                return formatted_results
+
+            except Exception as e:
+                print(f"❌ Error en búsqueda: {e}")
+                return [self._empty_results() for _ in query_embeddings]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obtiene estadísticas del vector store"""
+
+        with self._lock:
+            metadatas = [record['metadata'] for record in self._records.values()]
+            doc_types = sorted({m['type'] for m in metadatas if 'type' in m})
+            programs = sorted({
+                m.get('program_name', m.get('program'))
+                for m in metadatas
+                if m.get('program_name', m.get('program'))
+            })
+
+            return {
+                'total_documents': self.count(),
+                'collection_name': self.collection_name,
+                'persist_directory': str(self.collection_path),
+                'backend': 'faiss',
+                'index_factory': self.index_factory,
+                'is_trained': bool(self.index.is_trained) if self.index is not None else False,
+                'pending_vectors': len(self._pending_ids),
+                'document_types': doc_types,
+                'programs': programs,
+                'queries_processed': self.stats['queries_processed'],
+                'documents_added': self.stats['documents_added']
+            }
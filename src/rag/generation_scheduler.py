@@ -0,0 +1,87 @@
+"""
+Planificador de generación LLM por lotes
+Agrupa prompts de varios programas en una sola llamada padded al pipeline
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from llm_utils import generate_batch
+from src.utils.micro_batcher import MicroBatcher
+
+
+class GenerationScheduler:
+    def __init__(self,
+                 generate_batch_fn: Optional[Callable[..., List[Dict[str, Any]]]] = None,
+                 max_batch_size: int = 4,
+                 max_wait_ms: float = 50.0,
+                 max_tokens: int = 1024,
+                 temperature: float = 0.1,
+                 top_p: float = 0.9):
+        """
+        Args:
+            generate_batch_fn: Función (prompts, **params) -> [{'text', 'new_tokens'}]
+                               (por defecto llm_utils.generate_batch)
+            max_batch_size: Máximo de prompts por llamada al pipeline
+            max_wait_ms: Espera máxima para completar un lote
+            max_tokens, temperature, top_p: Parámetros de generación del lote
+        """
+
+        self.generate_batch_fn = generate_batch_fn or generate_batch
+        self.generation_params = {
+            'max_tokens': max_tokens,
+            'temperature': temperature,
+            'top_p': top_p
+        }
+
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'generated_tokens': 0,
+            'generation_time': 0.0
+        }
+
+        self.batcher = MicroBatcher(
+            self._process_batch,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            name="llm-generation-scheduler"
+        )
+
+    def _process_batch(self, prompts: List[str]) -> List[str]:
+        start_time = time.perf_counter()
+        outputs = self.generate_batch_fn(prompts, **self.generation_params)
+        elapsed = time.perf_counter() - start_time
+
+        with self._stats_lock:
+            self.stats['generated_tokens'] += sum(output['new_tokens'] for output in outputs)
+            self.stats['generation_time'] += elapsed
+
+        return [output['text'] for output in outputs]
+
+    def submit(self, prompt: str) -> Future:
+        """Encola un prompt; el Future resuelve al texto generado"""
+        return self.batcher.submit(prompt)
+
+    def generate(self, prompt: str) -> str:
+        """Versión bloqueante: espera a que el lote del prompt termine"""
+        return self.batcher.process(prompt)
+
+    def close(self):
+        self.batcher.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Lotes, prompts y tokens/segundo de generación"""
+        batch_stats = self.batcher.get_stats()
+        with self._stats_lock:
+            stats = dict(self.stats)
+
+        stats['batches'] = batch_stats['batches']
+        stats['prompts'] = batch_stats['items']
+        stats['avg_batch_size'] = batch_stats['avg_batch_size']
+        stats['largest_batch'] = batch_stats['largest_batch']
+        stats['tokens_per_second'] = (
+            stats['generated_tokens'] / stats['generation_time'] if stats['generation_time'] > 0 else 0.0
+        )
+        return stats
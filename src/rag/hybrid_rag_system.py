@@ -7,15 +7,24 @@ import sys
 sys.path.append('.')
 
 from src.embeddings.bge_embeddings import BGEEmbeddings
-from src.rag.vector_store import LocalVectorStore
+from src.rag.store_utils import build_where, create_vector_store, search_with_wheres, sync_vector_store
 from src.rag.curriculum_processor import USCCurriculumProcessor
+from src.rag.colbert_reranker import ColbertIndexedStore, ColbertReranker
+from src.rag.ingestion_pipeline import IngestionPipeline
+from src.rag.intent_classifier import QueryIntentClassifier
+from src.rag.sparse_index import SparseIndex, SparseIndexedStore
+from src.rag.structured_index import CurriculumStructuredIndex
+from src.utils import config
 from typing import Dict, List, Any, Optional
+from pathlib import Path
+import numpy as np
 import time
 from datetime import datetime
 
 # Importar chunking inteligente si está disponible
 try:
     from src.rag.intelligent_chunking import IntelligentCurriculumChunker
+    from llm_utils import get_backend
     INTELLIGENT_CHUNKING_AVAILABLE = True
 except ImportError:
     INTELLIGENT_CHUNKING_AVAILABLE = False
@@ -25,7 +34,16 @@ class HybridUSCCurriculumRAG:
     def __init__(self, 
                  collection_name: str = "usc_curriculum_hybrid",
                  vectorstore_dir: str = "./data/vectorstore",
-                 chunking_mode: str = "auto"):
+                 chunking_mode: str = "auto",
+                 embedding_cache_dir: Optional[str] = config.EMBEDDING_CACHE_DIR,
+                 query_batching: bool = False,
+                 vectorstore_backend: Optional[str] = None,
+                 vectorstore_options: Optional[Dict[str, Any]] = None,
+                 retrieval: str = "dense",
+                 sparse_mode: str = "bm25",
+                 fusion: str = "rrf",
+                 colbert_rerank: bool = False,
+                 colbert_options: Optional[Dict[str, Any]] = None):
         """
         Sistema RAG híbrido con chunking inteligente + estructural
         
@@ -33,10 +51,22 @@ class HybridUSCCurriculumRAG:
             collection_name: Nombre de la colección ChromaDB
             vectorstore_dir: Directorio del vector store
             chunking_mode: "auto", "intelligent", "structural"
+            embedding_cache_dir: Directorio de la caché de embeddings (None = desactivada);
+                                 los vectores se guardan en EMBEDDING_CACHE_DTYPE
+            query_batching: Si True, agrupa consultas concurrentes en un solo encode
+            vectorstore_backend: "chroma" (ChromaDB), "numpy" (índice exacto) o "faiss" (ANN)
+                                 (None = VECTORSTORE_BACKEND de la configuración)
+            vectorstore_options: Opciones del backend (p.ej. {'index_factory': 'HNSW32'})
+            retrieval: "dense" (solo vectores) o "hybrid" (vectores + índice léxico disperso)
+            sparse_mode: "bm25" (sin pasada extra del modelo) o "bge_lexical" (pesos sparse de BGE-M3)
+            fusion: Fusión híbrida, "rrf" (reciprocal rank) o "weighted"
+            colbert_rerank: Si True, reordena los candidatos con MaxSim sobre vectores ColBERT
+            colbert_options: Opciones del reranker (p.ej. {'pq_subspaces': 64, 'candidates': 20})
         """
         
         print("🚀 INICIALIZANDO SISTEMA RAG HÍBRIDO USC")
         print("=" * 45)
+        config.ensure_directories()
         
         # Determinar modo de chunking
         self.chunking_mode = self._determine_chunking_mode(chunking_mode)
@@ -44,18 +74,56 @@ class HybridUSCCurriculumRAG:
         
         # Inicializar componentes base
         print("\n1️⃣ Cargando BGE-M3...")
-        self.embedder = BGEEmbeddings()
+        self.embedder = BGEEmbeddings(cache_dir=embedding_cache_dir, cache_dtype=config.EMBEDDING_CACHE_DTYPE)
+        if query_batching:
+            self.embedder.enable_query_batching()
         
         print("\n2️⃣ Configurando Vector Store...")
-        self.vectorstore = LocalVectorStore(
+        self.vectorstore = create_vector_store(
+            backend=vectorstore_backend,
             collection_name=collection_name,
-            persist_directory=vectorstore_dir
+            persist_directory=vectorstore_dir,
+            **(vectorstore_options or {})
         )
         
+        # Índice léxico junto al denso: cada escritura del store lo mantiene al día
+        self.retrieval = retrieval
+        if retrieval == "hybrid":
+            lexical = sparse_mode == "bge_lexical"
+            self.vectorstore = SparseIndexedStore(
+                self.vectorstore,
+                SparseIndex(Path(vectorstore_dir) / f"{collection_name}_sparse", mode="lexical" if lexical else "bm25"),
+                lexical_fn=self.embedder.embed_lexical if lexical else None,
+                fusion=fusion
+            )
+            print(f"   🔤 Recuperación híbrida: {sparse_mode} + {fusion}")
+        elif retrieval != "dense":
+            raise ValueError(f"❌ Modo de recuperación desconocido: {retrieval}")
+        
+        # Segunda etapa opcional: vectores por token en disco y reranking late-interaction
+        self.colbert_rerank = colbert_rerank
+        if colbert_rerank:
+            options = dict(colbert_options or {})
+            candidates = options.pop('candidates', 20)
+            self.vectorstore = ColbertIndexedStore(
+                self.vectorstore,
+                ColbertReranker(Path(vectorstore_dir) / f"{collection_name}_colbert",
+                                dimension=self.embedder.get_dimension(), **options),
+                colbert_fn=self.embedder.embed_colbert,
+                candidates=candidates
+            )
+            print(f"   🎯 Reranking ColBERT: top-{candidates} candidatos")
+        
         # Inicializar procesador según modo
         print(f"\n3️⃣ Inicializando procesador ({self.chunking_mode})...")
         self._initialize_processor()
         
+        # Respuestas exactas (costos, créditos, semestres) sin búsqueda vectorial
+        self.structured_index = CurriculumStructuredIndex()
+        
+        # Intención de la consulta (filtro y n_results) a partir del embedding de la búsqueda
+        self.intent_classifier = QueryIntentClassifier()
+        
         # Estado del sistema
         self.is_loaded = False
         self.chunks_count = 0
@@ -78,14 +146,16 @@ class HybridUSCCurriculumRAG:
         
         else:  # "auto"
             if INTELLIGENT_CHUNKING_AVAILABLE:
-                # Probar si Ollama está disponible
+                # Solo si el backend configurado (LLM_BACKEND) responde o ya está cargado;
+                # un modelo en proceso sin cargar requiere chunking_mode="intelligent"
                 try:
-                    chunker = IntelligentCurriculumChunker(use_llm=True)
-                    if hasattr(chunker, 'selected_model'):
+                    backend = get_backend()
+                    if backend.is_ready():
+                        print(f"   🤖 Backend LLM disponible: {backend.cache_namespace}")
                         return "intelligent"
                     else:
                         return "structural"
-                except:
+                except Exception:
                     return "structural"
             else:
                 return "structural"
@@ -102,9 +172,21 @@ class HybridUSCCurriculumRAG:
     
     def load_curriculum_data(self, 
                            curriculum_file: str,
-                           force_reload: bool = False) -> bool:
+                           force_reload: bool = False,
+                           incremental: bool = False,
+                           ingest_workers: int = 1,
+                           streaming: bool = False) -> bool:
         """
         Carga datos con chunking híbrido
+        
+        Args:
+            curriculum_file: Ruta al archivo .md de currículums
+            force_reload: Si True, recarga datos aunque ya existan
+            incremental: Si True, sincroniza solo los chunks nuevos/modificados
+                         sin limpiar la colección
+            ingest_workers: Procesos para el chunking estructural (1 = secuencial)
+            streaming: Si True, usa el pipeline parse → embed → upsert por lotes
+                       (memoria constante, consultable antes de terminar)
         """
         
         start_time = time.time()
@@ -113,41 +195,56 @@ class HybridUSCCurriculumRAG:
         print(f"   Archivo: {curriculum_file}")
         
         # Verificar datos existentes
-        current_count = self.vectorstore.collection.count()
-        if current_count > 0 and not force_reload:
+        current_count = self.vectorstore.count()
+        if current_count > 0 and not force_reload and not incremental:
             print(f"   ℹ️  Ya hay {current_count} documentos cargados")
             user_input = input("   ¿Recargar datos? (y/N): ").lower()
             if user_input != 'y':
                 self.is_loaded = True
                 self.chunks_count = current_count
+                self._build_structured_index(curriculum_file)
                 return True
             else:
                 print("   🗑️  Limpiando datos existentes...")
                 self.vectorstore.clear_collection()
         
+        self.structured_index.clear()
+        
+        if streaming:
+            return self._load_curriculum_streaming(curriculum_file, incremental, start_time)
+        
         try:
             # Procesar según modo
             print(f"\n🧠 Aplicando chunking {self.chunking_mode}...")
             
             if self.chunking_mode == "intelligent":
-                chunks = self.processor.process_full_curriculum(curriculum_file)
+                chunks = self.processor.process_full_curriculum_parallel(curriculum_file)
             else:
-                chunks = self.processor.process_curriculum_file(curriculum_file)
+                chunks = self.processor.process_curriculum_file(curriculum_file, workers=ingest_workers)
             
             if not chunks:
                 print("❌ No se pudieron extraer chunks del archivo")
                 return False
             
-            # Crear embeddings
-            print(f"\n🔄 Creando embeddings para {len(chunks)} chunks...")
+            self.structured_index.add_chunks(chunks)
             texts = [chunk['content'] for chunk in chunks]
             metadatas = [chunk['metadata'] for chunk in chunks]
             
-            embeddings = self.embedder.embed_documents(texts)
-            
-            # Almacenar
-            print(f"\n💾 Almacenando en vector store...")
-            success = self.vectorstore.add_documents(texts, metadatas, embeddings)
+            if incremental:
+                # Embeber y almacenar solo el diff contra lo ya indexado
+                print(f"\n🔁 Sincronizando {len(chunks)} chunks con el vector store...")
+                sync_summary = sync_vector_store(
+                    self.vectorstore, texts, metadatas, self.embedder.embed_documents
+                )
+                success = sync_summary['success']
+            else:
+                # Crear embeddings
+                print(f"\n🔄 Creando embeddings para {len(chunks)} chunks...")
+                embeddings = self.embedder.embed_documents(texts)
+                
+                # Almacenar
+                print(f"\n💾 Almacenando en vector store...")
+                success = self.vectorstore.add_documents(texts, metadatas, embeddings)
             
             if success:
                 self.is_loaded = True
@@ -214,10 +311,81 @@ class HybridUSCCurriculumRAG:
             print(f"   Programa: {example['metadata']['program_name']}")
             print(f"   Contenido: {example['content'][:150]}...")
     
+    def _load_curriculum_streaming(self, curriculum_file: str, incremental: bool, start_time: float) -> bool:
+        """Carga con IngestionPipeline: los lotes se escriben a medida que se embeben"""
+        
+        try:
+            if self.chunking_mode == "intelligent":
+                # Los chunks LLM entran al pipeline a medida que se parsean del stream
+                chunk_source = self.processor.iter_curriculum_chunks(curriculum_file)
+            else:
+                chunk_source = self.processor.iter_chunks([curriculum_file])
+            pipeline = IngestionPipeline(
+                self.vectorstore, self.embedder.embed_documents, incremental=incremental
+            )
+            summary = pipeline.run(self.structured_index.observe(chunk_source))
+            
+            if not summary['success']:
+                print("❌ Error en la ingesta en streaming")
+                return False
+            if summary['chunks_seen'] == 0:
+                print("❌ No se pudieron extraer chunks del archivo")
+                return False
+            
+            self.is_loaded = True
+            self.chunks_count = summary['chunks_seen']
+            self.load_time = time.time() - start_time
+            
+            print(f"\n🎉 DATOS CARGADOS EXITOSAMENTE (streaming)")
+            print(f"   Chunks procesados: {self.chunks_count}")
+            print(f"   Lotes escritos: {summary['batches']}")
+            print(f"   Modo usado: {self.chunking_mode}")
+            print(f"   Tiempo de carga: {self.load_time:.2f}s")
+            
+            return True
+            
+        except Exception as e:
+            print(f"❌ Error cargando datos: {e}")
+            return False
+    
+    def _build_structured_index(self, curriculum_file: str):
+        """Reconstruye el índice estructurado cuando se reutilizan datos ya cargados"""
+        
+        try:
+            self.structured_index.clear()
+            self.structured_index.add_chunks(USCCurriculumProcessor(verbose=False).iter_chunks([curriculum_file]))
+            print(f"   📇 Índice estructurado: {len(self.structured_index)} programas")
+        except Exception as e:
+            print(f"   ⚠️  Índice estructurado no disponible: {e}")
+    
+    def _structured_answer(self, query: str) -> Optional[Dict[str, Any]]:
+        """Respuesta exacta desde el índice estructurado, en el formato de search_curriculum"""
+        
+        start_time = time.time()
+        answer = self.structured_index.lookup(query)
+        if answer is None:
+            return None
+        
+        processed_results = self._process_search_results(answer['results'], query)
+        print(f"\n📇 Respuesta exacta: {answer['program_name']} ({answer['intent']})")
+        
+        return {
+            'success': True,
+            'query': query,
+            'results': processed_results,
+            'total_found': len(processed_results),
+            'search_time': time.time() - start_time,
+            'filter_applied': None,
+            'detected_type': answer['intent'],
+            'search_strategy': 'structured_index'
+        }
+    
     def search_curriculum(self, 
                          query: str, 
                          n_results: int = 5,
-                         filter_type: Optional[str] = None) -> Dict[str, Any]:
+                         filter_type: Optional[str] = None,
+                         program_name: Optional[str] = None,
+                         query_embedding: Optional[np.ndarray] = None) -> Dict[str, Any]:
         """Búsqueda con resultados mejorados por chunking híbrido"""
         
         if not self.is_loaded:
@@ -228,23 +396,25 @@ class HybridUSCCurriculumRAG:
         
         print(f"\n🔍 BÚSQUEDA HÍBRIDA ({self.chunking_mode})")
         print(f"   Query: '{query}'")
+        if program_name:
+            print(f"   Programa: {program_name}")
         
         start_time = time.time()
         
         try:
             # Crear embedding
-            query_embedding = self.embedder.embed_query(query)
-            
-            # Búsqueda con filtro opcional
-            search_params = {}
-            if filter_type:
-                search_params['where'] = {'type': filter_type}
+            if query_embedding is None:
+                query_embedding = self.embedder.embed_query(query)
             
-            results = self.vectorstore.search(
-                query_embedding, 
-                n_results=n_results,
-                **search_params
-            )
+            # Búsqueda con filtros opcionales de tipo y programa
+            where = build_where(filter_type, program_name)
+            n_candidates = max(n_results, self.vectorstore.candidates) if self.colbert_rerank else n_results
+            if self.retrieval == "hybrid":
+                results = self.vectorstore.search_hybrid(query, query_embedding, n_results=n_candidates, where=where)
+            else:
+                results = self.vectorstore.search(query_embedding, n_results=n_candidates, where=where)
+            if self.colbert_rerank:
+                results = self.vectorstore.rerank(query, results, n_results=n_results)
             
             # Procesar resultados
             processed_results = self._process_search_results(results, query)
@@ -258,7 +428,9 @@ class HybridUSCCurriculumRAG:
                 'total_found': len(processed_results),
                 'search_time': search_time,
                 'chunking_mode': self.chunking_mode,
-                'filter_applied': filter_type
+                'filter_applied': filter_type,
+                'program_filter': program_name,
+                'retrieval': self.retrieval
             }
             
         except Exception as e:
@@ -268,34 +440,114 @@ class HybridUSCCurriculumRAG:
                 'error': str(e)
             }
     
-    def smart_search(self, query: str) -> Dict[str, Any]:
-        """Búsqueda inteligente mejorada por chunking híbrido"""
+    def search_many(self, 
+                    queries: List[str], 
+                    n_results: int = 5,
+                    filter_type: Optional[str] = None,
+                    program_names: Optional[List[Optional[str]]] = None) -> List[Dict[str, Any]]:
+        """
+        Busca varias consultas con un solo encode y una sola búsqueda vectorial
         
-        # Detectar tipo de consulta
-        query_lower = query.lower()
+        Args:
+            queries: Consultas del usuario
+            n_results: Número de resultados por consulta
+            filter_type: Filtro por tipo de chunk aplicado a todas las consultas
+            program_names: Programa canónico por consulta (None = sin filtro de programa)
+            
+        Returns:
+            Lista de resultados con el mismo formato que search_curriculum
+        """
         
-        detected_type = None
-        search_params = {'n_results': 5}
+        if not self.is_loaded:
+            return [{
+                'success': False,
+                'error': 'Datos no cargados. Ejecuta load_curriculum_data() primero.'
+            } for _ in queries]
         
-        if any(word in query_lower for word in ['costo', 'precio', 'fee', 'cuánto', 'valor']):
-            detected_type = 'fee'
-            search_params['filter_type'] = 'fee'
-            search_params['n_results'] = 10
+        print(f"\n🔍 BÚSQUEDA MÚLTIPLE HÍBRIDA ({self.chunking_mode})")
+        print(f"   Consultas: {len(queries)}")
+        if filter_type:
+            print(f"   Filtro: {filter_type}")
+        
+        start_time = time.time()
+        
+        try:
+            # 1. Embeddings de todas las consultas en un solo lote
+            query_embeddings = self.embedder.embed_queries(queries)
             
-        elif any(word in query_lower for word in ['trabajo', 'laboral', 'ocupacional', 'desempeñar', 'campo']):
-            detected_type = 'occupational_profile'
-            search_params['filter_type'] = 'occupational_profile'
+            # 2. Una búsqueda multi-consulta (los filtros por programa se combinan con $in)
+            names = program_names or [None] * len(queries)
+            wheres = [build_where(filter_type, name) for name in names]
+            n_candidates = max(n_results, self.vectorstore.candidates) if self.colbert_rerank else n_results
+            if self.retrieval == "hybrid":
+                batch_results = self.vectorstore.search_hybrid_batch(
+                    queries, list(query_embeddings), n_results=n_candidates, wheres=wheres
+                )
+            else:
+                batch_results = search_with_wheres(
+                    self.vectorstore, list(query_embeddings), wheres, n_results=n_candidates
+                )
+            if self.colbert_rerank:
+                batch_results = self.vectorstore.rerank_batch(queries, batch_results, n_results=n_results)
+            
+            search_time = time.time() - start_time
+            
+            # 3. Procesar resultados por consulta
+            responses = []
+            for query, name, results in zip(queries, names, batch_results):
+                processed_results = self._process_search_results(results, query)
+                responses.append({
+                    'success': True,
+                    'query': query,
+                    'results': processed_results,
+                    'total_found': len(processed_results),
+                    'search_time': search_time,
+                    'chunking_mode': self.chunking_mode,
+                    'filter_applied': filter_type,
+                    'program_filter': name,
+                    'retrieval': self.retrieval
+                })
+            
+            return responses
             
-        elif any(word in query_lower for word in ['materia', 'semestre', 'curriculum', 'plan', 'asignatura']):
-            detected_type = 'curriculum'
-            search_params['n_results'] = 8
+        except Exception as e:
+            print(f"❌ Error en búsqueda múltiple: {e}")
+            return [{
+                'success': False,
+                'error': str(e)
+            } for _ in queries]
+    
+    def smart_search(self, query: str) -> Dict[str, Any]:
+        """Búsqueda inteligente mejorada por chunking híbrido"""
+        
+        # Costos, créditos y semestres de un programa: respuesta exacta sin vectores
+        structured = self._structured_answer(query)
+        if structured is not None:
+            return structured
+        
+        # Programa mencionado: la búsqueda vectorial se restringe a sus chunks
+        program_name = self.structured_index.resolve_program(query)
+        
+        # Intención por centroides sobre el mismo embedding que usa la búsqueda (sin encode extra)
+        query_embedding = self.embedder.embed_query(query)
+        self.intent_classifier.ensure_fitted(self.embedder.embed_queries)
+        route = self.intent_classifier.route(query_embedding, program_name)
+        detected_type = route['intent'] if route['intent'] != 'general' else None
         
         # Realizar búsqueda
-        results = self.search_curriculum(query, **search_params)
+        results = self.search_curriculum(
+            query,
+            n_results=route['n_results'],
+            filter_type=route['filter_type'],
+            program_name=program_name,
+            query_embedding=query_embedding
+        )
         
         # Agregar información de detección
         if results['success']:
             results['detected_type'] = detected_type
+            results['intent_confidence'] = route['confidence']
+            results['detected_program'] = program_name
             results['search_strategy'] = f'smart_detection_{self.chunking_mode}'
             
             print(f"   🎯 Tipo detectado: {detected_type or 'general'}")
@@ -321,20 +573,33 @@ class HybridUSCCurriculumRAG:
         print(f"   Programas: {', '.join(programs)}")
         print(f"   Aspecto: {comparison_aspect}")
         
-        comparison_results = {}
+        found = {}
         
+        # Primero el índice estructurado; solo lo que no resuelve va a vectores
         for program in programs:
-            query = f"{program} {comparison_aspect}"
-            results = self.search_curriculum(
-                query, 
+            exact = self.structured_index.lookup_aspect(program, comparison_aspect)
+            if exact is not None:
+                found[program] = self._process_search_results(exact, program)[0]
+        
+        pending = [program for program in programs if program not in found]
+        if pending:
+            # Nombre canónico → filtro where por programa en lugar de adivinar por embedding
+            resolved = [self.structured_index.resolve_program(program) for program in pending]
+            queries = [f"{name or program} {comparison_aspect}" for program, name in zip(pending, resolved)]
+            
+            # Todas las consultas en un solo encode
+            all_results = self.search_many(
+                queries, 
                 n_results=3,
-                filter_type=comparison_aspect if comparison_aspect != 'curriculum' else None
+                filter_type=comparison_aspect if comparison_aspect != 'curriculum' else None,
+                program_names=resolved
             )
             
-            if results['success'] and results['results']:
-                comparison_results[program] = results['results'][0]
-            else:
-                comparison_results[program] = None
+            for program, results in zip(pending, all_results):
+                if results['success'] and results['results']:
+                    found[program] = results['results'][0]
+        
+        comparison_results = {program: found.get(program) for program in programs}
         
         return {
             'comparison_aspect': comparison_aspect,
@@ -417,6 +682,8 @@ class HybridUSCCurriculumRAG:
             'chunking_mode': self.chunking_mode,
             'intelligent_available': INTELLIGENT_CHUNKING_AVAILABLE,
             'vectorstore_stats': vectorstore_stats,
+            'structured_index': self.structured_index.get_stats(),
+            'intent_classifier': self.intent_classifier.get_stats(),
             'embedder_info': self.embedder.get_model_info()
         }
         
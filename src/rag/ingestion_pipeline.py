@@ -0,0 +1,210 @@
+"""
+Pipeline de ingesta en streaming: chunks → embeddings → vector store
+Cada etapa corre en su propio hilo y se comunican por colas acotadas,
+así la memoria no crece con el tamaño del catálogo y los primeros chunks
+son consultables antes de que termine la carga
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from src.rag.store_utils import ChunkIdAssigner, deferred_writes
+
+_DONE = object()  # Señal de fin entre etapas
+
+
+class IngestionPipeline:
+    def __init__(self,
+                 vectorstore,
+                 embed_fn: Callable[[List[str]], np.ndarray],
+                 batch_size: int = 32,
+                 queue_size: int = 4,
+                 incremental: bool = False):
+        """
+        Args:
+            vectorstore: Vector store con upsert_documents (y get_ids / delete_documents si incremental)
+            embed_fn: Función que crea embeddings para una lista de textos
+            batch_size: Chunks por lote de embeddings / escritura
+            queue_size: Lotes máximos en espera entre etapas (limita la memoria)
+            incremental: Si True, omite chunks ya indexados y al final elimina los obsoletos
+        """
+
+        if batch_size < 1 or queue_size < 1:
+            raise ValueError("❌ batch_size y queue_size deben ser >= 1")
+
+        self.vectorstore = vectorstore
+        self.embed_fn = embed_fn
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.incremental = incremental
+
+        self._stop = threading.Event()
+        self._errors: List[BaseException] = []
+
+    def _put(self, target: queue.Queue, item) -> bool:
+        """put bloqueante que se rinde si otra etapa falló"""
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, source: queue.Queue):
+        while not self._stop.is_set():
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _fail(self, error: BaseException):
+        self._errors.append(error)
+        self._stop.set()
+
+    def _chunk_stage(self, chunks: Iterable[Dict[str, Any]], to_embed: queue.Queue,
+                     existing_ids: Optional[set], stats: Dict[str, Any]):
+        """Etapa 1: consume el generador de chunks, asigna IDs y arma lotes"""
+        assigner = ChunkIdAssigner()
+        batch = {'texts': [], 'metadatas': [], 'ids': []}
+
+        try:
+            for chunk in chunks:
+                if self._stop.is_set():
+                    return
+                chunk_id = assigner.assign(chunk['content'], chunk['metadata'])
+                stats['chunks_seen'] += 1
+
+                if existing_ids is not None:
+                    stats['seen_ids'].add(chunk_id)
+                    if chunk_id in existing_ids:
+                        stats['chunks_unchanged'] += 1
+                        continue
+
+                batch['texts'].append(chunk['content'])
+                batch['metadatas'].append(chunk['metadata'])
+                batch['ids'].append(chunk_id)
+
+                if len(batch['ids']) >= self.batch_size:
+                    if not self._put(to_embed, batch):
+                        return
+                    stats['max_embed_queue'] = max(stats['max_embed_queue'], to_embed.qsize())
+                    batch = {'texts': [], 'metadatas': [], 'ids': []}
+
+            if batch['ids']:
+                self._put(to_embed, batch)
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._put(to_embed, _DONE)
+
+    def _embed_stage(self, to_embed: queue.Queue, to_write: queue.Queue, stats: Dict[str, Any]):
+        """Etapa 2: embebe cada lote"""
+        try:
+            while True:
+                batch = self._get(to_embed)
+                if batch is _DONE:
+                    break
+
+                start = time.perf_counter()
+                batch['embeddings'] = self.embed_fn(batch['texts'])
+                stats['embed_time'] += time.perf_counter() - start
+
+                if not self._put(to_write, batch):
+                    break
+                stats['max_write_queue'] = max(stats['max_write_queue'], to_write.qsize())
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._put(to_write, _DONE)
+
+    def run(self, chunks: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Ejecuta el pipeline completo; la escritura ocurre en el hilo que llama
+
+        Returns:
+            Resumen con conteos, tiempos por etapa y tiempo hasta la primera escritura
+        """
+
+        self._stop.clear()
+        self._errors = []
+        start_time = time.perf_counter()
+
+        existing_ids = self.vectorstore.get_ids() if self.incremental else None
+        stats = {
+            'chunks_seen': 0,
+            'chunks_written': 0,
+            'chunks_unchanged': 0,
+            'deleted': 0,
+            'batches': 0,
+            'embed_time': 0.0,
+            'write_time': 0.0,
+            'time_to_first_write': None,
+            'max_embed_queue': 0,
+            'max_write_queue': 0,
+            'seen_ids': set(),
+        }
+
+        to_embed: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        to_write: queue.Queue = queue.Queue(maxsize=self.queue_size)
+
+        stages = [
+            threading.Thread(target=self._chunk_stage, args=(chunks, to_embed, existing_ids, stats),
+                             name="ingest-chunks", daemon=True),
+            threading.Thread(target=self._embed_stage, args=(to_embed, to_write, stats),
+                             name="ingest-embed", daemon=True),
+        ]
+        for stage in stages:
+            stage.start()
+
+        print(f"🚰 Pipeline de ingesta: lotes de {self.batch_size}, colas de {self.queue_size}")
+
+        # Los lotes se agregan en memoria y el store se guarda una sola vez al final
+        with deferred_writes(self.vectorstore):
+            try:
+                while True:
+                    batch = self._get(to_write)
+                    if batch is _DONE:
+                        break
+
+                    start = time.perf_counter()
+                    if not self.vectorstore.upsert_documents(
+                        batch['texts'], batch['metadatas'], batch['embeddings'], ids=batch['ids']
+                    ):
+                        raise RuntimeError("❌ El vector store rechazó un lote")
+                    stats['write_time'] += time.perf_counter() - start
+
+                    stats['batches'] += 1
+                    stats['chunks_written'] += len(batch['ids'])
+                    if stats['time_to_first_write'] is None:
+                        stats['time_to_first_write'] = time.perf_counter() - start_time
+            except Exception as e:
+                self._fail(e)
+
+            for stage in stages:
+                stage.join()
+
+            seen_ids = stats.pop('seen_ids')
+            if self.incremental and not self._errors:
+                # Los obsoletos se eliminan al final: la colección responde durante toda la carga
+                stale_ids = sorted(existing_ids - seen_ids)
+                if stale_ids and not self.vectorstore.delete_documents(stale_ids):
+                    self._errors.append(RuntimeError("❌ No se pudieron eliminar chunks obsoletos"))
+                stats['deleted'] = len(stale_ids)
+
+        stats['total_time'] = time.perf_counter() - start_time
+        stats['success'] = not self._errors
+        if self._errors:
+            stats['error'] = str(self._errors[0])
+            print(f"❌ Pipeline de ingesta falló: {self._errors[0]}")
+        else:
+            print(f"✅ Pipeline de ingesta: {stats['chunks_written']} escritos, "
+                  f"{stats['chunks_unchanged']} sin cambios, {stats['deleted']} eliminados "
+                  f"en {stats['total_time']:.2f}s (primer lote en {stats['time_to_first_write'] or 0:.2f}s)")
+
+        return stats
@@ -1,49 +1,70 @@
-import re
-import json
-from typing import List, Dict, Any, Tuple
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import queue
+import threading
 
-from llm_utils import generate_response  # ✅ nuevo import
+from llm_utils import get_backend  # ✅ nuevo import
+from src.llm.backends import LLMBackend
+from src.rag.generation_scheduler import GenerationScheduler
+from src.rag.json_stream import StreamingJSONChunkParser
+from src.rag.llm_cache import LLMResponseCache
+from src.rag.patterns import STRUCTURAL_PATTERNS, split_sections
+
+_PROGRAM_DONE = object()  # Fin de los chunks de un programa
 
 class IntelligentCurriculumChunker:
-    def __init__(self, use_llm: bool = True, max_workers: int = 4):
+    def __init__(self, use_llm: bool = True, max_workers: int = 4,
+                 llm_batch_size: int = 4, llm_max_wait_ms: float = 50.0,
+                 llm_cache_path: Optional[str] = "./data/llm_cache/responses.sqlite",
+                 llm_streaming: bool = False,
+                 llm_backend: Optional[LLMBackend] = None):
         self.use_llm = use_llm
+        # Backend configurado (LLM_BACKEND) salvo que se inyecte uno
+        self.llm_backend = (llm_backend or get_backend()) if use_llm else None
+        self.llm_streaming = llm_streaming  # Streaming con parseo JSON incremental (sin lotes)
         self.max_workers = max_workers
+        self.llm_batch_size = llm_batch_size
+        self.llm_max_wait_ms = llm_max_wait_ms
+        self.scheduler = None  # Se crea en iter_curriculum_chunks si llm_batch_size > 1
+        self.llm_generation_params = {'max_tokens': 1024, 'temperature': 0.1, 'top_p': 0.9}
+        # Respuestas por (modelo, parámetros, hash del prompt): un programa sin cambios no regenera
+        self.llm_cache = LLMResponseCache(llm_cache_path) if use_llm and llm_cache_path else None
         self.fallback_to_structural = True
-        self.structural_patterns = {
-            'program_header': r'### ([^\n]+)',
-            'fee': r'\*\*Costo Matricula:\*\* \$([0-9,\.]+) \(💰cop\)',
-            'occupational_profile': r'\*\*Perfil Ocupacional:\*\*\s*(.*?)(?=\*\*Curriculo:|$)',
-            'curriculum_start': r'\*\*Curriculo:\*\*',
-            'semester': r'#### Semestre ([IVX\d]+)\s*\n((?:- .+\n)*)',
-            'subject': r'- ([^|]+) \| (\d+) Créditos'
-        }
+        self.structural_patterns = STRUCTURAL_PATTERNS  # Precompiladas en patterns.py
         self.stats = {
             'llm_chunks': 0,
             'structural_chunks': 0,
             'hybrid_chunks': 0,
+            'llm_cache_hits': 0,
+            'llm_cache_misses': 0,
+            'llm_malformed_chunks': 0,
+            'llm_streamed_chars': 0,
             'processing_time': 0
         }
+        self._stats_lock = threading.Lock()  # Los hilos de iter_curriculum_chunks comparten stats
         print("🧠 Chunker Inteligente inicializado")
         print(f"   🤖 Modo LLM: {'✅' if use_llm else '❌'}")
 
     def chunk_program_intelligently(self, program_text: str, program_name: str) -> List[Dict[str, Any]]:
+        if self.use_llm and self.llm_streaming:
+            return list(self.iter_program_chunks(program_text, program_name))
+
         print(f"🧠 Analizando programa: {program_name}")
 
         structural_chunks = self._structural_chunking(program_text, program_name)
-        self.stats['structural_chunks'] += len(structural_chunks)
+        self._add_stat('structural_chunks', len(structural_chunks))
 
         llm_chunks = []
         if self.use_llm:
             llm_chunks = self._llm_semantic_chunking(program_text, program_name)
             if llm_chunks:
-                self.stats['llm_chunks'] += len(llm_chunks)
+                self._add_stat('llm_chunks', len(llm_chunks))
                 print(f"   🤖 LLM generó: {len(llm_chunks)} chunks semánticos")
 
         if llm_chunks and structural_chunks:
             hybrid_chunks = self._merge_chunks_intelligently(llm_chunks, structural_chunks)
-            self.stats['hybrid_chunks'] += len(hybrid_chunks)
+            self._add_stat('hybrid_chunks', len(hybrid_chunks))
             print(f"   🔄 Fusión híbrida: {len(hybrid_chunks)} chunks finales")
             return hybrid_chunks
         elif llm_chunks:
@@ -53,9 +74,56 @@ class IntelligentCurriculumChunker:
             print(f"   📋 Fallback estructural: {len(structural_chunks)} chunks")
             return structural_chunks
 
-    def _llm_semantic_chunking(self, program_text: str, program_name: str) -> List[Dict[str, Any]]:
-        print(f"   🤖 Generando chunks con modelo HuggingFace (Mistral)...")
+    def iter_program_chunks(self, program_text: str, program_name: str) -> Iterator[Dict[str, Any]]:
+        """
+        Versión en streaming de chunk_program_intelligently
 
+        Cada chunk LLM sale en cuanto su objeto JSON se cierra; los estructurales
+        que el LLM no cubrió salen al final (mismo resultado que la fusión híbrida).
+        """
+        print(f"🧠 Analizando programa: {program_name}")
+
+        structural_chunks = self._structural_chunking(program_text, program_name)
+        self._add_stat('structural_chunks', len(structural_chunks))
+
+        covered = set()
+        llm_count = 0
+        if self.use_llm:
+            llm_chunks = (self.iter_llm_semantic_chunks(program_text, program_name) if self.llm_streaming
+                          else self._llm_semantic_chunking(program_text, program_name))
+            try:
+                for chunk in llm_chunks:
+                    covered.add((chunk['metadata']['type'], chunk['metadata'].get('program_name')))
+                    llm_count += 1
+                    yield chunk
+            except Exception as e:
+                # Los chunks ya emitidos se conservan; el resto lo cubre el fallback estructural
+                print(f"   ❌ Error generando respuesta con el LLM: {e}")
+            if llm_count:
+                self._add_stat('llm_chunks', llm_count)
+                print(f"   🤖 LLM generó: {llm_count} chunks semánticos")
+
+        if not llm_count:
+            print(f"   📋 Fallback estructural: {len(structural_chunks)} chunks")
+            yield from structural_chunks
+            return
+
+        fallback_chunks = [
+            c for c in structural_chunks
+            if (c['metadata']['type'], c['metadata']['program_name']) not in covered
+        ]
+        if structural_chunks:
+            for struct_chunk in fallback_chunks:
+                struct_chunk['metadata']['source'] = 'structural_fallback'
+            self._add_stat('hybrid_chunks', llm_count + len(fallback_chunks))
+            print(f"   🔄 Fusión híbrida: {llm_count + len(fallback_chunks)} chunks finales")
+        yield from fallback_chunks
+
+    def _add_stat(self, key: str, value: int):
+        with self._stats_lock:
+            self.stats[key] += value
+
+    def _build_llm_prompt(self, program_text: str, program_name: str) -> str:
         prompt = f"""
 Eres un experto en análisis de documentos académicos. Analiza este programa universitario y divide el contenido en chunks semánticamente coherentes.
 
@@ -88,32 +156,92 @@ FORMATO DE RESPUESTA (JSON):
 
 Responde SOLO con el JSON válido:
 """
+        return prompt
+
+    def _to_llm_chunk(self, chunk: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Normaliza un chunk del JSON del LLM; None si le faltan campos"""
+        if not isinstance(chunk, dict) or 'content' not in chunk or 'type' not in chunk:
+            self._add_stat('llm_malformed_chunks', 1)
+            return None
+        return {
+            'content': chunk['content'],
+            'metadata': {
+                **chunk.get('metadata', {}),
+                'type': chunk['type'],
+                'llm_generated': True,
+                'confidence': 0.9,
+                'attempt': 1
+            }
+        }
 
+    def _cached_llm_output(self, prompt: str) -> Optional[str]:
+        if self.llm_cache is None:
+            return None
+        llm_output = self.llm_cache.get(self.llm_backend.cache_namespace, self.llm_generation_params, prompt)
+        self._add_stat('llm_cache_hits' if llm_output is not None else 'llm_cache_misses', 1)
+        if llm_output is not None:
+            print("   💾 Respuesta LLM desde caché")
+        return llm_output
+
+    def iter_llm_semantic_chunks(self, program_text: str, program_name: str) -> Iterator[Dict[str, Any]]:
+        """
+        Genera en streaming y emite cada chunk en cuanto su objeto JSON se cierra
+
+        La generación se corta al cerrarse el objeto de nivel superior, así que
+        no se gastan tokens en texto sobrante y el consumidor puede ir embebiendo.
+        """
+        prompt = self._build_llm_prompt(program_text, program_name)
+        llm_output = self._cached_llm_output(prompt)
+        from_cache = llm_output is not None
+
+        fragments = iter([llm_output]) if from_cache else self.llm_backend.stream(prompt, **self.llm_generation_params)
+        parser = StreamingJSONChunkParser()
         try:
-            llm_output = generate_response(prompt, max_tokens=1024)
-            json_match = re.search(r'\{.*\}', llm_output, re.DOTALL)
-            if json_match:
-                chunks_data = json.loads(json_match.group())
-                processed_chunks = []
-                for chunk in chunks_data.get('chunks', []):
-                    processed_chunk = {
-                        'content': chunk['content'],
-                        'metadata': {
-                            **chunk.get('metadata', {}),
-                            'type': chunk['type'],
-                            'llm_generated': True,
-                            'confidence': 0.9,
-                            'attempt': 1
-                        }
-                    }
-                    processed_chunks.append(processed_chunk)
-                print(f"   ✅ LLM (HF) generó: {len(processed_chunks)} chunks")
+            for fragment in fragments:
+                for chunk in parser.feed(fragment):
+                    llm_chunk = self._to_llm_chunk(chunk)
+                    if llm_chunk:
+                        yield llm_chunk
+                if parser.done:
+                    break
+        finally:
+            # Cerrar el stream detiene la generación en el siguiente token
+            if hasattr(fragments, 'close'):
+                fragments.close()
+
+        self._add_stat('llm_streamed_chars', len(parser.consumed_text))
+        if not from_cache and self.llm_cache is not None and parser.result() is not None:
+            self.llm_cache.put(self.llm_backend.cache_namespace, self.llm_generation_params, prompt, parser.consumed_text)
+
+    def _llm_semantic_chunking(self, program_text: str, program_name: str) -> List[Dict[str, Any]]:
+        print(f"   🤖 Generando chunks con {self.llm_backend.cache_namespace}...")
+
+        prompt = self._build_llm_prompt(program_text, program_name)
+
+        try:
+            llm_output = self._cached_llm_output(prompt)
+            from_cache = llm_output is not None
+            if not from_cache:
+                if self.scheduler is not None:
+                    llm_output = self.scheduler.generate(prompt)
+                else:
+                    llm_output = self.llm_backend.generate(prompt, **self.llm_generation_params)
+
+            # Mismo parser incremental: recupera los chunks completos aunque la salida esté truncada
+            parser = StreamingJSONChunkParser()
+            raw_chunks = parser.feed(llm_output)
+            if raw_chunks or parser.done:
+                processed_chunks = [c for c in map(self._to_llm_chunk, raw_chunks) if c]
+                # Solo se guardan respuestas completas que se pudieron interpretar
+                if self.llm_cache is not None and not from_cache and parser.result() is not None:
+                    self.llm_cache.put(self.llm_backend.cache_namespace, self.llm_generation_params, prompt, parser.consumed_text)
+                print(f"   ✅ LLM generó: {len(processed_chunks)} chunks")
                 return processed_chunks
             else:
                 print("   ⚠️ No se encontró un JSON válido en la respuesta del modelo.")
                 return []
         except Exception as e:
-            print(f"   ❌ Error generando respuesta con Hugging Face: {e}")
+            print(f"   ❌ Error generando respuesta con el LLM: {e}")
             return []
 
     def _structural_chunking(self, program_text: str, program_name: str) -> List[Dict[str, Any]]:
@@ -130,7 +258,7 @@ Responde SOLO con el JSON válido:
         }
         chunks.append(complete_chunk)
 
-        fee_match = re.search(self.structural_patterns['fee'], program_text)
+        fee_match = self.structural_patterns['fee'].search(program_text)
         if fee_match:
             fee_amount_str = fee_match.group(1).replace(',', '').replace('.', '')
             fee_amount = int(fee_amount_str) if fee_amount_str.isdigit() else 0
@@ -145,7 +273,7 @@ Responde SOLO con el JSON válido:
                 }
             })
 
-        profile_match = re.search(self.structural_patterns['occupational_profile'], program_text, re.DOTALL)
+        profile_match = self.structural_patterns['occupational_profile'].search(program_text)
         if profile_match:
             chunks.append({
                 'content': f"{program_name} - Perfil Ocupacional\n\n{profile_match.group(1).strip()}",
@@ -170,9 +298,9 @@ Responde SOLO con el JSON válido:
                 }
             })
 
-        semester_matches = re.findall(self.structural_patterns['semester'], program_text)
+        semester_matches = self.structural_patterns['semester'].findall(program_text)
         for semester_num, semester_content in semester_matches:
-            subjects = re.findall(self.structural_patterns['subject'], semester_content)
+            subjects = self.structural_patterns['subject'].findall(semester_content)
             if subjects:
                 total_credits = sum(int(credits) for _, credits in subjects)
                 semester_text = f"{program_name} - Semestre {semester_num}\n\nTotal materias: {len(subjects)}\nTotal créditos: {total_credits}\n\n"
@@ -207,6 +335,16 @@ Responde SOLO con el JSON válido:
         return merged
 
     def process_full_curriculum_parallel(self, file_path: str) -> List[Dict[str, Any]]:
+        return list(self.iter_curriculum_chunks(file_path))
+
+    def iter_curriculum_chunks(self, file_path: str) -> Iterator[Dict[str, Any]]:
+        """
+        Chunks de todo el archivo en orden de programa, a medida que se generan
+
+        Los programas se procesan en paralelo; cada hilo deja sus chunks en su
+        propia cola y aquí se emiten en orden, así el pipeline de ingesta puede
+        embeber los del primer programa mientras el LLM sigue con los demás.
+        """
         start_time = datetime.now()
         print(f"🧠 PROCESANDO CON CHUNKING INTELIGENTE PARALIZADO")
         print(f"   📄 Archivo: {file_path}")
@@ -215,25 +353,63 @@ Responde SOLO con el JSON válido:
                 content = f.read()
         except Exception as e:
             print(f"❌ Error leyendo archivo: {e}")
-            return []
+            return
 
         programs = self._extract_programs(content)
         print(f"   Total programas extraídos: {len(programs)}")
 
-        all_chunks = []
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            future_to_program = {
-                executor.submit(self.chunk_program_intelligently, p[1], p[0]): p for p in programs
-            }
+        # Los hilos comparten un planificador que agrupa sus prompts en lotes padded
+        if self.use_llm and self.llm_batch_size > 1 and not self.llm_streaming:
+            self.scheduler = GenerationScheduler(
+                self.llm_backend.generate_batch,
+                max_batch_size=self.llm_batch_size,
+                max_wait_ms=self.llm_max_wait_ms,
+                **self.llm_generation_params
+            )
+
+        stop = threading.Event()
+
+        def drain(program_text: str, program_name: str, out: queue.Queue):
+            count = 0
+            try:
+                for chunk in self.iter_program_chunks(program_text, program_name):
+                    if stop.is_set():
+                        return
+                    out.put(chunk)
+                    count += 1
+                print(f"   ✅ Procesado: {program_name} -> {count} chunks")
+            except Exception as e:
+                print(f"   ❌ Error procesando {program_name}: {e}")
+            finally:
+                out.put(_PROGRAM_DONE)
+
+        total_chunks = 0
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                outputs = [queue.Queue() for _ in programs]
+                for (program_name, program_text), out in zip(programs, outputs):
+                    executor.submit(drain, program_text, program_name, out)
 
-            for future in as_completed(future_to_program):
-                program_name = future_to_program[future][0]
+                # Se emiten en orden de programa (no de llegada) para que el orden de chunks sea determinista
                 try:
-                    chunks = future.result()
-                    all_chunks.extend(chunks)
-                    print(f"   ✅ Procesado: {program_name} -> {len(chunks)} chunks")
-                except Exception as e:
-                    print(f"   ❌ Error procesando {program_name}: {e}")
+                    for out in outputs:
+                        for chunk in iter(out.get, _PROGRAM_DONE):
+                            total_chunks += 1
+                            yield chunk
+                finally:
+                    # Si el consumidor se detiene, los hilos dejan de generar
+                    stop.set()
+        finally:
+            if self.scheduler is not None:
+                self.scheduler.close()
+                generation_stats = self.scheduler.get_stats()
+                self.scheduler = None
+                self.stats['llm_batches'] = generation_stats['batches']
+                self.stats['llm_avg_batch_size'] = generation_stats['avg_batch_size']
+                self.stats['llm_tokens_per_second'] = generation_stats['tokens_per_second']
+
+        lookups = self.stats['llm_cache_hits'] + self.stats['llm_cache_misses']
+        self.stats['llm_cache_hit_rate'] = self.stats['llm_cache_hits'] / lookups if lookups else 0.0
 
         end_time = datetime.now()
         self.stats['processing_time'] = (end_time - start_time).total_seconds()
@@ -243,42 +419,29 @@ Responde SOLO con el JSON válido:
         print(f"   Chunks LLM: {self.stats['llm_chunks']}")
         print(f"   Chunks estructurales: {self.stats['structural_chunks']}")
         print(f"   Chunks híbridos: {self.stats['hybrid_chunks']}")
-        print(f"   Total chunks: {len(all_chunks)}")
+        print(f"   Total chunks: {total_chunks}")
         print(f"   Tiempo total: {self.stats['processing_time']:.2f}s")
-
-        return all_chunks
+        if 'llm_tokens_per_second' in self.stats:
+            print(f"   Lotes LLM: {self.stats['llm_batches']} (media {self.stats['llm_avg_batch_size']:.1f} prompts)")
+            print(f"   Tokens/s LLM: {self.stats['llm_tokens_per_second']:.1f}")
+        if self.llm_cache is not None:
+            print(f"   Caché LLM: {self.stats['llm_cache_hits']} aciertos / {lookups} consultas "
+                  f"({self.stats['llm_cache_hit_rate']:.0%})")
 
     def _extract_programs(self, content: str) -> List[Tuple[str, str]]:
         programs = []
         print("🔍 Analizando estructura del archivo...")
 
-        tech_patterns = [
-            r'## PROGRAMAS DE TECNOLOGIA\s*\n(.*?)(?=## ESTUDIOS DE PREGRADO|\Z)',
-            r'## PROGRAMAS DE TECNOLOGIA(.*?)(?=## ESTUDIOS DE PREGRADO|\Z)'
-        ]
+        # Un solo recorrido de encabezados en lugar de varios escaneos DOTALL del archivo
+        sections = split_sections(content)
 
-        undergrad_patterns = [
-            r'## ESTUDIOS DE PREGRADO\s*\n(.*?)$',
-            r'## ESTUDIOS DE PREGRADO(.*?)$',
-            r'## ESTUDIOS DE PREGRADO\s*\n(.*?)(?=\Z)',
-            r'##\s*ESTUDIOS\s*DE\s*PREGRADO\s*\n(.*?)$'
-        ]
+        tech_match = sections.get('technology')
+        if tech_match is not None:
+            print("   ✔ Sección PROGRAMAS DE TECNOLOGIA encontrada")
 
-        tech_match = None
-        for pattern in tech_patterns:
-            m = re.search(pattern, content, re.DOTALL | re.IGNORECASE)
-            if m:
-                tech_match = m.group(1).strip()
-                print("   ✔ Sección PROGRAMAS DE TECNOLOGIA encontrada")
-                break
-
-        undergrad_match = None
-        for pattern in undergrad_patterns:
-            m = re.search(pattern, content, re.DOTALL | re.IGNORECASE)
-            if m:
-                undergrad_match = m.group(1).strip()
-                print("   ✔ Sección ESTUDIOS DE PREGRADO encontrada")
-                break
+        undergrad_match = sections.get('undergraduate')
+        if undergrad_match is not None:
+            print("   ✔ Sección ESTUDIOS DE PREGRADO encontrada")
 
         if tech_match:
             programs.extend(self._extract_programs_from_section(tech_match))
@@ -290,7 +453,7 @@ Responde SOLO con el JSON válido:
 
     def _extract_programs_from_section(self, section_text: str) -> List[Tuple[str, str]]:
         programs = []
-        program_headers = list(re.finditer(self.structural_patterns['program_header'], section_text))
+        program_headers = list(self.structural_patterns['program_header'].finditer(section_text))
         if not program_headers:
             print("⚠️ No se encontraron programas individuales en la sección.")
             return []
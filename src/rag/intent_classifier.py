@@ -0,0 +1,180 @@
+"""
+Clasificador de intención de consultas en el espacio de embeddings
+Un centroide por intención, calculado una vez con consultas de ejemplo; cada
+consulta se clasifica con el embedding que la búsqueda ya calculó (un
+producto matriz-vector, sin llamadas extra al modelo) y la intención decide
+filter_type y n_results
+"""
+
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Consultas de ejemplo por intención (el centroide es su promedio normalizado)
+INTENT_EXAMPLES = {
+    'fee': [
+        "¿Cuánto cuesta la carrera?",
+        "¿Cuál es el costo de la matrícula?",
+        "precio del semestre de ingeniería",
+        "valor de la matrícula por semestre",
+        "¿Qué tan cara es la carrera?",
+        "cuánto tengo que pagar por semestre",
+        "costo de bioingeniería",
+        "¿Cuánto vale estudiar sistemas?",
+        "tarifa de inscripción del programa",
+        "¿cuál programa es más barato?",
+    ],
+    'occupational_profile': [
+        "¿En qué puedo trabajar al graduarme?",
+        "campo laboral del ingeniero",
+        "perfil ocupacional del egresado",
+        "¿Dónde trabaja un bioingeniero?",
+        "¿Qué cargos puede desempeñar un tecnólogo?",
+        "salidas profesionales de la carrera",
+        "oportunidades de empleo para ingenieros civiles",
+        "¿A qué se dedica un ingeniero químico?",
+        "en qué empresas puedo trabajar",
+        "¿qué hace un ingeniero industrial en su trabajo?",
+    ],
+    'curriculum_semester': [
+        "¿Qué materias se ven en el primer semestre?",
+        "asignaturas del tercer semestre",
+        "materias del semestre 5 de sistemas",
+        "¿Qué se estudia en el segundo semestre?",
+        "¿Cuántos créditos tiene el cuarto semestre?",
+        "cursos del último semestre",
+        "¿En qué semestre se ve cálculo?",
+        "materias de octavo semestre de ingeniería civil",
+        "¿qué asignaturas hay en el semestre VI?",
+        "contenido del noveno semestre",
+    ],
+    'curriculum': [
+        "plan de estudios de ingeniería de sistemas",
+        "¿Cuántos semestres dura la carrera?",
+        "malla curricular del programa",
+        "¿Cuántos créditos tiene la carrera en total?",
+        "estructura del pensum",
+        "duración del programa de bioingeniería",
+        "¿Cómo está organizado el currículo?",
+        "¿qué materias tiene la carrera?",
+        "pensum completo de tecnología",
+        "total de asignaturas del programa",
+    ],
+    'general': [
+        "¿Qué programas ofrece la universidad?",
+        "información sobre ingeniería electrónica",
+        "háblame de la carrera de ingeniería química",
+        "¿Qué es bioingeniería?",
+        "quiero estudiar algo relacionado con software",
+        "¿Qué tecnologías tienen?",
+        "diferencias entre ingeniería industrial y sistemas",
+        "¿cuál carrera me recomiendas?",
+        "descripción del programa de energías",
+        "carreras de ingeniería disponibles",
+    ],
+}
+
+# Parámetros de búsqueda por intención (program_n_results: cuando hay programa detectado)
+INTENT_ROUTES = {
+    'fee': {'filter_type': 'fee', 'n_results': 10, 'program_n_results': 2},
+    'occupational_profile': {'filter_type': 'occupational_profile', 'n_results': 5, 'program_n_results': 2},
+    'curriculum_semester': {'filter_type': 'curriculum_semester', 'n_results': 5, 'program_n_results': 3},
+    'curriculum': {'filter_type': None, 'n_results': 8, 'program_n_results': 5},
+    'general': {'filter_type': None, 'n_results': 5, 'program_n_results': 5},
+}
+
+FALLBACK_INTENT = 'general'
+
+
+class QueryIntentClassifier:
+    def __init__(self,
+                 examples: Optional[Dict[str, List[str]]] = None,
+                 min_margin: float = 0.02):
+        """
+        Args:
+            examples: Consultas de ejemplo por intención (default: INTENT_EXAMPLES)
+            min_margin: Diferencia mínima de similitud entre la 1ª y 2ª intención;
+                        por debajo se usa 'general' (sin filtro) para no perder resultados
+        """
+
+        self.examples = examples or INTENT_EXAMPLES
+        self.min_margin = min_margin
+        self.intents: List[str] = list(self.examples)
+        self.centroids: Optional[np.ndarray] = None  # (intenciones, dimensión), normalizados
+
+        self._lock = threading.Lock()
+        self.stats = {'classified': 0, 'fallbacks': 0}
+
+    @property
+    def is_fitted(self) -> bool:
+        return self.centroids is not None
+
+    def fit(self, embed_fn: Callable[[List[str]], np.ndarray]):
+        """Calcula los centroides con un solo encode de todas las consultas de ejemplo"""
+
+        texts = [text for intent in self.intents for text in self.examples[intent]]
+        embeddings = np.asarray(embed_fn(texts), dtype=np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-12
+
+        centroids, start = [], 0
+        for intent in self.intents:
+            count = len(self.examples[intent])
+            centroid = embeddings[start:start + count].mean(axis=0)
+            centroids.append(centroid / (np.linalg.norm(centroid) + 1e-12))
+            start += count
+        self.centroids = np.vstack(centroids).astype(np.float32)
+
+    def ensure_fitted(self, embed_fn: Callable[[List[str]], np.ndarray]):
+        """fit perezoso: los ejemplos se codifican en la primera consulta, no al iniciar"""
+        if self.centroids is None:
+            with self._lock:
+                if self.centroids is None:
+                    self.fit(embed_fn)
+
+    def scores(self, query_embeddings: np.ndarray) -> np.ndarray:
+        """Similitud coseno (consultas, intenciones)"""
+        query_embeddings = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.centroids.shape[1])
+        norms = np.linalg.norm(query_embeddings, axis=1, keepdims=True) + 1e-12
+        return (query_embeddings / norms) @ self.centroids.T
+
+    def classify_batch(self, query_embeddings: np.ndarray) -> List[Tuple[str, float]]:
+        """(intención, margen sobre la segunda) por consulta"""
+
+        if self.centroids is None:
+            raise RuntimeError("❌ Clasificador de intención sin entrenar: llama a fit() primero")
+
+        scores = self.scores(query_embeddings)
+        top2 = np.argsort(-scores, axis=1)[:, :2]
+        results = []
+        for row, (best, second) in zip(scores, top2):
+            margin = float(row[best] - row[second])
+            intent = self.intents[best]
+            if margin < self.min_margin:
+                intent = FALLBACK_INTENT
+                self.stats['fallbacks'] += 1
+            results.append((intent, margin))
+        self.stats['classified'] += len(results)
+        return results
+
+    def classify(self, query_embedding: np.ndarray) -> Tuple[str, float]:
+        return self.classify_batch(query_embedding)[0]
+
+    def route(self, query_embedding: np.ndarray, program_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Parámetros de búsqueda para la consulta
+
+        Returns:
+            {'intent', 'confidence', 'filter_type', 'n_results'}
+        """
+        intent, margin = self.classify(query_embedding)
+        route = INTENT_ROUTES.get(intent, INTENT_ROUTES[FALLBACK_INTENT])
+        return {
+            'intent': intent,
+            'confidence': margin,
+            'filter_type': route['filter_type'],
+            'n_results': route['program_n_results'] if program_name else route['n_results']
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {'fitted': self.is_fitted, 'intents': self.intents, **self.stats}
@@ -0,0 +1,96 @@
+"""
+Parser JSON incremental para la salida en streaming del LLM
+Emite cada chunk de {"chunks": [...]} en cuanto se cierra su objeto
+y marca el final al cerrarse el objeto de nivel superior
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+
+class StreamingJSONChunkParser:
+    def __init__(self):
+        self.buffer = ""
+        self.done = False
+        self.malformed_chunks = 0
+
+        self._started = False
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._element_start: Optional[int] = None
+        self._end: Optional[int] = None
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Añade texto y retorna los chunks completados en este fragmento
+
+        Un chunk es un objeto que es elemento directo de un array dentro del
+        objeto de nivel superior. El texto posterior al cierre se ignora.
+        """
+        if self.done:
+            return []
+
+        self.buffer += text
+        completed = []
+
+        while self._pos < len(self.buffer):
+            i = self._pos
+            char = self.buffer[i]
+            self._pos += 1
+
+            if not self._started:
+                if char == '{':
+                    # Descartar lo previo al JSON (eco del prompt, texto libre)
+                    self.buffer = self.buffer[i:]
+                    self._pos = 1
+                    self._started = True
+                    self._stack.append('{')
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in '{[':
+                if char == '{' and self._stack == ['{', '[']:
+                    self._element_start = i
+                self._stack.append(char)
+            elif char in '}]':
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                if char == '}' and self._stack == ['{', '['] and self._element_start is not None:
+                    try:
+                        completed.append(json.loads(self.buffer[self._element_start:i + 1]))
+                    except json.JSONDecodeError:
+                        self.malformed_chunks += 1
+                    self._element_start = None
+                elif not self._stack:
+                    self.done = True
+                    self._end = i + 1
+                    break
+
+        return completed
+
+    def result(self) -> Optional[Dict[str, Any]]:
+        """Objeto completo si el nivel superior se cerró y es JSON válido"""
+        if not self.done:
+            return None
+        try:
+            return json.loads(self.buffer[:self._end])
+        except json.JSONDecodeError:
+            return None
+
+    @property
+    def consumed_text(self) -> str:
+        """Texto JSON hasta el cierre del objeto (o todo lo recibido si no cerró)"""
+        return self.buffer[:self._end] if self.done else self.buffer
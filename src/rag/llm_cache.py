@@ -0,0 +1,95 @@
+"""
+Caché persistente de respuestas LLM (SQLite)
+Clave: (modelo, parámetros de generación, hash del prompt)
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+class LLMResponseCache:
+    def __init__(self, db_path: str = "./data/llm_cache/responses.sqlite"):
+        """
+        Args:
+            db_path: Archivo SQLite; se crea junto con su directorio si no existe
+        """
+
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Una conexión compartida por los hilos del chunker, serializada con un lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                cache_key TEXT PRIMARY KEY,
+                model_name TEXT NOT NULL,
+                params TEXT NOT NULL,
+                prompt_hash TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0}
+
+    @staticmethod
+    def prompt_hash(prompt: str) -> str:
+        return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def make_key(cls, model_name: str, params: Dict[str, Any], prompt: str) -> str:
+        """Hash estable de modelo + parámetros (ordenados) + prompt"""
+        header = json.dumps({'model': model_name, 'params': params}, sort_keys=True)
+        return hashlib.sha256(f"{header}\n{cls.prompt_hash(prompt)}".encode('utf-8')).hexdigest()
+
+    def get(self, model_name: str, params: Dict[str, Any], prompt: str) -> Optional[str]:
+        """Respuesta guardada o None"""
+        key = self.make_key(model_name, params, prompt)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE cache_key = ?", (key,)
+            ).fetchone()
+            self.stats['hits' if row else 'misses'] += 1
+        return row[0] if row else None
+
+    def put(self, model_name: str, params: Dict[str, Any], prompt: str, response: str):
+        key = self.make_key(model_name, params, prompt)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model_name, json.dumps(params, sort_keys=True),
+                 self.prompt_hash(prompt), response, time.time())
+            )
+            self._conn.commit()
+            self.stats['writes'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Aciertos, fallos y tasa de acierto"""
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['entries'] = len(self)
+        stats['db_path'] = str(self.db_path)
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,805 @@
+"""
+Vector store exacto en memoria con NumPy para USC Curriculum RAG
+Alternativa a ChromaDB para corpus pequeños: una matriz contigua normalizada,
+un producto matriz-vector y argpartition para el top-k
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+
+from src.rag.store_utils import make_chunk_ids, normalize_rows, similarity_to_distance
+
+QUANTIZATIONS = ("float32", "float16", "int8", "binary")
+
+# Bits en 1 de cada byte (para NumPy < 2.0, sin np.bitwise_count)
+POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+# Filas por bloque al puntuar códigos float16/int8 (limita la copia temporal en float32)
+SCORE_BLOCK_ROWS = 8192
+
+
+def append_rows(buffer: Optional[np.ndarray], size: int, rows: np.ndarray) -> np.ndarray:
+    """
+    Copia rows tras las primeras `size` filas de buffer
+
+    La capacidad se duplica cuando no caben (o si buffer es de solo lectura),
+    así agregar m filas cuesta O(m) amortizado en vez de copiar la matriz entera.
+    """
+    needed = size + len(rows)
+    if buffer is None or needed > len(buffer) or isinstance(buffer, np.memmap) or not buffer.flags.writeable:
+        grown = np.empty((max(needed, 2 * size, 64),) + rows.shape[1:], dtype=rows.dtype)
+        if size:
+            grown[:size] = buffer[:size]
+        buffer = grown
+    buffer[size:needed] = rows
+    return buffer
+
+
+def hamming_distances(codes: np.ndarray, bits: np.ndarray) -> np.ndarray:
+    """Distancia de Hamming de cada fila de códigos empaquetados (uint8) a una consulta"""
+    if codes.shape[1] % 8 == 0:
+        # Palabras de 64 bits: 8 veces menos operaciones que byte a byte
+        codes, bits = codes.view(np.uint64), bits.view(np.uint64)
+    xor = np.bitwise_xor(codes, bits)
+    counts = np.bitwise_count(xor) if hasattr(np, 'bitwise_count') else POPCOUNT[xor.view(np.uint8)]
+    return counts.sum(axis=1, dtype=np.int32)
+
+
+class MetadataMaskIndex:
+    """
+    Evalúa filtros `where` estilo ChromaDB como máscaras booleanas
+
+    Las columnas de metadatos y las máscaras de igualdad se calculan una sola
+    vez y se reutilizan hasta que cambian los documentos.
+    """
+
+    def __init__(self, metadatas: List[Dict[str, Any]]):
+        self.metadatas = metadatas
+        self.size = len(metadatas)
+        self._columns: Dict[str, np.ndarray] = {}
+        self._eq_masks: Dict[tuple, np.ndarray] = {}
+
+    def _column(self, key: str) -> np.ndarray:
+        column = self._columns.get(key)
+        if column is None:
+            column = np.empty(self.size, dtype=object)
+            column[:] = [metadata.get(key) for metadata in self.metadatas]
+            self._columns[key] = column
+        return column
+
+    def _eq_mask(self, key: str, value: Any) -> np.ndarray:
+        cache_key = (key, type(value).__name__, value)
+        mask = self._eq_masks.get(cache_key)
+        if mask is None:
+            mask = self._column(key) == value
+            mask = np.asarray(mask, dtype=bool)
+            self._eq_masks[cache_key] = mask
+        return mask
+
+    def _field_mask(self, key: str, condition: Any) -> np.ndarray:
+        if not isinstance(condition, dict):
+            return self._eq_mask(key, condition)
+
+        mask = np.ones(self.size, dtype=bool)
+        for operator, value in condition.items():
+            if operator == '$eq':
+                mask &= self._eq_mask(key, value)
+            elif operator == '$ne':
+                mask &= ~self._eq_mask(key, value)
+            elif operator == '$in':
+                mask &= np.logical_or.reduce([self._eq_mask(key, v) for v in value]) if value else False
+            elif operator == '$nin':
+                for v in value:
+                    mask &= ~self._eq_mask(key, v)
+            elif operator in ('$gt', '$gte', '$lt', '$lte'):
+                column = self._column(key)
+                comparable = np.array([
+                    isinstance(v, (int, float)) and not isinstance(v, bool) for v in column
+                ], dtype=bool)
+                numeric = np.where(comparable, column, 0).astype(np.float64)
+                if operator == '$gt':
+                    mask &= comparable & (numeric > value)
+                elif operator == '$gte':
+                    mask &= comparable & (numeric >= value)
+                elif operator == '$lt':
+                    mask &= comparable & (numeric < value)
+                else:
+                    mask &= comparable & (numeric <= value)
+            else:
+                raise ValueError(f"❌ Operador de filtro no soportado: {operator}")
+        return mask
+
+    def mask(self, where: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Máscara booleana para un filtro `where` (None = sin filtro)"""
+
+        if not where:
+            return None
+
+        mask = np.ones(self.size, dtype=bool)
+        for key, condition in where.items():
+            if key == '$and':
+                for sub_where in condition:
+                    mask &= self.mask(sub_where)
+            elif key == '$or':
+                mask &= np.logical_or.reduce([self.mask(sub_where) for sub_where in condition])
+            else:
+                mask &= self._field_mask(key, condition)
+        return mask
+
+
+class NumpyVectorStore:
+    def __init__(self,
+                 collection_name: str = "usc_curriculum",
+                 persist_directory: str = "./data/vectorstore",
+                 quantization: str = "float32",
+                 rescore_factor: int = 10,
+                 projection_dim: Optional[int] = None):
+        """
+        Inicializa el índice exacto en memoria
+
+        Los datos se persisten en <persist_directory>/<collection_name>_numpy/
+        (embeddings.npy + records.json) y se recargan al iniciar. Cada escritura
+        se guarda al terminar, salvo dentro de deferred_writes(), donde las filas
+        se agregan en memoria y el guardado ocurre una vez al salir (flush).
+
+        Con quantization "float16", "int8" (escala por dimensión) o "binary"
+        (bits de signo) solo los códigos viven en RAM: la primera pasada los
+        puntúa y los top n_results·rescore_factor se rescoran con los float32
+        de embeddings.npy mapeado en memoria (rescore_factor=0 = sin rescoring).
+
+        Con projection_dim (p.ej. 256) la primera pasada usa una proyección PCA
+        ajustada en la ingesta y guardada en projection.npz; el rescoring usa
+        los vectores de dimensión completa igual que con cuantización.
+        """
+
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"❌ Cuantización desconocida: {quantization} (opciones: {', '.join(QUANTIZATIONS)})")
+        if projection_dim and quantization != "float32":
+            raise ValueError("❌ projection_dim y quantization son primeras pasadas alternativas: elige una")
+
+        self.collection_name = collection_name
+        self.persist_directory = Path(persist_directory)
+        self.collection_path = self.persist_directory / f"{collection_name}_numpy"
+
+        print(f"🔄 Inicializando NumPy vector store...")
+        print(f"   📂 Directorio: {self.collection_path}")
+        print(f"   📝 Colección: {collection_name}")
+
+        self.collection_path.mkdir(parents=True, exist_ok=True)
+
+        self._ids: List[str] = []
+        self._documents: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._matrix_buffer: Optional[np.ndarray] = None  # capacidad de reserva; _matrix es una vista
+        self._id_to_row: Dict[str, int] = {}
+        self._mask_index: Optional[MetadataMaskIndex] = None  # se reconstruye en la primera búsqueda filtrada
+
+        # Escrituras y búsquedas comparten estado: una búsqueda nunca ve una escritura a medias
+        self._lock = threading.RLock()
+        self._deferred = 0
+        self._dirty = False
+
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        self._codes: Optional[np.ndarray] = None
+        self._codes_buffer: Optional[np.ndarray] = None  # capacidad de reserva; _codes es una vista
+        self._scales: Optional[np.ndarray] = None
+        # int8: una fila nueva superó la escala; PCA: falta ajustar o reajustar la base.
+        # En ambos casos la primera pasada completa se recalcula una vez, en flush
+        self._requantize = False
+
+        self.projection_dim = projection_dim
+        self._projection: Optional[Dict[str, np.ndarray]] = None  # mean, components, explained_variance, fitted_on
+        self._doc_bias: Optional[np.ndarray] = None                # x·media por documento
+        self._bias_buffer: Optional[np.ndarray] = None
+
+        self.stats = {
+            'documents_added': 0,
+            'queries_processed': 0,
+            'last_update': None
+        }
+
+        self._load()
+        print(f"✅ Colección cargada: {len(self._ids)} documentos")
+
+    def _load(self):
+        embeddings_file = self.collection_path / "embeddings.npy"
+        records_file = self.collection_path / "records.json"
+        if not (embeddings_file.exists() and records_file.exists()):
+            return
+
+        with open(records_file, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+
+        self._ids = records['ids']
+        self._documents = records['documents']
+        self._metadatas = records['metadatas']
+        projection_file = self.collection_path / "projection.npz"
+        if self.projection_dim and projection_file.exists():
+            with np.load(projection_file) as projection:
+                if projection['components'].shape[0] == self.projection_dim:
+                    self._projection = {key: projection[key] for key in projection.files}
+
+        if not self._uses_first_pass:
+            self._matrix = np.ascontiguousarray(np.load(embeddings_file), dtype=np.float32)
+        else:
+            self._matrix = np.load(embeddings_file, mmap_mode='r')
+        self._reindex()
+
+    def _save(self):
+        """Escritura atómica (archivo temporal + rename)"""
+
+        embeddings_tmp = self.collection_path / "embeddings.tmp.npy"
+        records_tmp = self.collection_path / "records.tmp.json"
+
+        np.save(embeddings_tmp, self._matrix)
+        with open(records_tmp, 'w', encoding='utf-8') as f:
+            json.dump({
+                'ids': self._ids,
+                'documents': self._documents,
+                'metadatas': self._metadatas
+            }, f, ensure_ascii=False)
+
+        os.replace(embeddings_tmp, self.collection_path / "embeddings.npy")
+        os.replace(records_tmp, self.collection_path / "records.json")
+
+        if self._uses_first_pass and self._matrix.size:
+            # Los float32 quedan en disco; en RAM solo los códigos
+            self._matrix = np.load(self.collection_path / "embeddings.npy", mmap_mode='r')
+            self._matrix_buffer = None
+
+    def flush(self):
+        """Guarda en disco las escrituras pendientes (no-op si no hay cambios)"""
+        with self._lock:
+            if self._requantize:
+                self._quantize()
+            if self._dirty:
+                self._save()
+                self._dirty = False
+
+    @contextmanager
+    def deferred_writes(self):
+        """
+        Agrupa escrituras (p.ej. los lotes de una ingesta) con un solo guardado al final
+
+        Dentro del bloque cada lote solo agrega filas en memoria y sigue siendo
+        consultable; anidable, el guardado ocurre al salir del bloque externo.
+        """
+        with self._lock:
+            self._deferred += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._deferred -= 1
+                if not self._deferred:
+                    self.flush()
+
+    def _after_write(self, first_new_row: Optional[int] = None, updated_rows: List[int] = ()):
+        """
+        Invalida índices derivados y guarda salvo que las escrituras estén diferidas
+
+        Con first_new_row solo se codifican las filas agregadas desde ahí y las
+        reemplazadas (updated_rows); sin él (eliminaciones) se recodifica todo.
+        """
+        self._mask_index = None
+        if first_new_row is None:
+            self._quantize()
+        else:
+            self._update_codes(first_new_row, updated_rows)
+        self._dirty = True
+        if not self._deferred:
+            self.flush()
+
+    @property
+    def _uses_first_pass(self) -> bool:
+        """True si la búsqueda usa códigos/proyección en RAM y rescoring desde disco"""
+        return self.quantization != "float32" or bool(self.projection_dim)
+
+    def _fit_projection(self, max_samples: int = 20000):
+        """PCA por autovectores de la covarianza (d×d), sobre una muestra de documentos"""
+
+        matrix = np.asarray(self._matrix)
+        if len(matrix) > max_samples:
+            rng = np.random.default_rng(0)
+            matrix = matrix[np.sort(rng.choice(len(matrix), size=max_samples, replace=False))]
+
+        mean = matrix.mean(axis=0)
+        centered = matrix - mean
+        eigenvalues, eigenvectors = np.linalg.eigh(centered.T @ centered)
+        top = np.argsort(eigenvalues)[::-1][:self.projection_dim]
+        explained = float(eigenvalues[top].sum() / max(eigenvalues.sum(), 1e-12))
+
+        self._projection = {
+            'mean': mean.astype(np.float32),
+            'components': np.ascontiguousarray(eigenvectors[:, top].T, dtype=np.float32),
+            'explained_variance': np.float32(explained),
+            'fitted_on': np.int64(len(self._ids))
+        }
+        np.savez(self.collection_path / "projection.npz", **self._projection)
+        print(f"📐 Proyección PCA {self._matrix.shape[1]}→{self.projection_dim}: "
+              f"{explained:.1%} de la varianza ({len(matrix)} documentos)")
+
+    def _project(self):
+        """Vectores reducidos de la primera pasada; la PCA se reajusta si la colección se duplicó"""
+
+        if not self.projection_dim or self._matrix.size == 0 or len(self._ids) < self.projection_dim:
+            # Sin proyección o con pocos documentos para estimarla: búsqueda exacta sobre el float32 mapeado
+            self._codes, self._doc_bias = None, None
+            return
+
+        if self._projection is None or len(self._ids) > 2 * int(self._projection['fitted_on']):
+            self._fit_projection()
+
+        self._codes, self._doc_bias = self._encode_projected(self._matrix)
+        self._codes_buffer, self._bias_buffer = self._codes, self._doc_bias
+
+    def _encode_projected(self, vectors: np.ndarray):
+        """(códigos reducidos, sesgo x·μ) de filas float32 con la base PCA actual"""
+        vectors = np.asarray(vectors)
+        mean, components = self._projection['mean'], self._projection['components']
+        # q·x = (q-μ)·(x-μ) + x·μ + términos sin x; la PCA aproxima (q-μ)·(x-μ) en el espacio reducido
+        return np.ascontiguousarray((vectors - mean) @ components.T, dtype=np.float32), vectors @ mean
+
+    def _writable_matrix(self) -> np.ndarray:
+        """Copia en memoria del mapeo de solo lectura antes de modificar filas"""
+        if isinstance(self._matrix, np.memmap):
+            self._matrix = self._matrix_buffer = np.array(self._matrix)
+        return self._matrix
+
+    def _quantize(self):
+        """Recalcula los códigos de la primera pasada a partir de los float32"""
+
+        if self.quantization == "float32" or self._matrix.size == 0:
+            self._scales = None
+            self._project()
+            self._requantize = False
+            return
+
+        if self.quantization == "int8":
+            # Escala simétrica por dimensión: el máximo absoluto de cada columna va a 127
+            scales = np.abs(self._matrix).max(axis=0).astype(np.float32) / 127.0
+            scales[scales == 0] = 1.0
+            self._scales = scales
+        else:
+            self._scales = None
+        self._codes = self._codes_buffer = self._encode(self._matrix)
+        self._requantize = False
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Códigos de la primera pasada para filas float32 normalizadas"""
+
+        vectors = np.asarray(vectors)
+        if self.quantization == "float16":
+            return vectors.astype(np.float16)
+        if self.quantization == "int8":
+            scaled = np.rint(vectors / self._scales)
+            if len(scaled) and np.abs(scaled).max() > 127:
+                # Fila fuera de la escala actual: se recorta y la escala se recalcula en flush
+                self._requantize = True
+            return np.clip(scaled, -127, 127).astype(np.int8)
+        return np.packbits(vectors > 0, axis=1)
+
+    def _update_codes(self, first_new_row: int, updated_rows: List[int] = ()):
+        """Codifica solo las filas reemplazadas y las agregadas desde first_new_row"""
+
+        projected = self.quantization == "float32"
+        if projected:
+            if not self.projection_dim:
+                return
+            if self._projection is None or len(self._ids) > 2 * int(self._projection['fitted_on']):
+                # La PCA se ajusta una vez por ingesta, en flush; hasta entonces se usa la base
+                # anterior (o la búsqueda exacta si aún no hay base)
+                self._requantize = len(self._ids) >= self.projection_dim
+            if self._projection is None:
+                return
+        if self._codes is None or first_new_row == 0:
+            self._quantize()
+            return
+
+        if len(updated_rows):
+            if projected:
+                self._codes[updated_rows], self._doc_bias[updated_rows] = \
+                    self._encode_projected(self._matrix[updated_rows])
+            else:
+                self._codes[updated_rows] = self._encode(self._matrix[updated_rows])
+        new_rows = self._matrix[first_new_row:]
+        if len(new_rows):
+            if projected:
+                codes, bias = self._encode_projected(new_rows)
+                self._bias_buffer = append_rows(self._bias_buffer, first_new_row, bias)
+                self._doc_bias = self._bias_buffer[:len(self._ids)]
+            else:
+                codes = self._encode(new_rows)
+            self._codes_buffer = append_rows(self._codes_buffer, first_new_row, codes)
+            self._codes = self._codes_buffer[:len(self._ids)]
+
+    def _approximate_scores(self, queries: np.ndarray, candidates: Optional[np.ndarray]) -> np.ndarray:
+        """Similitud aproximada (n_consultas, n_candidatos) sobre los códigos"""
+
+        codes = self._codes if candidates is None else self._codes[candidates]
+
+        if self._projection is not None and self.projection_dim:
+            bias = self._doc_bias if candidates is None else self._doc_bias[candidates]
+            reduced = (queries - self._projection['mean']) @ self._projection['components'].T
+            return reduced @ codes.T + bias
+
+        if self.quantization == "binary":
+            # Coseno estimado por concordancia de signos: 1 - 2·hamming/dimensión
+            query_bits = np.packbits(queries > 0, axis=1)
+            dimension = self._matrix.shape[1]
+            scores = np.empty((len(queries), len(codes)), dtype=np.float32)
+            for i, bits in enumerate(query_bits):
+                scores[i] = 1.0 - 2.0 * hamming_distances(codes, bits) / dimension
+            return scores
+
+        if self.quantization == "int8":
+            queries = queries * self._scales
+
+        scores = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+            block = codes[start:start + SCORE_BLOCK_ROWS].astype(np.float32)
+            scores[:, start:start + len(block)] = queries @ block.T
+        return scores
+
+    def _reindex(self):
+        """Reconstruye índices derivados tras una carga o eliminación"""
+        self._id_to_row = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self._mask_index = None
+        self._quantize()
+
+    def _mask(self, where: Optional[Dict]) -> Optional[np.ndarray]:
+        if where and self._mask_index is None:
+            self._mask_index = MetadataMaskIndex(self._metadatas)
+        return self._mask_index.mask(where) if where else None
+
+    def _clean_metadatas(self, metadatas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Mismas reglas de tipos que ChromaDB: str, int, float, bool"""
+        return [
+            {key: value if isinstance(value, (str, int, float, bool)) else str(value)
+             for key, value in metadata.items()}
+            for metadata in metadatas
+        ]
+
+    def _append(self, texts, metadatas, embeddings, ids):
+        """Agrega filas al final sin copiar la matriz existente (ver append_rows)"""
+        vectors = normalize_rows(embeddings)
+        size = len(self._ids)
+        if size and vectors.shape[1] != self._matrix.shape[1]:
+            raise ValueError(
+                f"❌ Dimensión {vectors.shape[1]} no coincide con el índice ({self._matrix.shape[1]})"
+            )
+        buffer = self._matrix_buffer if self._matrix_buffer is not None else (self._matrix if size else None)
+        self._matrix_buffer = append_rows(buffer, size, vectors)
+        self._matrix = self._matrix_buffer[:size + len(vectors)]
+        self._id_to_row.update((doc_id, size + offset) for offset, doc_id in enumerate(ids))
+        self._ids.extend(ids)
+        self._documents.extend(texts)
+        self._metadatas.extend(self._clean_metadatas(metadatas))
+
+    def add_documents(self,
+                      texts: List[str],
+                      metadatas: List[Dict[str, Any]],
+                      embeddings: np.ndarray,
+                      ids: Optional[List[str]] = None) -> bool:
+        """Agrega documentos al vector store (IDs existentes se ignoran, como en ChromaDB)"""
+
+        if len(texts) != len(metadatas) or len(texts) != len(embeddings):
+            raise ValueError("❌ Longitudes de texts, metadatas y embeddings deben coincidir")
+
+        print(f"🔄 Agregando {len(texts)} documentos al vector store...")
+
+        try:
+            if ids is None:
+                ids = make_chunk_ids(texts, metadatas)
+
+            with self._lock:
+                keep = [i for i, doc_id in enumerate(ids) if doc_id not in self._id_to_row]
+                if len(keep) < len(ids):
+                    print(f"⚠️  {len(ids) - len(keep)} IDs ya existentes ignorados")
+
+                if keep:
+                    embeddings = np.asarray(embeddings)
+                    first_new_row = len(self._ids)
+                    self._append(
+                        [texts[i] for i in keep],
+                        [metadatas[i] for i in keep],
+                        embeddings[keep],
+                        [ids[i] for i in keep]
+                    )
+                    self._after_write(first_new_row)
+
+            self.stats['documents_added'] += len(keep)
+            self.stats['last_update'] = datetime.now().isoformat()
+            print(f"✅ Documentos agregados exitosamente")
+            print(f"   📊 Total en colección: {self.count()}")
+
+            return True
+
+        except Exception as e:
+            print(f"❌ Error agregando documentos: {e}")
+            return False
+
+    def upsert_documents(self,
+                         texts: List[str],
+                         metadatas: List[Dict[str, Any]],
+                         embeddings: np.ndarray,
+                         ids: Optional[List[str]] = None) -> bool:
+        """Inserta o reemplaza documentos por ID"""
+
+        if len(texts) != len(metadatas) or len(texts) != len(embeddings):
+            raise ValueError("❌ Longitudes de texts, metadatas y embeddings deben coincidir")
+
+        try:
+            if ids is None:
+                ids = make_chunk_ids(texts, metadatas)
+
+            embeddings = np.asarray(embeddings)
+            with self._lock:
+                existing = [i for i, doc_id in enumerate(ids) if doc_id in self._id_to_row]
+                new = [i for i, doc_id in enumerate(ids) if doc_id not in self._id_to_row]
+                first_new_row, rows = len(self._ids), []
+
+                if existing:
+                    rows = [self._id_to_row[ids[i]] for i in existing]
+                    self._writable_matrix()[rows] = normalize_rows(embeddings[existing])
+                    cleaned = self._clean_metadatas([metadatas[i] for i in existing])
+                    for row, i, metadata in zip(rows, existing, cleaned):
+                        self._documents[row] = texts[i]
+                        self._metadatas[row] = metadata
+
+                if new:
+                    self._append(
+                        [texts[i] for i in new],
+                        [metadatas[i] for i in new],
+                        embeddings[new],
+                        [ids[i] for i in new]
+                    )
+
+                self._after_write(first_new_row, rows)
+
+            self.stats['documents_added'] += len(texts)
+            self.stats['last_update'] = datetime.now().isoformat()
+            print(f"✅ {len(texts)} documentos insertados/actualizados")
+
+            return True
+
+        except Exception as e:
+            print(f"❌ Error en upsert de documentos: {e}")
+            return False
+
+    def delete_documents(self, ids: List[str]) -> bool:
+        """Elimina documentos por ID"""
+
+        if not ids:
+            return True
+
+        try:
+            with self._lock:
+                to_delete = {self._id_to_row[doc_id] for doc_id in ids if doc_id in self._id_to_row}
+                if to_delete:
+                    keep = [row for row in range(len(self._ids)) if row not in to_delete]
+
+                    self._matrix = np.array(self._matrix[keep]) if keep else np.zeros((0, 0), dtype=np.float32)
+                    self._matrix_buffer = None
+                    self._ids = [self._ids[row] for row in keep]
+                    self._documents = [self._documents[row] for row in keep]
+                    self._metadatas = [self._metadatas[row] for row in keep]
+                    self._id_to_row = {doc_id: row for row, doc_id in enumerate(self._ids)}
+
+                    self._after_write()
+
+            self.stats['last_update'] = datetime.now().isoformat()
+            print(f"🗑️  {len(to_delete)} documentos eliminados")
+            return True
+
+        except Exception as e:
+            print(f"❌ Error eliminando documentos: {e}")
+            return False
+
+    def clear_collection(self) -> bool:
+        """Limpia todos los documentos de la colección"""
+
+        try:
+            with self._lock:
+                self._ids = []
+                self._documents = []
+                self._metadatas = []
+                self._matrix = np.zeros((0, 0), dtype=np.float32)
+                self._matrix_buffer = None
+                self._reindex()
+                self._dirty = True
+                self.flush()
+
+            print(f"🗑️  Colección {self.collection_name} limpiada")
+            return True
+
+        except Exception as e:
+            print(f"❌ Error limpiando colección: {e}")
+            return False
+
+    def get_ids(self) -> Set[str]:
+        """IDs de todos los documentos almacenados"""
+        with self._lock:
+            return set(self._ids)
+
+    def count(self) -> int:
+        """Número de documentos en la colección"""
+        return len(self._ids)
+
+    def _empty_results(self) -> Dict[str, List]:
+        return {
+            'documents': [],
+            'metadatas': [],
+            'distances': [],
+            'ids': []
+        }
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int):
+        """Top-k por fila con argpartition, ordenado de mayor a menor"""
+        k = min(k, scores.shape[1])
+        if k < scores.shape[1]:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+    def search(self,
+               query_embedding: np.ndarray,
+               n_results: int = 5,
+               where: Optional[Dict] = None) -> Dict[str, List]:
+        """Busca documentos similares (búsqueda exacta)"""
+
+        return self.search_batch([query_embedding], n_results=n_results, where=where)[0]
+
+    def search_batch(self,
+                     query_embeddings: List[np.ndarray],
+                     n_results: int = 5,
+                     where: Optional[Dict] = None) -> List[Dict[str, List]]:
+        """Busca varias consultas con un único producto matricial"""
+
+        if len(query_embeddings) == 0:
+            return []
+
+        with self._lock:
+            if not self._ids:
+                print("⚠️  Vector store vacío")
+                return [self._empty_results() for _ in query_embeddings]
+
+            try:
+                queries = normalize_rows(np.vstack(query_embeddings))
+
+                mask = self._mask(where)
+                if mask is None:
+                    candidates = None
+                else:
+                    candidates = np.flatnonzero(mask)
+                    if candidates.size == 0:
+                        self.stats['queries_processed'] += len(queries)
+                        return [self._empty_results() for _ in query_embeddings]
+
+                if self._codes is None:
+                    # (n_consultas, n_candidatos)
+                    matrix = self._matrix if candidates is None else self._matrix[candidates]
+                    scores = queries @ matrix.T
+                    top, top_scores = self._top_k(scores, n_results)
+                else:
+                    scores = self._approximate_scores(queries, candidates)
+                    if self.rescore_factor > 0:
+                        # Rescoring exacto de los mejores candidatos con los float32 del disco
+                        shortlist, _ = self._top_k(scores, n_results * self.rescore_factor)
+                        shortlist_rows = shortlist if candidates is None else candidates[shortlist]
+                        exact = np.einsum('qd,qkd->qk', queries, self._matrix[shortlist_rows.ravel()].reshape(
+                            shortlist.shape[0], shortlist.shape[1], -1))
+                        order, top_scores = self._top_k(exact, n_results)
+                        top = np.take_along_axis(shortlist, order, axis=1)
+                    else:
+                        top, top_scores = self._top_k(scores, n_results)
+
+                rows = top if candidates is None else candidates[top]
+                distances = similarity_to_distance(top_scores)
+
+                self.stats['queries_processed'] += len(queries)
+
+                formatted_results = []
+                for query_rows, query_distances in zip(rows, distances):
+                    formatted_results.append({
+                        'documents': [self._documents[row] for row in query_rows],
+                        'metadatas': [self._metadatas[row] for row in query_rows],
+                        'distances': query_distances.tolist(),
+                        'ids': [self._ids[row] for row in query_rows]
+                    })
+
+                print(f"🔍 Búsqueda completada: {len(formatted_results)} consultas")
+
+                return formatted_results
+
+            except Exception as e:
+                print(f"❌ Error en búsqueda: {e}")
+                return [self._empty_results() for _ in query_embeddings]
+
+    def _first_pass_bytes(self) -> int:
+        """Bytes en RAM del índice que recorre la primera pasada"""
+        if self._codes is None:
+            return 0 if isinstance(self._matrix, np.memmap) else int(self._matrix.nbytes)
+        extra = [array for array in (self._scales, self._doc_bias) if array is not None]
+        if self._projection is not None and self.projection_dim:
+            extra += [self._projection['mean'], self._projection['components']]
+        return int(self._codes.nbytes + sum(array.nbytes for array in extra))
+
+    def recall_report(self,
+                      query_embeddings: Optional[np.ndarray] = None,
+                      n_results: int = 10,
+                      sample: int = 100) -> Dict[str, Any]:
+        """
+        Recall@k de la búsqueda configurada frente al escaneo exacto en float32
+
+        Sin consultas se usan documentos de la colección como consultas (el
+        propio documento cuenta, como en una búsqueda real de su contenido).
+        """
+
+        with self._lock:
+            if not self._ids:
+                return {'recall': None, 'queries': 0}
+
+            if query_embeddings is None:
+                rng = np.random.default_rng(0)
+                rows = rng.choice(len(self._ids), size=min(sample, len(self._ids)), replace=False)
+                query_embeddings = np.asarray(self._matrix[np.sort(rows)])
+            queries = normalize_rows(np.asarray(query_embeddings))
+
+            exact_top, _ = self._top_k(queries @ np.asarray(self._matrix).T, n_results)
+            found = self.search_batch(list(queries), n_results=n_results)
+            recalls = [
+                len({self._ids[row] for row in exact_rows} & set(result['ids'])) / len(exact_rows)
+                for exact_rows, result in zip(exact_top, found)
+            ]
+            return {
+                'recall': float(np.mean(recalls)),
+                'min_recall': float(np.min(recalls)),
+                'queries': len(recalls),
+                'n_results': n_results,
+                'quantization': self.quantization,
+                'projection_dim': self.projection_dim,
+                'rescore_factor': self.rescore_factor,
+                'memory_bytes': self._first_pass_bytes(),
+                'full_memory_bytes': int(len(self._ids) * self._matrix.shape[1] * 4)
+            }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obtiene estadísticas del vector store"""
+
+        with self._lock:
+            doc_types = sorted({m['type'] for m in self._metadatas if 'type' in m})
+            programs = sorted({
+                m.get('program_name', m.get('program'))
+                for m in self._metadatas
+                if m.get('program_name', m.get('program'))
+            })
+
+            return {
+                'total_documents': self.count(),
+                'collection_name': self.collection_name,
+                'persist_directory': str(self.collection_path),
+                'backend': 'numpy',
+                'dimension': int(self._matrix.shape[1]) if self._matrix.size else 0,
+                'quantization': self.quantization,
+                'projection_dim': self.projection_dim if self._codes is not None and self.projection_dim else None,
+                'explained_variance': float(self._projection['explained_variance']) if self._projection else None,
+                'memory_bytes': self._first_pass_bytes(),
+                'document_types': doc_types,
+                'programs': programs,
+                'queries_processed': self.stats['queries_processed'],
+                'documents_added': self.stats['documents_added']
+            }
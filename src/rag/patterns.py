@@ -0,0 +1,64 @@
+"""
+Registro de expresiones regulares precompiladas
+Compartido por USCCurriculumProcessor e IntelligentCurriculumChunker
+"""
+
+import re
+from typing import Dict, Optional, Tuple
+
+# Encabezados de programa (`### Nombre`)
+PROGRAM_HEADER = re.compile(r'### ([^\n]+)')
+
+# Encabezados de sección: se localizan una sola vez y se corta por offsets
+SECTION_HEADER = re.compile(
+    r'##\s*(?:(?P<technology>PROGRAMAS\s+DE\s+TECNOLOGIA)|(?P<undergraduate>ESTUDIOS\s+DE\s+PREGRADO))',
+    re.IGNORECASE
+)
+
+# Campos de cada programa
+FEE = re.compile(r'\*\*Costo Matricula:\*\* \$([0-9,\.]+) \(💰cop\)')
+OCCUPATIONAL_PROFILE = re.compile(r'\*\*Perfil Ocupacional:\*\*\s*(.*?)(?=\*\*Curriculo:|$)', re.DOTALL)
+CURRICULUM_START = re.compile(r'\*\*Curriculo:\*\*')
+SEMESTER = re.compile(r'#### Semestre ([IVX\d]+)\s*\n((?:- [^\n]+\n)*)')
+SUBJECT = re.compile(r'- ([^|]+) \| (\d+) Créditos')
+
+# Materias dentro de un chunk de semestre ya generado (`- Nombre | 3 créditos`)
+CHUNK_SUBJECT = re.compile(r'^- (.+?) \| (\d+) créditos\s*$', re.MULTILINE | re.IGNORECASE)
+
+STRUCTURAL_PATTERNS = {
+    'program_header': PROGRAM_HEADER,
+    'fee': FEE,
+    'occupational_profile': OCCUPATIONAL_PROFILE,
+    'curriculum_start': CURRICULUM_START,
+    'semester': SEMESTER,
+    'subject': SUBJECT
+}
+
+
+def split_sections(content: str) -> Dict[str, str]:
+    """
+    Divide el archivo en secciones con un único recorrido de encabezados
+
+    Tecnología va desde su encabezado hasta el primer encabezado de pregrado
+    posterior (o el final); pregrado, desde su encabezado hasta el final.
+    """
+    first: Dict[str, Tuple[int, int]] = {}
+    undergrad_starts = []
+
+    for match in SECTION_HEADER.finditer(content):
+        section_type = match.lastgroup
+        first.setdefault(section_type, (match.start(), match.end()))
+        if section_type == 'undergraduate':
+            undergrad_starts.append(match.start())
+
+    sections = {}
+
+    if 'technology' in first:
+        tech_end = first['technology'][1]
+        end: Optional[int] = next((s for s in undergrad_starts if s >= tech_end), None)
+        sections['technology'] = content[tech_end:end].strip()
+
+    if 'undergraduate' in first:
+        sections['undergraduate'] = content[first['undergraduate'][1]:].strip()
+
+    return sections
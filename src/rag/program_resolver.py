@@ -0,0 +1,244 @@
+"""
+Resolución difusa de nombres de programa
+Normaliza tildes y mayúsculas, consulta una tabla de alias y un índice de
+trigramas construido con los encabezados `### ` durante la ingesta, y devuelve
+el `program_name` canónico para filtrar búsquedas
+"""
+
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Palabras que no distinguen un programa de otro
+GENERIC_NAME_TOKENS = {'ingenieria', 'tecnologia', 'programa', 'carrera'}
+
+# Abreviaturas frecuentes en las consultas
+TOKEN_SYNONYMS = {'ing': 'ingenieria', 'ingeniero': 'ingenieria', 'tec': 'tecnologia', 'tecnologo': 'tecnologia'}
+
+# Alias por nombre normalizado; solo se aplican a los programas que existan en el catálogo
+DEFAULT_ALIASES = {
+    'bioingenieria': ['bioengineering', 'bio ingenieria'],
+    'ingenieria civil': ['civil engineering'],
+    'ingenieria quimica': ['chemical engineering'],
+    'ingenieria industrial': ['industrial engineering'],
+    'ingenieria commercial': ['ingenieria comercial', 'commercial engineering'],
+    'ingenieria electronica': ['electronic engineering', 'electronics engineering'],
+    'ingenieria en energias': ['ingenieria de energias', 'energy engineering'],
+    'ingenieria de sistemas': ['ingenieria sistemas', 'systems engineering'],
+    'ingenieria de sistemas virtual': ['sistemas virtual', 'virtual systems engineering',
+                                       'systems engineering virtual'],
+    'tecnologia en desarrollo de sistemas de informacion y de software': [
+        'tecnologia en desarrollo de software', 'desarrollo de software'],
+    'tecnologia en gestion de procesos industriales': ['gestion de procesos industriales'],
+}
+
+FUZZY_THRESHOLD = 0.72
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas sin tildes y con signos reemplazados por espacios"""
+    text = unicodedata.normalize('NFKD', str(text)).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', text.lower()).split())
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ProgramNameResolver:
+    def __init__(self, aliases: Optional[Dict[str, List[str]]] = None, threshold: float = FUZZY_THRESHOLD):
+        """
+        Args:
+            aliases: Alias extra por nombre (canónico o normalizado) del programa
+            threshold: Similitud Dice de trigramas mínima para aceptar un match difuso
+        """
+
+        self._lock = threading.Lock()
+        self.threshold = threshold
+        self.extra_aliases = {normalize_text(k): list(v) for k, v in (aliases or {}).items()}
+
+        self.programs: Dict[str, str] = {}              # canónico → normalizado
+        self._aliases: Dict[str, str] = {}              # alias normalizado → canónico
+        self._alias_sizes: Dict[str, int] = {}          # alias → nº de trigramas
+        self._trigram_index: Dict[str, List[str]] = defaultdict(list)
+
+        self.stats = {'lookups': 0, 'exact': 0, 'fuzzy': 0, 'misses': 0}
+
+    def __len__(self) -> int:
+        return len(self.programs)
+
+    def clear(self):
+        with self._lock:
+            self.programs.clear()
+            self._aliases.clear()
+            self._alias_sizes.clear()
+            self._trigram_index.clear()
+
+    @staticmethod
+    def _canonical_tokens(text: str) -> List[str]:
+        return [TOKEN_SYNONYMS.get(token, token) for token in normalize_text(text).split()]
+
+    def _register_alias(self, alias: str, program_name: str):
+        alias = ' '.join(self._canonical_tokens(alias))
+        if not alias or alias in self._aliases:
+            return
+        self._aliases[alias] = program_name
+        trigrams = _trigrams(alias)
+        self._alias_sizes[alias] = len(trigrams)
+        for trigram in trigrams:
+            self._trigram_index[trigram].append(alias)
+
+    def add_program(self, program_name: str, aliases: Iterable[str] = ()):
+        """Registra un programa (nombre del encabezado `### `) y sus alias"""
+
+        program_name = program_name.strip()
+        normalized = normalize_text(program_name)
+        if not normalized:
+            return
+
+        with self._lock:
+            if program_name in self.programs and not aliases:
+                return
+            self.programs[program_name] = normalized
+            self._register_alias(program_name, program_name)
+            for alias in [*aliases, *DEFAULT_ALIASES.get(normalized, []), *self.extra_aliases.get(normalized, [])]:
+                self._register_alias(alias, program_name)
+
+    def add_programs(self, program_names: Iterable[str]):
+        for program_name in program_names:
+            self.add_program(program_name)
+
+    def _exact(self, tokens: List[str]) -> List[str]:
+        """
+        Programas cuyos alias aparecen completos en el texto
+        
+        Un alias contenido en otro alias encontrado no cuenta como mención aparte
+        ("ingenieria de sistemas" dentro de "ingenieria de sistemas virtual").
+        """
+        padded = f" {' '.join(tokens)} "
+        matched = [alias for alias in self._aliases if f" {alias} " in padded]
+        mentions = [alias for alias in matched
+                    if not any(alias != other and f" {alias} " in f" {other} " for other in matched)]
+        return list(dict.fromkeys(self._aliases[alias] for alias in mentions))
+
+    def _distinctive(self, tokens: List[str]) -> Optional[str]:
+        """Programa cuyas palabras distintivas aparecen todas; el que cubre más gana y el empate descarta"""
+        query_tokens = set(tokens)
+        best, best_score, tied = None, 0, False
+        for program_name, normalized in self.programs.items():
+            distinctive = {t for t in normalized.split() if len(t) > 2 and t not in GENERIC_NAME_TOKENS}
+            if not distinctive or not distinctive <= query_tokens:
+                continue
+            if len(distinctive) > best_score:
+                best, best_score, tied = program_name, len(distinctive), False
+            elif len(distinctive) == best_score and program_name != best:
+                tied = True
+        return None if tied else best
+
+    def _distinctive_all(self, tokens: List[str]) -> List[str]:
+        """Todos los programas cuyas palabras distintivas aparecen, sin los contenidos en otro encontrado"""
+        query_tokens = set(tokens)
+        matched = {}
+        for program_name, normalized in self.programs.items():
+            distinctive = {t for t in normalized.split() if len(t) > 2 and t not in GENERIC_NAME_TOKENS}
+            if distinctive and distinctive <= query_tokens:
+                matched[program_name] = distinctive
+        return [name for name, words in matched.items()
+                if not any(words < other for other in matched.values())]
+
+    def _shared_trigrams(self, trigrams: Iterable[str], allowed: Optional[Set[str]] = None) -> Dict[str, int]:
+        """Trigramas compartidos con cada alias, contados con el índice invertido"""
+        shared: Dict[str, int] = {}
+        for trigram in trigrams:
+            for alias in self._trigram_index.get(trigram, ()):
+                if allowed is None or alias in allowed:
+                    shared[alias] = shared.get(alias, 0) + 1
+        return shared
+
+    def _fuzzy(self, tokens: List[str]) -> Tuple[Optional[str], float]:
+        """Ventanas de palabras del texto contra los alias con el mismo número de palabras"""
+
+        # Poda: Dice(ventana, alias) >= t exige compartir al menos t/(2-t) de los trigramas
+        # del alias, y una ventana no comparte más que el texto completo (+1 por el borde)
+        min_ratio = self.threshold / (2 - self.threshold)
+        candidates = {
+            alias for alias, overlap in self._shared_trigrams(_trigrams(' '.join(tokens))).items()
+            if overlap + 1 >= min_ratio * self._alias_sizes[alias]
+        }
+        if not candidates:
+            return None, 0.0
+
+        best, best_score, tied = None, 0.0, False
+        for length in {len(alias.split()) for alias in candidates}:
+            same_length = {alias for alias in candidates if len(alias.split()) == length}
+            for start in range(0, len(tokens) - length + 1):
+                window_tokens = tokens[start:start + length]
+                if all(t in GENERIC_NAME_TOKENS or len(t) <= 2 for t in window_tokens):
+                    continue
+                window_trigrams = _trigrams(' '.join(window_tokens))
+
+                for alias, overlap in self._shared_trigrams(window_trigrams, same_length).items():
+                    score = 2 * overlap / (len(window_trigrams) + self._alias_sizes[alias])
+                    program_name = self._aliases[alias]
+                    if score > best_score + 1e-9:
+                        best, best_score, tied = program_name, score, False
+                    elif abs(score - best_score) <= 1e-9 and program_name != best:
+                        tied = True
+
+        if best_score < self.threshold or tied:
+            return None, best_score
+        return best, best_score
+
+    def resolve_with_score(self, text: str) -> Tuple[Optional[str], float, str]:
+        """
+        Returns:
+            (program_name canónico o None, confianza 0-1,
+             método: exact | distinctive | fuzzy | ambiguous | none)
+        """
+        self.stats['lookups'] += 1
+        tokens = self._canonical_tokens(text)
+
+        mentioned = self._exact(tokens)
+        if len(mentioned) == 1:
+            self.stats['exact'] += 1
+            return mentioned[0], 1.0, 'exact'
+        if len(mentioned) > 1:
+            # Varios programas en el mismo texto: no hay un único filtro correcto
+            self.stats['misses'] += 1
+            return None, 0.0, 'ambiguous'
+
+        # El match difuso va antes: un nombre largo mal escrito no debe caer en uno corto contenido
+        program_name, score = self._fuzzy(tokens)
+        if program_name:
+            self.stats['fuzzy'] += 1
+            return program_name, score, 'fuzzy'
+
+        program_name = self._distinctive(tokens)
+        if program_name:
+            self.stats['exact'] += 1
+            return program_name, 1.0, 'distinctive'
+
+        self.stats['misses'] += 1
+        return None, score, 'none'
+
+    def mentions(self, text: str) -> List[str]:
+        """
+        Programas mencionados en el texto (alias completos o palabras distintivas)
+        
+        Sirve para detectar consultas sobre varios programas ("semestre 1 de
+        bioingeniería y semestre 2 de civil"), que resolve() no distingue de una
+        consulta sobre uno solo cuando solo uno aparece con su nombre completo.
+        """
+        tokens = self._canonical_tokens(text)
+        mentioned = self._exact(tokens)
+        return mentioned + [name for name in self._distinctive_all(tokens) if name not in mentioned]
+
+    def resolve(self, text: str) -> Optional[str]:
+        """program_name canónico mencionado en el texto, o None (ninguno o varios)"""
+        return self.resolve_with_score(text)[0]
+
+    def get_stats(self) -> Dict[str, int]:
+        return {'programs': len(self.programs), 'aliases': len(self._aliases), **self.stats}
@@ -7,40 +7,107 @@ import sys
 sys.path.append('.')
 
 from src.embeddings.bge_embeddings import BGEEmbeddings
-from src.rag.vector_store import LocalVectorStore
+from src.rag.store_utils import build_where, create_vector_store, search_with_wheres, sync_vector_store
 from src.rag.curriculum_processor import USCCurriculumProcessor
+from src.rag.colbert_reranker import ColbertIndexedStore, ColbertReranker
+from src.rag.ingestion_pipeline import IngestionPipeline
+from src.rag.intent_classifier import QueryIntentClassifier
+from src.rag.sparse_index import SparseIndex, SparseIndexedStore
+from src.rag.structured_index import CurriculumStructuredIndex
+from src.utils import config
 from typing import Dict, List, Any, Optional
+from pathlib import Path
+import numpy as np
 import time
 from datetime import datetime
 
 class USCCurriculumRAG:
     def __init__(self, 
                  collection_name: str = "usc_curriculum_rag",
-                 vectorstore_dir: str = "./data/vectorstore"):
+                 vectorstore_dir: str = "./data/vectorstore",
+                 embedding_cache_dir: Optional[str] = config.EMBEDDING_CACHE_DIR,
+                 query_batching: bool = False,
+                 vectorstore_backend: Optional[str] = None,
+                 vectorstore_options: Optional[Dict[str, Any]] = None,
+                 retrieval: str = "dense",
+                 sparse_mode: str = "bm25",
+                 fusion: str = "rrf",
+                 colbert_rerank: bool = False,
+                 colbert_options: Optional[Dict[str, Any]] = None):
         """
         Sistema RAG completo para currículums USC
         
         Args:
             collection_name: Nombre de la colección en ChromaDB
             vectorstore_dir: Directorio del vector store
+            embedding_cache_dir: Directorio de la caché de embeddings (None = desactivada);
+                                 los vectores se guardan en EMBEDDING_CACHE_DTYPE
+            query_batching: Si True, agrupa consultas concurrentes en un solo encode
+            vectorstore_backend: "chroma" (ChromaDB), "numpy" (índice exacto) o "faiss" (ANN)
+                                 (None = VECTORSTORE_BACKEND de la configuración)
+            vectorstore_options: Opciones del backend (p.ej. {'index_factory': 'HNSW32'})
+            retrieval: "dense" (solo vectores) o "hybrid" (vectores + índice léxico disperso)
+            sparse_mode: "bm25" (sin pasada extra del modelo) o "bge_lexical" (pesos sparse de BGE-M3)
+            fusion: Fusión híbrida, "rrf" (reciprocal rank) o "weighted"
+            colbert_rerank: Si True, reordena los candidatos con MaxSim sobre vectores ColBERT
+            colbert_options: Opciones del reranker (p.ej. {'pq_subspaces': 64, 'candidates': 20})
         """
         
         print("🚀 INICIALIZANDO SISTEMA RAG USC")
         print("=" * 40)
+        config.ensure_directories()
         
         # Inicializar componentes
         print("1️⃣ Cargando BGE-M3...")
-        self.embedder = BGEEmbeddings()
+        self.embedder = BGEEmbeddings(cache_dir=embedding_cache_dir, cache_dtype=config.EMBEDDING_CACHE_DTYPE)
+        if query_batching:
+            self.embedder.enable_query_batching()
         
         print("\n2️⃣ Configurando Vector Store...")
-        self.vectorstore = LocalVectorStore(
+        self.vectorstore = create_vector_store(
+            backend=vectorstore_backend,
             collection_name=collection_name,
-            persist_directory=vectorstore_dir
+            persist_directory=vectorstore_dir,
+            **(vectorstore_options or {})
         )
         
+        # Índice léxico junto al denso: cada escritura del store lo mantiene al día
+        self.retrieval = retrieval
+        if retrieval == "hybrid":
+            lexical = sparse_mode == "bge_lexical"
+            self.vectorstore = SparseIndexedStore(
+                self.vectorstore,
+                SparseIndex(Path(vectorstore_dir) / f"{collection_name}_sparse", mode="lexical" if lexical else "bm25"),
+                lexical_fn=self.embedder.embed_lexical if lexical else None,
+                fusion=fusion
+            )
+            print(f"   🔤 Recuperación híbrida: {sparse_mode} + {fusion}")
+        elif retrieval != "dense":
+            raise ValueError(f"❌ Modo de recuperación desconocido: {retrieval}")
+        
+        # Segunda etapa opcional: vectores por token en disco y reranking late-interaction
+        self.colbert_rerank = colbert_rerank
+        if colbert_rerank:
+            options = dict(colbert_options or {})
+            candidates = options.pop('candidates', 20)
+            self.vectorstore = ColbertIndexedStore(
+                self.vectorstore,
+                ColbertReranker(Path(vectorstore_dir) / f"{collection_name}_colbert",
+                                dimension=self.embedder.get_dimension(), **options),
+                colbert_fn=self.embedder.embed_colbert,
+                candidates=candidates
+            )
+            print(f"   🎯 Reranking ColBERT: top-{candidates} candidatos")
+        
         print("\n3️⃣ Inicializando Procesador de Currículums...")
         self.processor = USCCurriculumProcessor()
         
+        # Respuestas exactas (costos, créditos, semestres) sin búsqueda vectorial
+        self.structured_index = CurriculumStructuredIndex()
+        
+        # Intención de la consulta (filtro y n_results) a partir del embedding de la búsqueda
+        self.intent_classifier = QueryIntentClassifier()
+        
         # Estado del sistema
         self.is_loaded = False
         self.chunks_count = 0
@@ -50,13 +117,21 @@ class USCCurriculumRAG:
     
     def load_curriculum_data(self, 
                            curriculum_file: str,
-                           force_reload: bool = False) -> bool:
+                           force_reload: bool = False,
+                           incremental: bool = False,
+                           ingest_workers: int = 1,
+                           streaming: bool = False) -> bool:
         """
         Carga datos de currículums al sistema RAG
         
         Args:
             curriculum_file: Ruta al archivo .md de currículums
             force_reload: Si True, recarga datos aunque ya existan
+            incremental: Si True, sincroniza solo los chunks nuevos/modificados
+                         sin limpiar la colección
+            ingest_workers: Procesos para el chunking estructural (1 = secuencial)
+            streaming: Si True, usa el pipeline parse → embed → upsert por lotes
+                       (memoria constante, consultable antes de terminar)
             
         Returns:
             True si la carga fue exitosa
@@ -68,37 +143,52 @@ class USCCurriculumRAG:
         print(f"   Archivo: {curriculum_file}")
         
         # Verificar si ya hay datos cargados
-        current_count = self.vectorstore.collection.count()
-        if current_count > 0 and not force_reload:
+        current_count = self.vectorstore.count()
+        if current_count > 0 and not force_reload and not incremental:
             print(f"   ℹ️  Ya hay {current_count} documentos cargados")
             user_input = input("   ¿Recargar datos? (y/N): ").lower()
             if user_input != 'y':
                 self.is_loaded = True
                 self.chunks_count = current_count
+                self._build_structured_index(curriculum_file)
                 return True
             else:
                 print("   🗑️  Limpiando datos existentes...")
                 self.vectorstore.clear_collection()
         
+        self.structured_index.clear()
+        
+        if streaming:
+            return self._load_curriculum_streaming(curriculum_file, incremental, start_time)
+        
         try:
             # 1. Procesar archivo con chunking inteligente
             print("\n🧠 Aplicando chunking inteligente...")
-            chunks = self.processor.process_curriculum_file(curriculum_file)
+            chunks = self.processor.process_curriculum_file(curriculum_file, workers=ingest_workers)
             
             if not chunks:
                 print("❌ No se pudieron extraer chunks del archivo")
                 return False
             
-            # 2. Crear embeddings con BGE-M3
-            print(f"\n🔄 Creando embeddings para {len(chunks)} chunks...")
+            self.structured_index.add_chunks(chunks)
             texts = [chunk['content'] for chunk in chunks]
             metadatas = [chunk['metadata'] for chunk in chunks]
             
-            embeddings = self.embedder.embed_documents(texts)
-            
-            # 3. Almacenar en vector store
-            print(f"\n💾 Almacenando en vector store...")
-            success = self.vectorstore.add_documents(texts, metadatas, embeddings)
+            if incremental:
+                # 2-3. Embeber y almacenar solo el diff contra lo ya indexado
+                print(f"\n🔁 Sincronizando {len(chunks)} chunks con el vector store...")
+                sync_summary = sync_vector_store(
+                    self.vectorstore, texts, metadatas, self.embedder.embed_documents
+                )
+                success = sync_summary['success']
+            else:
+                # 2. Crear embeddings con BGE-M3
+                print(f"\n🔄 Creando embeddings para {len(chunks)} chunks...")
+                embeddings = self.embedder.embed_documents(texts)
+                
+                # 3. Almacenar en vector store
+                print(f"\n💾 Almacenando en vector store...")
+                success = self.vectorstore.add_documents(texts, metadatas, embeddings)
             
             if success:
                 # Actualizar estado
@@ -122,10 +212,77 @@ class USCCurriculumRAG:
             print(f"❌ Error cargando datos: {e}")
             return False
     
+    def _load_curriculum_streaming(self, curriculum_file: str, incremental: bool, start_time: float) -> bool:
+        """Carga con IngestionPipeline: los lotes se escriben a medida que se embeben"""
+        
+        try:
+            chunk_source = self.processor.iter_chunks([curriculum_file])
+            pipeline = IngestionPipeline(
+                self.vectorstore, self.embedder.embed_documents, incremental=incremental
+            )
+            summary = pipeline.run(self.structured_index.observe(chunk_source))
+            
+            if not summary['success']:
+                print("❌ Error en la ingesta en streaming")
+                return False
+            if summary['chunks_seen'] == 0:
+                print("❌ No se pudieron extraer chunks del archivo")
+                return False
+            
+            self.is_loaded = True
+            self.chunks_count = summary['chunks_seen']
+            self.load_time = time.time() - start_time
+            
+            print(f"\n🎉 DATOS CARGADOS EXITOSAMENTE (streaming)")
+            print(f"   Chunks procesados: {self.chunks_count}")
+            print(f"   Lotes escritos: {summary['batches']}")
+            print(f"   Tiempo de carga: {self.load_time:.2f}s")
+            self._show_data_statistics()
+            
+            return True
+            
+        except Exception as e:
+            print(f"❌ Error cargando datos: {e}")
+            return False
+    
+    def _build_structured_index(self, curriculum_file: str):
+        """Reconstruye el índice estructurado cuando se reutilizan datos ya cargados"""
+        
+        try:
+            self.structured_index.clear()
+            self.structured_index.add_chunks(USCCurriculumProcessor(verbose=False).iter_chunks([curriculum_file]))
+            print(f"   📇 Índice estructurado: {len(self.structured_index)} programas")
+        except Exception as e:
+            print(f"   ⚠️  Índice estructurado no disponible: {e}")
+    
+    def _structured_answer(self, query: str) -> Optional[Dict[str, Any]]:
+        """Respuesta exacta desde el índice estructurado, en el formato de search_curriculum"""
+        
+        start_time = time.time()
+        answer = self.structured_index.lookup(query)
+        if answer is None:
+            return None
+        
+        processed_results = self._process_search_results(answer['results'], query)
+        print(f"\n📇 Respuesta exacta: {answer['program_name']} ({answer['intent']})")
+        
+        return {
+            'success': True,
+            'query': query,
+            'results': processed_results,
+            'total_found': len(processed_results),
+            'search_time': time.time() - start_time,
+            'filter_applied': None,
+            'detected_type': answer['intent'],
+            'search_strategy': 'structured_index'
+        }
+    
     def search_curriculum(self, 
                          query: str, 
                          n_results: int = 5,
-                         filter_type: Optional[str] = None) -> Dict[str, Any]:
+                         filter_type: Optional[str] = None,
+                         program_name: Optional[str] = None,
+                         query_embedding: Optional[np.ndarray] = None) -> Dict[str, Any]:
         """
         Busca información en currículums usando RAG
         
@@ -133,6 +290,8 @@ class USCCurriculumRAG:
             query: Consulta del usuario
             n_results: Número de resultados a retornar
             filter_type: Filtro por tipo de chunk (fee, profile, curriculum, etc.)
+            program_name: Restringe la búsqueda a un programa (nombre canónico)
+            query_embedding: Embedding ya calculado de la consulta (evita otro encode)
             
         Returns:
             Diccionario con resultados de búsqueda
@@ -148,23 +307,25 @@ class USCCurriculumRAG:
         print(f"   Query: '{query}'")
         if filter_type:
             print(f"   Filtro: {filter_type}")
+        if program_name:
+            print(f"   Programa: {program_name}")
         
         start_time = time.time()
         
         try:
             # 1. Crear embedding de consulta
-            query_embedding = self.embedder.embed_query(query)
-            
-            # 2. Realizar búsqueda (con filtro opcional)
-            search_params = {}
-            if filter_type:
-                search_params['where'] = {'type': filter_type}
+            if query_embedding is None:
+                query_embedding = self.embedder.embed_query(query)
             
-            results = self.vectorstore.search(
-                query_embedding, 
-                n_results=n_results,
-                **search_params
-            )
+            # 2. Realizar búsqueda (con filtros opcionales de tipo y programa)
+            where = build_where(filter_type, program_name)
+            n_candidates = max(n_results, self.vectorstore.candidates) if self.colbert_rerank else n_results
+            if self.retrieval == "hybrid":
+                results = self.vectorstore.search_hybrid(query, query_embedding, n_results=n_candidates, where=where)
+            else:
+                results = self.vectorstore.search(query_embedding, n_results=n_candidates, where=where)
+            if self.colbert_rerank:
+                results = self.vectorstore.rerank(query, results, n_results=n_results)
             
             # 3. Procesar y enriquecer resultados
             processed_results = self._process_search_results(results, query)
@@ -177,7 +338,9 @@ class USCCurriculumRAG:
                 'results': processed_results,
                 'total_found': len(processed_results),
                 'search_time': search_time,
-                'filter_applied': filter_type
+                'filter_applied': filter_type,
+                'program_filter': program_name,
+                'retrieval': self.retrieval
             }
             
         except Exception as e:
@@ -187,6 +350,82 @@ class USCCurriculumRAG:
                 'error': str(e)
             }
     
+    def search_many(self, 
+                    queries: List[str], 
+                    n_results: int = 5,
+                    filter_type: Optional[str] = None,
+                    program_names: Optional[List[Optional[str]]] = None) -> List[Dict[str, Any]]:
+        """
+        Busca varias consultas con un solo encode y una sola búsqueda vectorial
+        
+        Args:
+            queries: Consultas del usuario
+            n_results: Número de resultados por consulta
+            filter_type: Filtro por tipo de chunk aplicado a todas las consultas
+            program_names: Programa canónico por consulta (None = sin filtro de programa)
+            
+        Returns:
+            Lista de resultados con el mismo formato que search_curriculum
+        """
+        
+        if not self.is_loaded:
+            return [{
+                'success': False,
+                'error': 'Datos no cargados. Ejecuta load_curriculum_data() primero.'
+            } for _ in queries]
+        
+        print(f"\n🔍 BÚSQUEDA MÚLTIPLE EN CURRÍCULUMS")
+        print(f"   Consultas: {len(queries)}")
+        if filter_type:
+            print(f"   Filtro: {filter_type}")
+        
+        start_time = time.time()
+        
+        try:
+            # 1. Embeddings de todas las consultas en un solo lote
+            query_embeddings = self.embedder.embed_queries(queries)
+            
+            # 2. Una búsqueda multi-consulta (los filtros por programa se combinan con $in)
+            names = program_names or [None] * len(queries)
+            wheres = [build_where(filter_type, name) for name in names]
+            n_candidates = max(n_results, self.vectorstore.candidates) if self.colbert_rerank else n_results
+            if self.retrieval == "hybrid":
+                batch_results = self.vectorstore.search_hybrid_batch(
+                    queries, list(query_embeddings), n_results=n_candidates, wheres=wheres
+                )
+            else:
+                batch_results = search_with_wheres(
+                    self.vectorstore, list(query_embeddings), wheres, n_results=n_candidates
+                )
+            if self.colbert_rerank:
+                batch_results = self.vectorstore.rerank_batch(queries, batch_results, n_results=n_results)
+            
+            search_time = time.time() - start_time
+            
+            # 3. Procesar resultados por consulta
+            responses = []
+            for query, name, results in zip(queries, names, batch_results):
+                processed_results = self._process_search_results(results, query)
+                responses.append({
+                    'success': True,
+                    'query': query,
+                    'results': processed_results,
+                    'total_found': len(processed_results),
+                    'search_time': search_time,
+                    'filter_applied': filter_type,
+                    'program_filter': name,
+                    'retrieval': self.retrieval
+                })
+            
+            return responses
+            
+        except Exception as e:
+            print(f"❌ Error en búsqueda múltiple: {e}")
+            return [{
+                'success': False,
+                'error': str(e)
+            } for _ in queries]
+    
     def smart_search(self, query: str) -> Dict[str, Any]:
         """
         Búsqueda inteligente que detecta automáticamente el tipo de consulta
@@ -198,37 +437,34 @@ class USCCurriculumRAG:
             Resultados de búsqueda optimizada
         """
         
-        # Detectar tipo de consulta basado en palabras clave
-        query_lower = query.lower()
+        # Costos, créditos y semestres de un programa: respuesta exacta sin vectores
+        structured = self._structured_answer(query)
+        if structured is not None:
+            return structured
         
-        detected_type = None
-        search_params = {'n_results': 5}
+        # Programa mencionado: la búsqueda vectorial se restringe a sus chunks
+        program_name = self.structured_index.resolve_program(query)
         
-        # Detección de tipo de consulta
-        if any(word in query_lower for word in ['costo', 'precio', 'fee', 'cuánto', 'valor']):
-            detected_type = 'fee'
-            search_params['filter_type'] = 'fee'
-            search_params['n_results'] = 10  # Más resultados para comparar costos
-            
-        elif any(word in query_lower for word in ['trabajo', 'laboral', 'ocupacional', 'desempeñar', 'campo']):
-            detected_type = 'occupational_profile'
-            search_params['filter_type'] = 'occupational_profile'
-            
-        elif any(word in query_lower for word in ['materia', 'semestre', 'curriculum', 'plan', 'asignatura']):
-            detected_type = 'curriculum'
-            # No filtrar por tipo específico, pero dar preferencia a curriculum
-            search_params['n_results'] = 8
-            
-        elif any(word in query_lower for word in ['primer', 'segundo', 'tercer', 'semestre 1', 'semestre 2']):
-            detected_type = 'curriculum_semester'
-            search_params['filter_type'] = 'curriculum_semester'
+        # Intención por centroides sobre el mismo embedding que usa la búsqueda (sin encode extra)
+        query_embedding = self.embedder.embed_query(query)
+        self.intent_classifier.ensure_fitted(self.embedder.embed_queries)
+        route = self.intent_classifier.route(query_embedding, program_name)
+        detected_type = route['intent'] if route['intent'] != 'general' else None
         
         # Realizar búsqueda
-        results = self.search_curriculum(query, **search_params)
+        results = self.search_curriculum(
+            query,
+            n_results=route['n_results'],
+            filter_type=route['filter_type'],
+            program_name=program_name,
+            query_embedding=query_embedding
+        )
         
         # Agregar información de detección
         if results['success']:
             results['detected_type'] = detected_type
+            results['intent_confidence'] = route['confidence']
+            results['detected_program'] = program_name
             results['search_strategy'] = 'smart_detection'
             
             print(f"   🎯 Tipo detectado: {detected_type or 'general'}")
@@ -254,20 +490,33 @@ class USCCurriculumRAG:
         print(f"   Programas: {', '.join(programs)}")
         print(f"   Aspecto: {comparison_aspect}")
         
-        comparison_results = {}
+        found = {}
         
+        # Primero el índice estructurado; solo lo que no resuelve va a vectores
         for program in programs:
-            query = f"{program} {comparison_aspect}"
-            results = self.search_curriculum(
-                query, 
+            exact = self.structured_index.lookup_aspect(program, comparison_aspect)
+            if exact is not None:
+                found[program] = self._process_search_results(exact, program)[0]
+        
+        pending = [program for program in programs if program not in found]
+        if pending:
+            # Nombre canónico → filtro where por programa en lugar de adivinar por embedding
+            resolved = [self.structured_index.resolve_program(program) for program in pending]
+            queries = [f"{name or program} {comparison_aspect}" for program, name in zip(pending, resolved)]
+            
+            # Todas las consultas en un solo encode
+            all_results = self.search_many(
+                queries, 
                 n_results=3,
-                filter_type=comparison_aspect if comparison_aspect != 'curriculum' else None
+                filter_type=comparison_aspect if comparison_aspect != 'curriculum' else None,
+                program_names=resolved
             )
             
-            if results['success'] and results['results']:
-                comparison_results[program] = results['results'][0]
-            else:
-                comparison_results[program] = None
+            for program, results in zip(pending, all_results):
+                if results['success'] and results['results']:
+                    found[program] = results['results'][0]
+        
+        comparison_results = {program: found.get(program) for program in programs}
         
         return {
             'comparison_aspect': comparison_aspect,
@@ -366,6 +615,8 @@ class USCCurriculumRAG:
             'chunks_loaded': self.chunks_count,
             'load_time': self.load_time,
             'vectorstore_stats': vectorstore_stats,
+            'structured_index': self.structured_index.get_stats(),
+            'intent_classifier': self.intent_classifier.get_stats(),
             'embedder_info': self.embedder.get_model_info(),
             'processor_stats': self.processor.get_processing_stats()
         }
\ No newline at end of file
@@ -0,0 +1,461 @@
+"""
+Índice léxico disperso junto al índice denso (recuperación híbrida)
+BM25 sobre el texto de los chunks o pesos léxicos de BGE-M3, guardados como
+listas invertidas en arrays NumPy contiguos: una consulta suma sus postings
+con np.bincount y el resultado se fusiona con el denso por RRF o por pesos
+"""
+
+import json
+import os
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from src.rag.numpy_vector_store import MetadataMaskIndex
+from src.rag.program_resolver import normalize_text
+from src.rag.store_utils import deferred_writes, make_chunk_ids, search_with_wheres
+
+SPANISH_STOPWORDS = {
+    'a', 'al', 'como', 'con', 'cual', 'cuales', 'de', 'del', 'el', 'en', 'es', 'esta', 'este', 'la',
+    'las', 'lo', 'los', 'mas', 'me', 'mi', 'o', 'para', 'por', 'que', 'se', 'si', 'sin', 'su', 'sus',
+    'un', 'una', 'uno', 'y', 'ya', 'hay', 'tiene', 'tienen', 'son', 'ser', 'sobre', 'entre'
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Palabras normalizadas (sin tildes ni mayúsculas) excluyendo stopwords"""
+    return [token for token in normalize_text(text).split() if len(token) > 1 and token not in SPANISH_STOPWORDS]
+
+
+class SparseIndex:
+    def __init__(self,
+                 persist_path: Optional[str] = None,
+                 mode: str = "bm25",
+                 k1: float = 1.2,
+                 b: float = 0.75):
+        """
+        Args:
+            persist_path: Directorio donde se guarda el índice (None = solo memoria)
+            mode: "bm25" (texto de los chunks) o "lexical" (pesos léxicos externos, p.ej. BGE-M3)
+            k1, b: Parámetros de BM25
+        """
+
+        if mode not in ("bm25", "lexical"):
+            raise ValueError(f"❌ Modo de índice disperso desconocido: {mode}")
+
+        self.mode = mode
+        self.k1 = k1
+        self.b = b
+        self.persist_path = Path(persist_path) if persist_path else None
+
+        self._ids: List[str] = []
+        self._documents: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._terms: List[Dict[str, float]] = []  # término → tf (bm25) o peso (lexical)
+        self._id_to_row: Dict[str, int] = {}
+
+        # Listas invertidas compiladas (se reconstruyen tras cada cambio, en la siguiente consulta)
+        self._compiled = False
+        self._vocab: Dict[str, int] = {}
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._post_rows = np.zeros(0, dtype=np.int32)
+        self._post_weights = np.zeros(0, dtype=np.float32)
+        self._mask_index = MetadataMaskIndex([])
+
+        # Escrituras diferidas: dentro de deferred_writes() se guarda una sola vez al salir
+        self._deferred = 0
+        self._dirty = False
+
+        self.stats = {'queries_processed': 0, 'compilations': 0}
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+
+    def _doc_terms(self, text: str, weights: Optional[Dict[str, float]]) -> Dict[str, float]:
+        if self.mode == "lexical":
+            if weights is None:
+                raise ValueError("❌ El modo 'lexical' requiere pesos por documento")
+            return {str(term): float(weight) for term, weight in weights.items() if weight > 0}
+        return dict(Counter(tokenize(text)))
+
+    def upsert(self,
+               ids: List[str],
+               texts: List[str],
+               metadatas: List[Dict[str, Any]],
+               weights: Optional[List[Dict[str, float]]] = None,
+               replace: bool = True):
+        """Inserta o reemplaza documentos; con replace=False los IDs existentes se ignoran"""
+
+        weights = weights if weights is not None else [None] * len(ids)
+        for doc_id, text, metadata, doc_weights in zip(ids, texts, metadatas, weights):
+            row = self._id_to_row.get(doc_id)
+            if row is not None and not replace:
+                continue
+
+            cleaned = {key: value if isinstance(value, (str, int, float, bool)) else str(value)
+                       for key, value in metadata.items()}
+            terms = self._doc_terms(text, doc_weights)
+
+            if row is None:
+                self._id_to_row[doc_id] = len(self._ids)
+                self._ids.append(doc_id)
+                self._documents.append(text)
+                self._metadatas.append(cleaned)
+                self._terms.append(terms)
+            else:
+                self._documents[row] = text
+                self._metadatas[row] = cleaned
+                self._terms[row] = terms
+
+        self._after_write()
+
+    def delete(self, ids: List[str]):
+        remove = {self._id_to_row[doc_id] for doc_id in ids if doc_id in self._id_to_row}
+        if not remove:
+            return
+
+        keep = [row for row in range(len(self._ids)) if row not in remove]
+        self._ids = [self._ids[row] for row in keep]
+        self._documents = [self._documents[row] for row in keep]
+        self._metadatas = [self._metadatas[row] for row in keep]
+        self._terms = [self._terms[row] for row in keep]
+        self._id_to_row = {doc_id: row for row, doc_id in enumerate(self._ids)}
+
+        self._after_write()
+
+    def clear(self):
+        self._ids, self._documents, self._metadatas, self._terms = [], [], [], []
+        self._id_to_row = {}
+        self._after_write()
+
+    def _after_write(self):
+        """Invalida las listas compiladas y guarda salvo que las escrituras estén diferidas"""
+        self._compiled = False
+        self._dirty = True
+        if not self._deferred:
+            self.flush()
+
+    def flush(self):
+        """Guarda en disco las escrituras pendientes (no-op si no hay cambios)"""
+        if self._dirty:
+            self._save()
+            self._dirty = False
+
+    @contextmanager
+    def deferred_writes(self):
+        """
+        Agrupa escrituras con un solo guardado al final, como NumpyVectorStore
+
+        Sin esto cada lote de una ingesta reescribe sparse.json completo.
+        """
+        self._deferred += 1
+        try:
+            yield self
+        finally:
+            self._deferred -= 1
+            if not self._deferred:
+                self.flush()
+
+    # ------------------------------------------------------------------
+    # Compilación y búsqueda
+    # ------------------------------------------------------------------
+
+    def _compile(self):
+        """Construye las listas invertidas: postings de cada término contiguos y ordenados"""
+
+        vocab: Dict[str, int] = {}
+        term_ids, rows, values = [], [], []
+        for row, terms in enumerate(self._terms):
+            for term, value in terms.items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                rows.append(row)
+                values.append(value)
+
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        rows = np.asarray(rows, dtype=np.int32)
+        values = np.asarray(values, dtype=np.float32)
+
+        if self.mode == "bm25" and len(values):
+            # Peso BM25 precalculado por posting: idf · tf·(k1+1) / (tf + k1·(1 - b + b·dl/avgdl))
+            doc_lengths = np.array([sum(terms.values()) for terms in self._terms], dtype=np.float32)
+            avg_length = float(doc_lengths.mean()) or 1.0
+            doc_freq = np.bincount(term_ids, minlength=len(vocab)).astype(np.float32)
+            idf = np.log1p((len(self._terms) - doc_freq + 0.5) / (doc_freq + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * doc_lengths[rows] / avg_length)
+            values = idf[term_ids] * values * (self.k1 + 1) / (values + norm)
+
+        order = np.argsort(term_ids, kind='stable')
+        self._vocab = vocab
+        self._post_rows = np.ascontiguousarray(rows[order])
+        self._post_weights = np.ascontiguousarray(values[order], dtype=np.float32)
+        self._offsets = np.concatenate([[0], np.cumsum(np.bincount(term_ids, minlength=len(vocab)))]).astype(np.int64)
+        self._mask_index = MetadataMaskIndex(self._metadatas)
+        self._compiled = True
+        self.stats['compilations'] += 1
+
+    def _query_terms(self, query: str, query_weights: Optional[Dict[str, float]]) -> Dict[str, float]:
+        if self.mode == "lexical":
+            return {str(term): float(weight) for term, weight in (query_weights or {}).items()}
+        return dict(Counter(tokenize(query)))
+
+    def scores(self, query: str, query_weights: Optional[Dict[str, float]] = None) -> np.ndarray:
+        """Puntaje de todos los documentos: una suma vectorizada de los postings de la consulta"""
+
+        if not self._compiled:
+            self._compile()
+
+        slices_rows, slices_weights = [], []
+        for term, query_weight in self._query_terms(query, query_weights).items():
+            term_id = self._vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = self._offsets[term_id], self._offsets[term_id + 1]
+            slices_rows.append(self._post_rows[start:end])
+            slices_weights.append(self._post_weights[start:end] * query_weight)
+
+        if not slices_rows:
+            return np.zeros(len(self._ids), dtype=np.float32)
+        return np.bincount(np.concatenate(slices_rows), weights=np.concatenate(slices_weights),
+                           minlength=len(self._ids))
+
+    def search(self,
+               query: str,
+               n_results: int = 5,
+               where: Optional[Dict] = None,
+               query_weights: Optional[Dict[str, float]] = None) -> Dict[str, List]:
+        """Top-k léxico con el formato de vector_store.search más 'scores'"""
+
+        result = {'documents': [], 'metadatas': [], 'distances': [], 'ids': [], 'scores': []}
+        if not self._ids:
+            return result
+
+        scores = self.scores(query, query_weights)
+        mask = self._mask_index.mask(where)
+        if mask is not None:
+            scores = np.where(mask, scores, 0.0)
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > n_results:
+            candidates = candidates[np.argpartition(-scores[candidates], n_results - 1)[:n_results]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+        self.stats['queries_processed'] += 1
+        top = float(scores[candidates[0]]) if len(candidates) else 1.0
+        for row in candidates:
+            result['documents'].append(self._documents[row])
+            result['metadatas'].append(self._metadatas[row])
+            result['ids'].append(self._ids[row])
+            result['scores'].append(float(scores[row]))
+            result['distances'].append(1.0 - float(scores[row]) / top)
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        if not self._compiled and self._ids:
+            self._compile()
+        return {
+            'mode': self.mode,
+            'documents': len(self._ids),
+            'vocabulary': len(self._vocab),
+            'postings': int(len(self._post_rows)),
+            'memory_bytes': int(self._post_rows.nbytes + self._post_weights.nbytes + self._offsets.nbytes),
+            **self.stats
+        }
+
+    # ------------------------------------------------------------------
+    # Persistencia
+    # ------------------------------------------------------------------
+
+    def _save(self):
+        """Escritura atómica (archivo temporal + rename), como NumpyVectorStore"""
+        if self.persist_path is None:
+            return
+
+        self.persist_path.mkdir(parents=True, exist_ok=True)
+        records_tmp = self.persist_path / "sparse.tmp.json"
+        with open(records_tmp, 'w', encoding='utf-8') as f:
+            json.dump({
+                'mode': self.mode,
+                'ids': self._ids,
+                'documents': self._documents,
+                'metadatas': self._metadatas,
+                'terms': self._terms
+            }, f, ensure_ascii=False)
+        os.replace(records_tmp, self.persist_path / "sparse.json")
+
+    def _load(self):
+        if self.persist_path is None or not (self.persist_path / "sparse.json").exists():
+            return
+
+        with open(self.persist_path / "sparse.json", 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        if records.get('mode') != self.mode:
+            print(f"⚠️  Índice disperso en modo '{records.get('mode')}', se esperaba '{self.mode}': se ignora")
+            return
+
+        self._ids = records['ids']
+        self._documents = records['documents']
+        self._metadatas = records['metadatas']
+        self._terms = records['terms']
+        self._id_to_row = {doc_id: row for row, doc_id in enumerate(self._ids)}
+
+
+def fuse_results(dense: Dict[str, List],
+                 sparse: Dict[str, List],
+                 n_results: int = 5,
+                 method: str = "rrf",
+                 rrf_k: int = 60,
+                 dense_weight: float = 0.5) -> Dict[str, List]:
+    """
+    Fusiona un ranking denso y uno léxico
+
+    "rrf": suma de 1/(k + rango) de cada lista. "weighted": mezcla lineal de la
+    similitud densa (1 - distancia) y el puntaje léxico normalizado por el máximo.
+    La distancia devuelta es 1 - puntaje fusionado normalizado a [0, 1], así
+    _process_search_results ordena y reporta la relevancia fusionada.
+    """
+
+    records: Dict[str, Dict[str, Any]] = {}
+    for source in (dense, sparse):
+        for doc_id, document, metadata in zip(source['ids'], source['documents'], source['metadatas']):
+            records.setdefault(doc_id, {'document': document, 'metadata': metadata})
+
+    fused: Dict[str, float] = {}
+    if method == "rrf":
+        for weight, source in ((dense_weight, dense), (1 - dense_weight, sparse)):
+            for rank, doc_id in enumerate(source['ids']):
+                fused[doc_id] = fused.get(doc_id, 0.0) + weight / (rrf_k + rank + 1)
+        best_possible = 1.0 / (rrf_k + 1)
+    elif method == "weighted":
+        top_sparse = max(sparse.get('scores') or [0.0]) or 1.0
+        for doc_id, distance in zip(dense['ids'], dense['distances']):
+            fused[doc_id] = fused.get(doc_id, 0.0) + dense_weight * max(0.0, 1.0 - distance)
+        for doc_id, score in zip(sparse['ids'], sparse.get('scores', [])):
+            fused[doc_id] = fused.get(doc_id, 0.0) + (1 - dense_weight) * score / top_sparse
+        best_possible = 1.0
+    else:
+        raise ValueError(f"❌ Método de fusión desconocido: {method}")
+
+    ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:n_results]
+    return {
+        'documents': [records[doc_id]['document'] for doc_id, _ in ranked],
+        'metadatas': [records[doc_id]['metadata'] for doc_id, _ in ranked],
+        'distances': [1.0 - min(score / best_possible, 1.0) for _, score in ranked],
+        'ids': [doc_id for doc_id, _ in ranked]
+    }
+
+
+class SparseIndexedStore:
+    """
+    Vector store con índice léxico asociado
+
+    Toda escritura (add, upsert, delete, clear) actualiza también el índice
+    disperso, así la ingesta por lotes, la incremental y el pipeline lo
+    mantienen sin cambios. El resto de métodos se delegan al store denso.
+    """
+
+    def __init__(self,
+                 store,
+                 sparse_index: SparseIndex,
+                 lexical_fn: Optional[Callable[[List[str]], List[Dict[str, float]]]] = None,
+                 fusion: str = "rrf",
+                 candidates_factor: int = 4):
+        """
+        Args:
+            store: Vector store denso (chroma, numpy o faiss)
+            sparse_index: Índice disperso donde se reflejan las escrituras
+            lexical_fn: Pesos léxicos por texto (requerido si el índice está en modo 'lexical')
+            fusion: "rrf" o "weighted"
+            candidates_factor: Candidatos por lista = n_results × factor antes de fusionar
+        """
+
+        if sparse_index.mode == "lexical" and lexical_fn is None:
+            raise ValueError("❌ El índice léxico requiere lexical_fn")
+
+        self.store = store
+        self.sparse_index = sparse_index
+        self.lexical_fn = lexical_fn
+        self.fusion = fusion
+        self.candidates_factor = candidates_factor
+
+        if len(sparse_index) != store.count():
+            print(f"⚠️  Índice léxico con {len(sparse_index)} documentos y vector store con {store.count()}: "
+                  f"recarga los datos para sincronizarlos")
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    @contextmanager
+    def deferred_writes(self):
+        """Difiere el guardado del store denso y del índice léxico hasta el final del bloque"""
+        with deferred_writes(self.store), self.sparse_index.deferred_writes():
+            yield self
+
+    def _weights(self, texts: List[str]) -> Optional[List[Dict[str, float]]]:
+        return self.lexical_fn(texts) if self.lexical_fn is not None else None
+
+    def add_documents(self, texts, metadatas, embeddings, ids: Optional[List[str]] = None) -> bool:
+        ids = ids if ids is not None else make_chunk_ids(texts, metadatas)
+        success = self.store.add_documents(texts, metadatas, embeddings, ids=ids)
+        if success:
+            self.sparse_index.upsert(ids, texts, metadatas, self._weights(texts), replace=False)
+        return success
+
+    def upsert_documents(self, texts, metadatas, embeddings, ids: Optional[List[str]] = None) -> bool:
+        ids = ids if ids is not None else make_chunk_ids(texts, metadatas)
+        success = self.store.upsert_documents(texts, metadatas, embeddings, ids=ids)
+        if success:
+            self.sparse_index.upsert(ids, texts, metadatas, self._weights(texts))
+        return success
+
+    def delete_documents(self, ids: List[str]) -> bool:
+        success = self.store.delete_documents(ids)
+        if success:
+            self.sparse_index.delete(ids)
+        return success
+
+    def clear_collection(self) -> bool:
+        success = self.store.clear_collection()
+        if success:
+            self.sparse_index.clear()
+        return success
+
+    def search_hybrid_batch(self,
+                            queries: List[str],
+                            query_embeddings: List[np.ndarray],
+                            n_results: int = 5,
+                            wheres: Optional[List[Optional[Dict]]] = None) -> List[Dict[str, List]]:
+        """Búsqueda densa + léxica por consulta, fusionada; sin índice léxico cae a solo densa"""
+
+        wheres = wheres if wheres is not None else [None] * len(queries)
+        n_candidates = n_results * self.candidates_factor
+        dense_results = search_with_wheres(self.store, query_embeddings, wheres, n_results=n_candidates)
+
+        if len(self.sparse_index) == 0:
+            return [{key: values[:n_results] for key, values in result.items()} for result in dense_results]
+
+        query_weights = self._weights(queries) or [None] * len(queries)
+        fused = []
+        for query, weights, where, dense in zip(queries, query_weights, wheres, dense_results):
+            sparse = self.sparse_index.search(query, n_results=n_candidates, where=where, query_weights=weights)
+            fused.append(fuse_results(dense, sparse, n_results=n_results, method=self.fusion))
+        return fused
+
+    def search_hybrid(self,
+                      query: str,
+                      query_embedding: np.ndarray,
+                      n_results: int = 5,
+                      where: Optional[Dict] = None) -> Dict[str, List]:
+        return self.search_hybrid_batch([query], [query_embedding], n_results=n_results, wheres=[where])[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.store.get_stats()
+        stats['sparse_index'] = self.sparse_index.get_stats()
+        return stats
@@ -0,0 +1,368 @@
+"""
+Utilidades compartidas por los backends de vector store
+IDs deterministas, sincronización incremental y selección de backend
+"""
+
+import hashlib
+import json
+import re
+import threading
+import unicodedata
+from collections import Counter
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+
+def make_chunk_id(content: str, metadata: Dict[str, Any]) -> str:
+    """
+    ID determinista de un chunk: programa + tipo + semestre + hash del contenido
+    
+    El mismo chunk produce siempre el mismo ID, así una recarga puede
+    compararse contra lo ya almacenado en lugar de reconstruir la colección.
+    """
+    
+    program = unicodedata.normalize('NFKD', str(metadata.get('program_name', 'unknown')))
+    program = program.encode('ascii', 'ignore').decode('ascii').lower()
+    program = re.sub(r'[^a-z0-9]+', '-', program).strip('-') or 'unknown'
+    
+    parts = [program, str(metadata.get('type', 'chunk'))]
+    if metadata.get('semester_number'):
+        parts.append(f"sem{metadata['semester_number']}")
+    parts.append(hashlib.sha1(content.encode('utf-8')).hexdigest()[:12])
+    
+    return "__".join(parts)
+
+
+class ChunkIdAssigner:
+    """
+    Asigna IDs deterministas chunk a chunk
+    
+    Recuerda los IDs ya emitidos para dar sufijo ordinal a los duplicados
+    exactos, así un flujo por lotes obtiene los mismos IDs que make_chunk_ids
+    sobre la lista completa.
+    """
+    
+    def __init__(self):
+        self._seen: Dict[str, int] = {}
+    
+    def assign(self, content: str, metadata: Dict[str, Any]) -> str:
+        chunk_id = make_chunk_id(content, metadata)
+        occurrence = self._seen.get(chunk_id, 0)
+        self._seen[chunk_id] = occurrence + 1
+        return chunk_id if occurrence == 0 else f"{chunk_id}~{occurrence}"
+
+
+def make_chunk_ids(texts: List[str], metadatas: List[Dict[str, Any]]) -> List[str]:
+    """IDs deterministas para un lote; los duplicados exactos reciben sufijo ordinal"""
+    
+    assigner = ChunkIdAssigner()
+    return [assigner.assign(text, metadata) for text, metadata in zip(texts, metadatas)]
+
+
+class CollectionFacets:
+    """
+    Conteo y facetas (tipo → n, programa → n) de una colección en memoria
+    
+    Se mantiene en cada escritura/eliminación del store, así el conteo, los
+    IDs y las estadísticas se responden sin consultar la base de datos.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._facets: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+        self.type_counts: Counter = Counter()
+        self.program_counts: Counter = Counter()
+    
+    @staticmethod
+    def _facet_of(metadata: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+        program = metadata.get('program_name', metadata.get('program'))
+        return metadata.get('type'), program or None
+    
+    def _discard(self, chunk_id: str):
+        doc_type, program = self._facets.pop(chunk_id)
+        for counter, key in ((self.type_counts, doc_type), (self.program_counts, program)):
+            if key is not None:
+                counter[key] -= 1
+                if counter[key] <= 0:
+                    del counter[key]
+    
+    def add(self, ids: Iterable[str], metadatas: Iterable[Dict[str, Any]], replace: bool = True):
+        """Registra documentos; con replace=False los IDs existentes se ignoran (como add de ChromaDB)"""
+        with self._lock:
+            for chunk_id, metadata in zip(ids, metadatas):
+                if chunk_id in self._facets:
+                    if not replace:
+                        continue
+                    self._discard(chunk_id)
+                doc_type, program = self._facet_of(metadata)
+                self._facets[chunk_id] = (doc_type, program)
+                if doc_type is not None:
+                    self.type_counts[doc_type] += 1
+                if program is not None:
+                    self.program_counts[program] += 1
+    
+    def remove(self, ids: Iterable[str]):
+        with self._lock:
+            for chunk_id in ids:
+                if chunk_id in self._facets:
+                    self._discard(chunk_id)
+    
+    def clear(self):
+        with self._lock:
+            self._facets.clear()
+            self.type_counts.clear()
+            self.program_counts.clear()
+    
+    def __len__(self) -> int:
+        return len(self._facets)
+    
+    def ids(self) -> Set[str]:
+        with self._lock:
+            return set(self._facets)
+    
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'document_types': sorted(self.type_counts),
+                'programs': sorted(self.program_counts),
+                'type_counts': dict(self.type_counts),
+                'program_counts': dict(self.program_counts)
+            }
+
+
+def deferred_writes(store):
+    """
+    Contexto que difiere el guardado del store hasta el final del bloque
+    
+    Los backends locales (numpy, faiss) exponen deferred_writes(); para los
+    demás (ChromaDB ya escribe de forma incremental) es un contexto vacío.
+    """
+    defer = getattr(store, 'deferred_writes', None)
+    return defer() if callable(defer) else nullcontext()
+
+
+def sync_vector_store(store,
+                      texts: List[str],
+                      metadatas: List[Dict[str, Any]],
+                      embed_fn: Callable[[List[str]], np.ndarray]) -> Dict[str, Any]:
+    """
+    Sincroniza incrementalmente un vector store con los chunks actuales
+    
+    Solo se embeben y escriben los chunks nuevos o modificados; los que ya no
+    existen se eliminan al final, de modo que la colección sigue respondiendo
+    consultas durante toda la actualización.
+    
+    Args:
+        store: Vector store con get_ids / upsert_documents / delete_documents
+        texts: Contenido de los chunks actuales
+        metadatas: Metadatos de los chunks actuales
+        embed_fn: Función que crea embeddings para una lista de textos
+        
+    Returns:
+        Resumen del diff aplicado
+    """
+    
+    ids = make_chunk_ids(texts, metadatas)
+    existing_ids = store.get_ids()
+    
+    new_positions = [i for i, chunk_id in enumerate(ids) if chunk_id not in existing_ids]
+    stale_ids = sorted(existing_ids - set(ids))
+    
+    summary = {
+        'added': len(new_positions),
+        'deleted': len(stale_ids),
+        'unchanged': len(ids) - len(new_positions),
+        'success': True
+    }
+    
+    print(f"🔁 Sincronización incremental: +{summary['added']} / -{summary['deleted']} "
+          f"(sin cambios: {summary['unchanged']})")
+    
+    with deferred_writes(store):
+        if new_positions:
+            new_texts = [texts[i] for i in new_positions]
+            embeddings = embed_fn(new_texts)
+            summary['success'] = store.upsert_documents(
+                new_texts,
+                [metadatas[i] for i in new_positions],
+                embeddings,
+                ids=[ids[i] for i in new_positions]
+            )
+        
+        if stale_ids and summary['success']:
+            summary['success'] = store.delete_documents(stale_ids)
+    
+    return summary
+
+
+def build_where(filter_type: Optional[str] = None,
+                program_name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Filtro `where` estilo ChromaDB; varias condiciones se combinan con $and"""
+    
+    conditions = []
+    if filter_type:
+        conditions.append({'type': filter_type})
+    if program_name:
+        conditions.append({'program_name': program_name})
+    
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {'$and': conditions}
+
+
+def _split_program_filter(where: Optional[Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Separa la condición de igualdad sobre program_name del resto del filtro"""
+    
+    if not where:
+        return None, None
+    if set(where) == {'program_name'} and isinstance(where['program_name'], str):
+        return None, where['program_name']
+    if set(where) == {'$and'}:
+        programs = [c for c in where['$and'] if set(c) == {'program_name'} and isinstance(c['program_name'], str)]
+        if len(programs) == 1:
+            rest = [c for c in where['$and'] if c is not programs[0]]
+            return (rest[0] if len(rest) == 1 else {'$and': rest}) if rest else None, programs[0]['program_name']
+    return where, None
+
+
+def search_with_wheres(store,
+                       query_embeddings: List[np.ndarray],
+                       wheres: List[Optional[Dict[str, Any]]],
+                       n_results: int = 5) -> List[Dict[str, List]]:
+    """
+    Búsqueda multi-consulta con un filtro por consulta
+    
+    Las consultas con el mismo filtro comparten una sola llamada a search_batch.
+    Las que solo difieren en el programa también: se busca una vez con
+    program_name $in [programas] y n_results × programas candidatos, y cada
+    consulta se queda con los de su programa. Si a alguna no le alcanzan los
+    candidatos (otro programa acaparó el top), se repite solo esa con su
+    propio filtro, así el resultado es igual al de una búsqueda por filtro.
+    Los resultados vuelven en el orden de entrada.
+    """
+    
+    groups: Dict[str, List[int]] = {}
+    programs: List[Optional[str]] = []
+    for position, where in enumerate(wheres):
+        rest, program = _split_program_filter(where)
+        programs.append(program)
+        key = json.dumps(rest, sort_keys=True) if program else json.dumps(where, sort_keys=True)
+        groups.setdefault(f"{program is not None}:{key}", []).append(position)
+    
+    results: List[Optional[Dict[str, List]]] = [None] * len(wheres)
+    pending: List[int] = []
+    for positions in groups.values():
+        group_programs = sorted({programs[i] for i in positions if programs[i] is not None})
+        if len(group_programs) <= 1:
+            group_results = store.search_batch(
+                [query_embeddings[i] for i in positions],
+                n_results=n_results,
+                where=wheres[positions[0]]
+            )
+            for position, result in zip(positions, group_results):
+                results[position] = result
+            continue
+        
+        rest, _ = _split_program_filter(wheres[positions[0]])
+        program_in = {'program_name': {'$in': group_programs}}
+        n_candidates = n_results * len(group_programs)
+        group_results = store.search_batch(
+            [query_embeddings[i] for i in positions],
+            n_results=n_candidates,
+            where={'$and': [rest, program_in]} if rest else program_in
+        )
+        for position, result in zip(positions, group_results):
+            keep = [j for j, metadata in enumerate(result['metadatas'])
+                    if metadata.get('program_name') == programs[position]][:n_results]
+            results[position] = {key: [values[j] for j in keep] for key, values in result.items()}
+            if len(keep) < n_results and len(result['ids']) >= n_candidates:
+                pending.append(position)
+    
+    # Pocas consultas: las de programas desplazados del top conjunto
+    retries: Dict[str, List[int]] = {}
+    for position in pending:
+        retries.setdefault(json.dumps(wheres[position], sort_keys=True), []).append(position)
+    for positions in retries.values():
+        group_results = store.search_batch(
+            [query_embeddings[i] for i in positions],
+            n_results=n_results,
+            where=wheres[positions[0]]
+        )
+        for position, result in zip(positions, group_results):
+            results[position] = result
+    
+    return results
+
+
+def similarity_to_distance(similarities: np.ndarray) -> np.ndarray:
+    """
+    Convierte similitud coseno a la distancia que reporta ChromaDB
+
+    Las colecciones de ChromaDB usan por defecto el espacio 'l2' (distancia
+    euclidiana al cuadrado); con vectores normalizados equivale a 2 - 2·cos.
+    Así los resultados son intercambiables entre backends.
+    """
+    return 2.0 - 2.0 * similarities
+
+
+def normalize_rows(embeddings: np.ndarray) -> np.ndarray:
+    """Normaliza filas a norma 1 en float32 contiguo"""
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if embeddings.ndim == 1:
+        embeddings = embeddings.reshape(1, -1)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+
+def create_vector_store(backend: Optional[str] = None,
+                        collection_name: str = "usc_curriculum",
+                        persist_directory: str = "./data/vectorstore",
+                        **kwargs):
+    """
+    Crea el vector store del backend solicitado
+    
+    Sin backend explícito se usa VECTORSTORE_BACKEND de src/utils/config.py;
+    las opciones del backend que no se pasen también salen de la configuración.
+    
+    Args:
+        backend: "chroma" (ChromaDB persistente), "numpy" (índice exacto en memoria)
+                 o "faiss" (índice ANN configurable)
+        collection_name: Nombre de la colección
+        persist_directory: Directorio de persistencia
+        **kwargs: Opciones específicas del backend
+    """
+    from src.utils import config
+    
+    backend = (backend or config.VECTORSTORE_BACKEND).lower()
+    
+    if backend == "chroma":
+        from src.rag.vector_store import LocalVectorStore
+        kwargs.setdefault('write_batch_size', config.CHROMA_WRITE_BATCH_SIZE)
+        kwargs.setdefault('write_workers', config.CHROMA_WRITE_WORKERS)
+        return LocalVectorStore(collection_name=collection_name,
+                                persist_directory=persist_directory, **kwargs)
+    
+    if backend == "numpy":
+        from src.rag.numpy_vector_store import NumpyVectorStore
+        # Proyección y cuantización son alternativas: la que se pase explícita anula la otra de la configuración
+        explicit_quantization, explicit_projection = 'quantization' in kwargs, 'projection_dim' in kwargs
+        if not explicit_projection:
+            kwargs.setdefault('quantization', config.NUMPY_QUANTIZATION)
+        if not explicit_quantization:
+            kwargs.setdefault('projection_dim', config.NUMPY_PROJECTION_DIM)
+        kwargs.setdefault('rescore_factor', config.NUMPY_RESCORE_FACTOR)
+        return NumpyVectorStore(collection_name=collection_name,
+                                persist_directory=persist_directory, **kwargs)
+    
+    if backend == "faiss":
+        from src.rag.faiss_vector_store import FaissVectorStore
+        kwargs.setdefault('index_factory', config.FAISS_INDEX_FACTORY)
+        kwargs.setdefault('nprobe', config.FAISS_NPROBE)
+        kwargs.setdefault('ef_search', config.FAISS_EF_SEARCH)
+        return FaissVectorStore(collection_name=collection_name,
+                                persist_directory=persist_directory, **kwargs)
+    
+    raise ValueError(f"❌ Backend de vector store desconocido: {backend}")
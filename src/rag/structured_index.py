@@ -0,0 +1,281 @@
+"""
+Índice estructurado en memoria para respuestas exactas
+Programa → costo, semestres, materias y créditos, construido durante la ingesta
+a partir de los chunks; responde costos, créditos y semestres sin embeddings
+"""
+
+import re
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from src.rag.patterns import CHUNK_SUBJECT
+from src.rag.program_resolver import ProgramNameResolver, normalize_text
+
+ROMAN_VALUES = {'I': 1, 'V': 5, 'X': 10, 'L': 50}
+ROMAN_NUMERALS = ['', 'I', 'II', 'III', 'IV', 'V', 'VI', 'VII', 'VIII', 'IX', 'X', 'XI', 'XII']
+
+ORDINALS = {
+    'primer': 1, 'primero': 1, 'segundo': 2, 'tercer': 3, 'tercero': 3, 'cuarto': 4,
+    'quinto': 5, 'sexto': 6, 'septimo': 7, 'octavo': 8, 'noveno': 9, 'decimo': 10
+}
+
+# Costo: sustantivos inequívocos o frases completas ("valor" o "cuánto" solos no bastan:
+# "valor agregado", "cuántos semestres")
+FEE_NOUNS = {'costo', 'costos', 'precio', 'precios', 'matricula', 'tarifa', 'pension'}
+FEE_PHRASES = re.compile(
+    r'\bcuanto\s+(?:cuesta|cuestan|vale|valen|cobran|se\s+paga|hay\s+que\s+pagar|tengo\s+que\s+pagar)\b'
+    r'|\bvalor\s+(?:de\s+la\s+carrera|del\s+programa|del\s+semestre|por\s+semestre)\b'
+)
+CREDIT_WORDS = {'credito', 'creditos'}
+SUBJECT_WORDS = {'materia', 'materias', 'asignatura', 'asignaturas'}
+DURATION_WORDS = {'duracion', 'dura'}
+
+SEMESTER_REFERENCE = re.compile(
+    r'\bsemestre\s+(\d{1,2}|[ivx]{1,4})\b|\b(\d{1,2})\s*(?:o|er|ero|do|to|vo|no)?\s+semestre\b'
+    r'|\b(' + '|'.join(ORDINALS) + r')\s+semestre\b'
+)
+
+
+def semester_to_int(value: Any) -> Optional[int]:
+    """Convierte 'III', '3' o 3 en 3; None si no es un número de semestre válido"""
+    text = str(value).strip().upper()
+    if text.isdigit():
+        return int(text) or None
+    if not text or any(ch not in ROMAN_VALUES for ch in text):
+        return None
+
+    total = 0
+    for current, following in zip(text, text[1:] + ' '):
+        value = ROMAN_VALUES[current]
+        total += -value if ROMAN_VALUES.get(following, 0) > value else value
+    return total or None
+
+
+def int_to_roman(number: int) -> str:
+    return ROMAN_NUMERALS[number] if 0 < number < len(ROMAN_NUMERALS) else str(number)
+
+
+class CurriculumStructuredIndex:
+    def __init__(self):
+        """Índice vacío; se llena con add_chunks / observe durante la carga"""
+
+        self._lock = threading.Lock()
+        self.programs: Dict[str, Dict[str, Any]] = {}
+        self.resolver = ProgramNameResolver()
+
+        self.stats = {
+            'lookups': 0,
+            'hits': 0,
+            'misses': 0
+        }
+
+    def __len__(self) -> int:
+        return len(self.programs)
+
+    def clear(self):
+        with self._lock:
+            self.programs.clear()
+            self.resolver.clear()
+
+    # ------------------------------------------------------------------
+    # Construcción
+    # ------------------------------------------------------------------
+
+    def _program(self, name: str) -> Dict[str, Any]:
+        program = self.programs.get(name)
+        if program is None:
+            program = {
+                'name': name,
+                'program_type': None,
+                'fee_amount': 0,
+                'total_semesters': 0,
+                'semesters': {}
+            }
+            self.programs[name] = program
+            self.resolver.add_program(name)
+        return program
+
+    def add_chunk(self, chunk: Dict[str, Any]):
+        """Extrae los datos exactos de un chunk (estructural o LLM) según su tipo"""
+
+        metadata = chunk.get('metadata', {})
+        name = str(metadata.get('program_name', '')).strip()
+        if not name or name == 'unknown':
+            return
+
+        chunk_type = metadata.get('type')
+        with self._lock:
+            program = self._program(name)
+            if metadata.get('program_type'):
+                program['program_type'] = metadata['program_type']
+
+            fee_amount = metadata.get('fee_amount')
+            if isinstance(fee_amount, (int, float)) and not isinstance(fee_amount, bool) and fee_amount > 0:
+                program['fee_amount'] = int(fee_amount)
+
+            total_semesters = metadata.get('total_semesters')
+            if isinstance(total_semesters, int) and total_semesters > 0:
+                program['total_semesters'] = total_semesters
+
+            if chunk_type == 'curriculum_semester':
+                number = semester_to_int(metadata.get('semester_number', ''))
+                if number is None:
+                    return
+                subjects = [
+                    {'name': subject.strip(), 'credits': int(credits)}
+                    for subject, credits in CHUNK_SUBJECT.findall(chunk.get('content', ''))
+                ]
+                program['semesters'][number] = {
+                    'number': int_to_roman(number),
+                    'subjects': subjects,
+                    'subject_count': metadata.get('subject_count', len(subjects)),
+                    'total_credits': metadata.get('total_credits', sum(s['credits'] for s in subjects))
+                }
+                program['total_semesters'] = max(program['total_semesters'], len(program['semesters']))
+
+    def add_chunks(self, chunks: Iterable[Dict[str, Any]]):
+        for chunk in chunks:
+            self.add_chunk(chunk)
+
+    def observe(self, chunks: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Indexa cada chunk al pasar, sin alterar el flujo (para la ingesta en streaming)"""
+        for chunk in chunks:
+            self.add_chunk(chunk)
+            yield chunk
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+
+    def resolve_program(self, text: str) -> Optional[str]:
+        """Programa mencionado en el texto (ver ProgramNameResolver)"""
+        return self.resolver.resolve(text)
+
+    def get_program(self, name: str) -> Optional[Dict[str, Any]]:
+        return self.programs.get(name)
+
+    def get_total_credits(self, name: str) -> int:
+        program = self.programs.get(name)
+        if not program:
+            return 0
+        return sum(semester['total_credits'] for semester in program['semesters'].values())
+
+    def _detect_intent(self, normalized: str) -> Optional[Dict[str, Any]]:
+        tokens = set(normalized.split())
+
+        references = SEMESTER_REFERENCE.findall(normalized)
+        if len(references) > 1:
+            # Varios semestres en la misma consulta: una respuesta exacta sería incompleta
+            return None
+        if references:
+            reference = next(group for group in references[0] if group)
+            number = ORDINALS.get(reference) or semester_to_int(reference)
+            if number:
+                return {'intent': 'semester', 'semester': number}
+
+        if tokens & CREDIT_WORDS:
+            return {'intent': 'total_credits'}
+        if tokens & DURATION_WORDS or 'cuantos semestres' in normalized:
+            return {'intent': 'duration'}
+        if tokens & FEE_NOUNS or FEE_PHRASES.search(normalized):
+            return {'intent': 'fee'}
+        if tokens & SUBJECT_WORDS:
+            return {'intent': 'subjects'}
+        return None
+
+    def _answer(self, program: Dict[str, Any], intent: str, semester: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        name = program['name']
+        base = {'program_name': name, 'program_type': program['program_type'] or 'unknown',
+                'source': 'structured_index'}
+
+        if intent == 'fee':
+            if not program['fee_amount']:
+                return None
+            content = f"{name}\nCosto: ${program['fee_amount']:,} COP"
+            metadata = {**base, 'type': 'fee', 'fee_amount': program['fee_amount']}
+
+        elif intent == 'semester':
+            data = program['semesters'].get(semester)
+            if data is None:
+                return None
+            content = f"{name} - Semestre {data['number']}\n"
+            content += f"Total: {data['subject_count']} materias, {data['total_credits']} créditos\n"
+            content += "Materias:\n"
+            for subject in data['subjects']:
+                content += f"- {subject['name']} | {subject['credits']} créditos\n"
+            metadata = {**base, 'type': 'curriculum_semester', 'semester_number': data['number'],
+                        'subject_count': data['subject_count'], 'total_credits': data['total_credits']}
+
+        elif intent == 'subjects':
+            if not program['semesters']:
+                return None
+            content = f"{name} - Materias del Plan de Estudios\n"
+            subject_count = 0
+            for number in sorted(program['semesters']):
+                data = program['semesters'][number]
+                subject_count += len(data['subjects'])
+                names = ', '.join(subject['name'] for subject in data['subjects'])
+                content += f"Semestre {data['number']}: {names}\n"
+            metadata = {**base, 'type': 'curriculum_subjects', 'total_semesters': program['total_semesters'],
+                        'subject_count': subject_count}
+
+        elif intent in ('total_credits', 'duration'):
+            if not program['semesters'] and not program['total_semesters']:
+                return None
+            total_credits = self.get_total_credits(name)
+            content = f"{name} - Plan de Estudios\nDuración: {program['total_semesters']} semestres"
+            if total_credits:
+                content += f"\nTotal: {total_credits} créditos"
+            metadata = {**base, 'type': 'curriculum_summary', 'total_semesters': program['total_semesters'],
+                        'total_credits': total_credits}
+        else:
+            return None
+
+        return {
+            'documents': [content],
+            'metadatas': [metadata],
+            'distances': [0.0],
+            'ids': [f"structured__{normalize_text(name).replace(' ', '-')}__{intent}"]
+        }
+
+    def lookup(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Respuesta exacta para consultas de costo, créditos, semestres, materias o duración
+        de un solo programa (y a lo sumo un semestre)
+
+        Returns:
+            {'intent', 'program_name', 'results'} con results en el formato de
+            vector_store.search (distancia 0), o None si hay que usar vectores
+        """
+        self.stats['lookups'] += 1
+
+        normalized = normalize_text(query)
+        detected = self._detect_intent(normalized) if self.programs else None
+        # Con dos programas mencionados la respuesta exacta cubriría solo uno
+        name = self.resolve_program(query) if detected and len(self.resolver.mentions(query)) <= 1 else None
+        results = self._answer(self.programs[name], detected['intent'], detected.get('semester')) if name else None
+
+        if results is None:
+            self.stats['misses'] += 1
+            return None
+
+        self.stats['hits'] += 1
+        return {'intent': detected['intent'], 'program_name': name, 'results': results}
+
+    def lookup_aspect(self, program_name: str, aspect: str) -> Optional[Dict[str, List]]:
+        """Dato exacto de un programa para compare_programs ('fee' o 'curriculum')"""
+        name = self.resolve_program(program_name)
+        if name is None:
+            return None
+        intent = {'fee': 'fee', 'curriculum': 'duration'}.get(aspect)
+        return self._answer(self.programs[name], intent) if intent else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats['lookups']
+        return {
+            'programs': len(self.programs),
+            'semesters': sum(len(p['semesters']) for p in self.programs.values()),
+            **self.stats,
+            'hit_rate': self.stats['hits'] / lookups if lookups else 0.0,
+            'resolver': self.resolver.get_stats()
+        }
@@ -6,21 +6,35 @@ import chromadb
 from chromadb.config import Settings
 from chromadb.utils import embedding_functions
 import numpy as np
-from typing import List, Dict, Optional, Any
+from typing import Callable, List, Dict, Optional, Any, Set, Tuple
 import json
-import uuid
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from datetime import datetime
+
+from src.rag.store_utils import CollectionFacets, make_chunk_ids
 
 class LocalVectorStore:
     def __init__(self, 
                  collection_name: str = "usc_curriculum", 
-                 persist_directory: str = "./data/vectorstore"):
+                 persist_directory: str = "./data/vectorstore",
+                 write_batch_size: int = 1000,
+                 write_workers: int = 1):
         """
         Inicializa ChromaDB local para almacenar embeddings
+        
+        Args:
+            write_batch_size: Documentos por llamada a ChromaDB (se acota al máximo del cliente)
+            write_workers: Hilos escritores en paralelo (1 = secuencial)
         """
         
+        if write_batch_size < 1 or write_workers < 1:
+            raise ValueError("❌ write_batch_size y write_workers deben ser >= 1")
+        
         self.collection_name = collection_name
         self.persist_directory = Path(persist_directory)
+        self.write_workers = write_workers
         
         print(f"🔄 Inicializando ChromaDB...")
         print(f"   📂 Directorio: {persist_directory}")
@@ -71,11 +85,22 @@ class LocalVectorStore:
                 )
                 print(f"✅ Colección recreada: {collection_name}")
         
+        # ChromaDB rechaza lotes mayores a su máximo
+        max_batch_size = getattr(self.client, 'get_max_batch_size', lambda: write_batch_size)()
+        self.write_batch_size = min(write_batch_size, max_batch_size)
+        
         self.stats = {
             'documents_added': 0,
             'queries_processed': 0,
-            'last_update': None
+            'last_update': None,
+            'write_batches': 0,
+            'write_time': 0.0,
+            'last_write': None
         }
+        
+        # Conteo y facetas en memoria: la ruta de búsqueda no consulta count()
+        self.facets = CollectionFacets()
+        self._load_facets()
     
     def add_documents(self, 
                      texts: List[str], 
@@ -90,36 +115,19 @@ class LocalVectorStore:
         print(f"🔄 Agregando {len(texts)} documentos al vector store...")
         
         try:
-            # Generar IDs únicos si no se proporcionan
+            # Generar IDs deterministas si no se proporcionan
             if ids is None:
-                ids = [f"doc_{uuid.uuid4().hex[:8]}" for _ in texts]
-            
-            # Convertir embeddings a lista de listas
-            embeddings_list = embeddings.tolist()
+                ids = make_chunk_ids(texts, metadatas)
             
-            # Limpiar metadatos para ChromaDB
-            cleaned_metadatas = []
-            for metadata in metadatas:
-                cleaned_metadata = {}
-                for key, value in metadata.items():
-                    # ChromaDB solo acepta str, int, float, bool
-                    if isinstance(value, (str, int, float, bool)):
-                        cleaned_metadata[key] = value
-                    else:
-                        cleaned_metadata[key] = str(value)
-                cleaned_metadatas.append(cleaned_metadata)
-            
-            # Agregar a ChromaDB
-            self.collection.add(
-                documents=texts,
-                metadatas=cleaned_metadatas,
-                embeddings=embeddings_list,
-                ids=ids
-            )
+            self._write_batches(self.collection.add, texts, metadatas, embeddings, ids, replace=False)
             
             self.stats['documents_added'] += len(texts)
+            self.stats['last_update'] = datetime.now().isoformat()
+            last_write = self.stats['last_write']
             print(f"✅ Documentos agregados exitosamente")
-            print(f"   📊 Total en colección: {self.collection.count()}")
+            print(f"   📦 {last_write['batches']} lotes de hasta {self.write_batch_size} "
+                  f"({last_write['docs_per_second']:.0f} docs/s)")
+            print(f"   📊 Total en colección: {self.count()}")
             
             return True
             
@@ -127,56 +135,196 @@ class LocalVectorStore:
             print(f"❌ Error agregando documentos: {e}")
             return False
     
+    def upsert_documents(self, 
+                        texts: List[str], 
+                        metadatas: List[Dict[str, Any]], 
+                        embeddings: np.ndarray,
+                        ids: Optional[List[str]] = None) -> bool:
+        """Inserta o reemplaza documentos por ID"""
+        
+        if len(texts) != len(metadatas) or len(texts) != len(embeddings):
+            raise ValueError("❌ Longitudes de texts, metadatas y embeddings deben coincidir")
+        
+        try:
+            if ids is None:
+                ids = make_chunk_ids(texts, metadatas)
+            
+            self._write_batches(self.collection.upsert, texts, metadatas, embeddings, ids)
+            
+            self.stats['documents_added'] += len(texts)
+            self.stats['last_update'] = datetime.now().isoformat()
+            print(f"✅ {len(texts)} documentos insertados/actualizados")
+            
+            return True
+            
+        except Exception as e:
+            print(f"❌ Error en upsert de documentos: {e}")
+            return False
+    
+    def _write_batches(self,
+                       write_fn: Callable,
+                       texts: List[str],
+                       metadatas: List[Dict[str, Any]],
+                       embeddings: np.ndarray,
+                       ids: List[str],
+                       replace: bool = True):
+        """
+        Escribe en lotes de write_batch_size pasando los arrays NumPy tal cual
+        
+        Evita convertir toda la matriz con tolist() (~10x su tamaño en floats
+        de Python) y respeta el tamaño máximo de lote de ChromaDB.
+        """
+        
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        bounds = [(start, min(start + self.write_batch_size, len(texts)))
+                  for start in range(0, len(texts), self.write_batch_size)]
+        
+        def write(bound: Tuple[int, int]) -> float:
+            start, end = bound
+            batch_start = time.perf_counter()
+            batch_ids = list(ids[start:end])
+            batch_metadatas = self._clean_metadatas(metadatas[start:end])
+            write_fn(
+                documents=list(texts[start:end]),
+                metadatas=batch_metadatas,
+                embeddings=embeddings[start:end],
+                ids=batch_ids
+            )
+            self.facets.add(batch_ids, batch_metadatas, replace=replace)
+            return time.perf_counter() - batch_start
+        
+        start_time = time.perf_counter()
+        if self.write_workers > 1 and len(bounds) > 1:
+            with ThreadPoolExecutor(max_workers=self.write_workers, thread_name_prefix="chroma-write") as executor:
+                batch_times = list(executor.map(write, bounds))
+        else:
+            batch_times = [write(bound) for bound in bounds]
+        elapsed = time.perf_counter() - start_time
+        
+        self.stats['write_batches'] += len(bounds)
+        self.stats['write_time'] += elapsed
+        self.stats['last_write'] = {
+            'documents': len(texts),
+            'batches': len(bounds),
+            'workers': min(self.write_workers, len(bounds)),
+            'total_time': elapsed,
+            'avg_batch_time': sum(batch_times) / len(batch_times) if batch_times else 0.0,
+            'max_batch_time': max(batch_times, default=0.0),
+            'docs_per_second': len(texts) / elapsed if elapsed > 0 else 0.0
+        }
+    
+    def delete_documents(self, ids: List[str]) -> bool:
+        """Elimina documentos por ID"""
+        
+        if not ids:
+            return True
+        
+        try:
+            self.collection.delete(ids=ids)
+            self.facets.remove(ids)
+            self.stats['last_update'] = datetime.now().isoformat()
+            print(f"🗑️  {len(ids)} documentos eliminados")
+            return True
+            
+        except Exception as e:
+            print(f"❌ Error eliminando documentos: {e}")
+            return False
+    
+    def get_ids(self) -> Set[str]:
+        """IDs de todos los documentos almacenados"""
+        return self.facets.ids()
+    
+    def count(self) -> int:
+        """Número de documentos en la colección"""
+        return len(self.facets)
+    
+    def _load_facets(self):
+        """Lee los metadatos existentes una sola vez, paginando por write_batch_size"""
+        
+        self.facets.clear()
+        total_docs = self.collection.count()
+        for offset in range(0, total_docs, self.write_batch_size):
+            page = self.collection.get(limit=self.write_batch_size, offset=offset, include=["metadatas"])
+            self.facets.add(page['ids'], page['metadatas'])
+    
+    def _clean_metadatas(self, metadatas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Limpia metadatos para ChromaDB"""
+        
+        cleaned_metadatas = []
+        for metadata in metadatas:
+            cleaned_metadata = {}
+            for key, value in metadata.items():
+                # ChromaDB solo acepta str, int, float, bool
+                if isinstance(value, (str, int, float, bool)):
+                    cleaned_metadata[key] = value
+                else:
+                    cleaned_metadata[key] = str(value)
+            cleaned_metadatas.append(cleaned_metadata)
+        return cleaned_metadatas
+    
     def search(self, 
               query_embedding: np.ndarray, 
               n_results: int = 5,
               where: Optional[Dict] = None) -> Dict[str, List]:
         """Busca documentos similares"""
         
-        if self.collection.count() == 0:
+        return self.search_batch([query_embedding], n_results=n_results, where=where)[0]
+    
+    def search_batch(self, 
+                     query_embeddings: List[np.ndarray], 
+                     n_results: int = 5,
+                     where: Optional[Dict] = None) -> List[Dict[str, List]]:
+        """Busca documentos similares para varias consultas en una sola llamada"""
+        
+        empty = [{
+            'documents': [],
+            'metadatas': [],
+            'distances': [],
+            'ids': []
+        } for _ in query_embeddings]
+        
+        if len(query_embeddings) == 0:
+            return []
+        
+        total_docs = self.count()
+        if total_docs == 0:
             print("⚠️  Vector store vacío")
-            return {
-                'documents': [],
-                'metadatas': [],
-                'distances': [],
-                'ids': []
-            }
+            return empty
         
         try:
-            # Convertir embedding a lista
-            if isinstance(query_embedding, np.ndarray):
-                query_embedding = query_embedding.tolist()
+            # Convertir embeddings a lista
+            query_list = [
+                q.tolist() if isinstance(q, np.ndarray) else q
+                for q in query_embeddings
+            ]
             
-            # Realizar búsqueda
+            # Realizar búsqueda (todas las consultas en un solo query)
             results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=min(n_results, self.collection.count()),
+                query_embeddings=query_list,
+                n_results=min(n_results, total_docs),
                 where=where,
                 include=["documents", "metadatas", "distances"]
             )
             
-            self.stats['queries_processed'] += 1
+            self.stats['queries_processed'] += len(query_list)
             
             # Formatear resultados
-            formatted_results = {
-                'documents': results['documents'][0] if results['documents'] else [],
-                'metadatas': results['metadatas'][0] if results['metadatas'] else [],
-                'distances': results['distances'][0] if results['distances'] else [],
-                'ids': results['ids'][0] if results['ids'] else []
-            }
+            formatted_results = []
+            for i in range(len(query_list)):
+                formatted_results.append({
+                    'documents': results['documents'][i] if results['documents'] else [],
+                    'metadatas': results['metadatas'][i] if results['metadatas'] else [],
+                    'distances': results['distances'][i] if results['distances'] else [],
+                    'ids': results['ids'][i] if results['ids'] else []
+                })
             
-            print(f"🔍 Búsqueda completada: {len(formatted_results['documents'])} resultados")
+            print(f"🔍 Búsqueda completada: {len(query_list)} consultas")
             
             return formatted_results
             
         except Exception as e:
             print(f"❌ Error en búsqueda: {e}")
-            return {
-                'documents': [],
-                'metadatas': [],
-                'distances': [],
-                'ids': []
-            }
+            return empty
     
     def clear_collection(self) -> bool:
         """Limpia todos los documentos de la colección"""
@@ -190,6 +338,7 @@ class LocalVectorStore:
                 name=self.collection_name,
                 metadata={"description": "USC Curriculum RAG Collection"}
             )
+            self.facets.clear()
             
             print(f"🗑️  Colección {self.collection_name} limpiada")
             return True
@@ -202,37 +351,19 @@ class LocalVectorStore:
         """Obtiene estadísticas del vector store"""
         
         try:
-            total_docs = self.collection.count()
-            
-            # Obtener algunos documentos para extraer metadatos
-            doc_types = []
-            programs = []
-            
-            if total_docs > 0:
-                # Obtener una muestra de documentos
-                sample_docs = self.collection.get(
-                    limit=min(100, total_docs),
-                    include=["metadatas"]
-                )
-                
-                for metadata in sample_docs['metadatas']:
-                    if 'type' in metadata:
-                        doc_types.append(metadata['type'])
-                    if 'program' in metadata:
-                        programs.append(metadata['program'])
-                
-                # Obtener valores únicos
-                doc_types = list(set(doc_types))
-                programs = list(set(programs))
+            facets = self.facets.summary()
             
             stats = {
-                'total_documents': total_docs,
+                'total_documents': self.count(),
                 'collection_name': self.collection_name,
                 'persist_directory': str(self.persist_directory),
-                'document_types': doc_types,
-                'programs': programs,
+                **facets,
                 'queries_processed': self.stats['queries_processed'],
-                'documents_added': self.stats['documents_added']
+                'documents_added': self.stats['documents_added'],
+                'write_batch_size': self.write_batch_size,
+                'write_batches': self.stats['write_batches'],
+                'write_time': self.stats['write_time'],
+                'last_write': self.stats['last_write']
             }
             
             return stats
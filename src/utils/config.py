@@ -14,19 +14,34 @@ DOCUMENTS_DIR = DATA_DIR / "documentos"
 VECTORSTORE_DIR = DATA_DIR / "vectorstore"
 LOGS_DIR = PROJECT_ROOT / "logs"
 
-# Crear directorios si no existen
-for dir_path in [DATA_DIR, DOCUMENTS_DIR, VECTORSTORE_DIR, LOGS_DIR]:
-    dir_path.mkdir(exist_ok=True)
-
 # Configuración de BGE-M3
 BGE_MODEL_NAME = os.getenv("BGE_MODEL_NAME", "BAAI/bge-m3")
 BGE_DEVICE = os.getenv("BGE_DEVICE", "auto")  # auto, cpu, cuda
 BGE_BATCH_SIZE = int(os.getenv("BGE_BATCH_SIZE", "8"))
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", str(DATA_DIR / "embedding_cache"))
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float32")  # float32, float16
 
 # Configuración de Vector Store
 VECTORSTORE_COLLECTION_NAME = os.getenv("VECTORSTORE_COLLECTION", "usc_curriculum")
+VECTORSTORE_BACKEND = os.getenv("VECTORSTORE_BACKEND", "chroma")  # chroma, numpy, faiss
+FAISS_INDEX_FACTORY = os.getenv("FAISS_INDEX_FACTORY", "Flat")  # Flat, IVF256,Flat, HNSW32, IVF256,PQ64
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "8"))
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+CHROMA_WRITE_BATCH_SIZE = int(os.getenv("CHROMA_WRITE_BATCH_SIZE", "1000"))
+CHROMA_WRITE_WORKERS = int(os.getenv("CHROMA_WRITE_WORKERS", "1"))
+NUMPY_QUANTIZATION = os.getenv("NUMPY_QUANTIZATION", "float32")  # float32, float16, int8, binary
+NUMPY_RESCORE_FACTOR = int(os.getenv("NUMPY_RESCORE_FACTOR", "10"))
+NUMPY_PROJECTION_DIM = int(os.getenv("NUMPY_PROJECTION_DIM", "0")) or None  # 0 = sin proyección, 256, 384
 VECTORSTORE_PERSIST_DIR = str(VECTORSTORE_DIR)
 
+# Configuración de LLM (chunking semántico)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "transformers")  # transformers, ollama, fake
+LLM_MODEL_NAME = os.getenv("LLM_MODEL_NAME", "mistralai/Mistral-7B-Instruct-v0.1")
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "mistral")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+LLM_HTTP_POOL_SIZE = int(os.getenv("LLM_HTTP_POOL_SIZE", "4"))
+
 # Configuración de chunking
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
@@ -35,6 +50,15 @@ CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
 DEFAULT_SEARCH_RESULTS = int(os.getenv("DEFAULT_SEARCH_RESULTS", "5"))
 SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0.7"))
 
-print(f"📁 Proyecto configurado en: {PROJECT_ROOT}")
-print(f"📂 Documentos en: {DOCUMENTS_DIR}")
-print(f"🗄️ Vector store en: {VECTORSTORE_DIR}")
\ No newline at end of file
+
+def ensure_directories():
+    """Crea los directorios del proyecto si no existen (sin efectos al importar)"""
+    for dir_path in [DATA_DIR, DOCUMENTS_DIR, VECTORSTORE_DIR, LOGS_DIR]:
+        dir_path.mkdir(exist_ok=True)
+
+
+def print_config():
+    """Muestra las rutas configuradas del proyecto"""
+    print(f"📁 Proyecto configurado en: {PROJECT_ROOT}")
+    print(f"📂 Documentos en: {DOCUMENTS_DIR}")
+    print(f"🗄️ Vector store en: {VECTORSTORE_DIR}")
\ No newline at end of file
@@ -0,0 +1,135 @@
+"""
+Micro-batching genérico para modelos locales
+Agrupa peticiones concurrentes que llegan dentro de una ventana corta
+y las procesa en una sola llamada al modelo
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional
+
+
+class MicroBatcher:
+    def __init__(self,
+                 process_batch: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = 16,
+                 max_wait_ms: float = 5.0,
+                 name: str = "micro-batcher"):
+        """
+        Args:
+            process_batch: Función que recibe una lista de items y retorna
+                           una lista de resultados en el mismo orden
+            max_batch_size: Máximo de items por llamada
+            max_wait_ms: Espera máxima desde el primer item antes de procesar
+            name: Nombre del hilo trabajador
+        """
+
+        if max_batch_size < 1:
+            raise ValueError("❌ max_batch_size debe ser >= 1")
+
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._closed = False
+        self._stats_lock = threading.Lock()
+
+        self.stats = {
+            'batches': 0,
+            'items': 0,
+            'largest_batch': 0,
+            'processing_time': 0.0
+        }
+
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def submit(self, item: Any) -> Future:
+        """Encola un item y retorna un Future con su resultado"""
+
+        if self._closed:
+            raise RuntimeError("❌ MicroBatcher cerrado")
+
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def process(self, item: Any, timeout: Optional[float] = None) -> Any:
+        """Versión bloqueante de submit()"""
+        return self.submit(item).result(timeout=timeout)
+
+    async def aprocess(self, item: Any) -> Any:
+        """Versión asyncio de submit() para servidores async"""
+        return await asyncio.wrap_future(self.submit(item))
+
+    def close(self):
+        """Detiene el hilo trabajador tras vaciar la cola"""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._worker.join()
+
+    def _collect_batch(self, first: tuple) -> List[tuple]:
+        """Junta items hasta llenar el lote o agotar la ventana de espera"""
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is None:
+                # Re-encolar la señal de cierre para el bucle principal
+                self._queue.put(None)
+                break
+            batch.append(entry)
+
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+
+            batch = self._collect_batch(first)
+            items = [item for item, _ in batch]
+            futures = [future for _, future in batch]
+
+            start_time = time.perf_counter()
+            try:
+                results = list(self.process_batch(items))
+                if len(results) != len(items):
+                    raise RuntimeError(
+                        f"❌ process_batch retornó {len(results)} resultados para {len(items)} items"
+                    )
+                for future, result in zip(futures, results):
+                    future.set_result(result)
+            except Exception as e:
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+
+            with self._stats_lock:
+                self.stats['batches'] += 1
+                self.stats['items'] += len(items)
+                self.stats['largest_batch'] = max(self.stats['largest_batch'], len(items))
+                self.stats['processing_time'] += time.perf_counter() - start_time
+
+    def get_stats(self) -> dict:
+        """Estadísticas de agrupamiento"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['avg_batch_size'] = stats['items'] / stats['batches'] if stats['batches'] else 0.0
+        stats['max_batch_size'] = self.max_batch_size
+        stats['max_wait_ms'] = self.max_wait * 1000.0
+        return stats
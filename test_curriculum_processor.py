@@ -0,0 +1,145 @@
+"""
+Tests del procesador de currículums (sin modelos)
+Verifica el parser de una sola pasada y el modo paralelo por procesos
+"""
+
+import sys
+sys.path.append('src')
+
+import contextlib
+import io
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from src.rag.curriculum_processor import USCCurriculumProcessor
+from src.rag.intent_classifier import QueryIntentClassifier
+from src.rag.program_resolver import normalize_text
+from src.rag.structured_index import CurriculumStructuredIndex
+
+CURRICULUM_FILE = "data/documentos/Curriculums_Technology_Undergraduate.md"
+
+
+def _process(file_paths, workers):
+    with contextlib.redirect_stdout(io.StringIO()):
+        processor = USCCurriculumProcessor()
+        chunks = processor.process_curriculum_files(file_paths, workers=workers)
+    stats = processor.get_processing_stats()
+    stats.pop('processing_time')
+    return chunks, stats
+
+
+def test_single_pass_parser_finds_all_programs():
+    chunks, stats = _process([CURRICULUM_FILE], workers=1)
+    assert stats['programs_processed'] == stats['technology_programs'] + stats['undergraduate_programs']
+    assert stats['programs_processed'] == 11
+    assert stats['chunks_created'] == len(chunks)
+
+    complete = [c for c in chunks if c['metadata']['type'] == 'program_complete']
+    assert len(complete) == 11
+    assert all(c['content'].startswith('### ') for c in complete)
+    semesters = [c for c in chunks if c['metadata']['type'] == 'curriculum_semester']
+    assert len(semesters) == stats['semester_chunks']
+
+
+def test_parallel_matches_sequential_order_and_stats():
+    second_file = Path(tempfile.mkdtemp()) / "copia.md"
+    second_file.write_text(Path(CURRICULUM_FILE).read_text(encoding='utf-8'), encoding='utf-8')
+    files = [CURRICULUM_FILE, str(second_file)]
+
+    sequential = _process(files, workers=1)
+    parallel = _process(files, workers=3)
+
+    assert parallel[0] == sequential[0]
+    assert parallel[1] == sequential[1]
+    assert parallel[1]['programs_processed'] == 22
+
+
+def test_structured_index_answers_exact_queries_from_chunks():
+    chunks, _ = _process([CURRICULUM_FILE], workers=1)
+    index = CurriculumStructuredIndex()
+    index.add_chunks(chunks)
+    assert len(index) == 11
+
+    fee_chunk = next(c for c in chunks if c['metadata']['type'] == 'fee'
+                     and c['metadata']['program_name'] == 'Bioingenieria')
+    answer = index.lookup("¿Cuánto cuesta Bioingeniería?")
+    assert answer['intent'] == 'fee' and answer['program_name'] == 'Bioingenieria'
+    assert answer['results']['metadatas'][0]['fee_amount'] == fee_chunk['metadata']['fee_amount']
+    assert answer['results']['distances'] == [0.0]
+
+    semester = index.lookup("créditos del tercer semestre de Ingeniería de Sistemas")
+    assert semester['program_name'] == 'Ingenieria de Sistemas'
+    assert semester['results']['metadatas'][0]['semester_number'] == 'III'
+    assert index.lookup("costo de sistemas virtual")['program_name'] == 'Ingenieria de Sistemas – Virtual'
+
+    subjects = index.lookup("¿Qué materias tiene Ingeniería Civil?")
+    assert subjects['results']['metadatas'][0]['type'] == 'curriculum_subjects'
+    assert 'GEOLOGÍA' in subjects['results']['documents'][0]
+
+    assert index.lookup("¿qué hace un ingeniero civil?") is None
+    assert index.lookup("¿Cuál es el valor agregado de estudiar ingeniería química?") is None
+    assert index.lookup("semestre 1 de bioingenieria y semestre 2 de civil") is None
+    assert index.lookup("costo de bioingenieria y de ingeniería civil") is None
+    assert index.lookup_aspect("Ingeniería Civil", 'profile') is None
+    assert index.get_stats()['hits'] == 4
+
+
+def test_program_resolver_maps_user_text_to_canonical_names():
+    chunks, _ = _process([CURRICULUM_FILE], workers=1)
+    index = CurriculumStructuredIndex()
+    index.add_chunks(chunks)
+    resolver = index.resolver
+    assert len(resolver) == 11
+
+    assert resolver.resolve_with_score("Ingeniería de Sistemas virtual") == ('Ingenieria de Sistemas – Virtual', 1.0, 'exact')
+    assert resolver.resolve("costo de Systems Engineering") == 'Ingenieria de Sistemas'
+    assert resolver.resolve("Ing. comercial") == 'Ingenieria Commercial'
+    assert resolver.resolve("energías") == 'Ingeniería en Energías'
+
+    name, score, method = resolver.resolve_with_score("bioingeneria")
+    assert (name, method) == ('Bioingenieria', 'fuzzy') and score >= resolver.threshold
+
+    assert resolver.resolve("ingeniería") is None
+    assert resolver.resolve_with_score("Bioingeniería o Ingeniería Civil")[2] == 'ambiguous'
+    assert resolver.resolve("medicina") is None
+
+
+def test_intent_classifier_routes_from_query_embedding():
+    def embed(texts):
+        # Bolsa de palabras con hash: suficiente para probar centroides sin el modelo
+        vectors = np.zeros((len(texts), 256), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in normalize_text(text).split():
+                vectors[row, sum(map(ord, word)) % 256] += 1
+        return vectors
+
+    calls = []
+    classifier = QueryIntentClassifier(examples={
+        'fee': ["cuánto cuesta", "costo de la matrícula", "precio del semestre"],
+        'occupational_profile': ["campo laboral", "dónde puedo trabajar", "perfil ocupacional"],
+        'general': ["qué programas hay", "información de la carrera"],
+    })
+    classifier.ensure_fitted(lambda texts: calls.append(len(texts)) or embed(texts))
+    classifier.ensure_fitted(lambda texts: calls.append(len(texts)) or embed(texts))
+    assert calls == [8]
+
+    route = classifier.route(embed(["¿cuál es el costo de bioingeniería?"])[0])
+    assert (route['intent'], route['filter_type'], route['n_results']) == ('fee', 'fee', 10)
+    assert classifier.route(embed(["costo"])[0], program_name='Bioingenieria')['n_results'] == 2
+    assert classifier.classify(embed(["campo laboral del ingeniero"])[0])[0] == 'occupational_profile'
+
+    # Sin palabras conocidas no hay margen: se usa 'general' sin filtro
+    route = classifier.route(embed(["xyz"])[0])
+    assert route['intent'] == 'general' and route['filter_type'] is None
+
+
+if __name__ == "__main__":
+    for test in [test_single_pass_parser_finds_all_programs,
+                 test_parallel_matches_sequential_order_and_stats,
+                 test_structured_index_answers_exact_queries_from_chunks,
+                 test_program_resolver_maps_user_text_to_canonical_names,
+                 test_intent_classifier_routes_from_query_embedding]:
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,174 @@
+"""
+Tests de las cachés de embeddings y del micro-batching (sin modelos)
+Usa un modelo falso que cuenta llamadas a encode
+"""
+
+import sys
+sys.path.append('src')
+
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src.embeddings.embedding_cache import EmbeddingCache, QueryEmbeddingCache
+from src.utils.micro_batcher import MicroBatcher
+
+# BGEEmbeddings importa FlagEmbedding al cargar el módulo
+try:
+    from src.embeddings.bge_embeddings import BGEEmbeddings
+    BGE_AVAILABLE = True
+except ImportError:
+    BGE_AVAILABLE = False
+
+
+class CountingModel:
+    """Sustituto de BGEM3FlagModel: vector determinista por texto y registro de cada encode"""
+
+    def __init__(self, dimension: int = 8):
+        self.dimension = dimension
+        self.calls = []
+
+    def encode(self, texts, **kwargs):
+        self.calls.append(list(texts))
+        vectors = [np.random.default_rng(abs(hash(text)) % 2 ** 32).normal(size=self.dimension) for text in texts]
+        return {'dense_vecs': np.asarray(vectors, dtype=np.float32)}
+
+
+def _embedder(model: CountingModel) -> "BGEEmbeddings":
+    """BGEEmbeddings sin cargar BGE-M3 (solo los atributos que usan las consultas)"""
+    embedder = BGEEmbeddings.__new__(BGEEmbeddings)
+    embedder.model = model
+    embedder.model_name = "fake"
+    embedder.max_length = 64
+    embedder._dimension = model.dimension
+    embedder.cache = None
+    embedder.query_cache = QueryEmbeddingCache(max_size=16, ttl_seconds=None)
+    embedder.query_batcher = None
+    return embedder
+
+
+def test_embedding_cache_reuses_vectors_and_recovers_torn_writes():
+    directory = tempfile.mkdtemp()
+    texts = ["Ingeniería Civil - Semestre I", "Bioingeniería\nCosto", "Perfil  ocupacional "]
+    vectors = np.random.default_rng(1).normal(size=(3, 8)).astype(np.float32)
+
+    cache = EmbeddingCache(directory, "fake", max_length=64, dimension=8)
+    cache.store(texts, vectors)
+    found, missing = cache.lookup(["Perfil ocupacional", "otro texto"])  # mismo texto normalizado
+    assert missing == [1] and np.array_equal(found[0], vectors[2])
+
+    # Escritura interrumpida: media fila sin clave y una clave sin fila
+    with open(cache._vectors_file, 'ab') as f:
+        f.write(b'\x00' * 12)
+    with open(cache._keys_file, 'a', encoding='utf-8') as f:
+        f.write(EmbeddingCache.text_key("huérfana") + "\n")
+
+    reopened = EmbeddingCache(directory, "fake", max_length=64, dimension=8)
+    assert len(reopened) == 3 and isinstance(reopened._vectors, np.memmap)
+    assert cache._vectors_file.stat().st_size == 3 * 8 * 4
+    found, missing = reopened.lookup(texts + ["huérfana"])
+    assert missing == [3] and np.array_equal(np.vstack([found[i] for i in range(3)]), vectors)
+
+    # Clave a medio escribir (sin "\n") con su fila ya escrita, seguida de otro store
+    with open(cache._vectors_file, 'ab') as f:
+        f.write(np.ones(8, dtype=np.float32).tobytes())
+    with open(cache._keys_file, 'a', encoding='utf-8') as f:
+        f.write(EmbeddingCache.text_key("cortada")[:20])
+    torn = EmbeddingCache(directory, "fake", max_length=64, dimension=8)
+    assert len(torn) == 3 and cache._keys_file.read_text().endswith("\n")
+    extra = np.random.default_rng(2).normal(size=(2, 8)).astype(np.float32)
+    torn.store(["nuevo uno", "nuevo dos"], extra)
+
+    reloaded = EmbeddingCache(directory, "fake", max_length=64, dimension=8)
+    found, missing = reloaded.lookup(texts + ["nuevo uno", "nuevo dos", "cortada"])
+    assert missing == [5] and len(reloaded) == 5
+    assert np.array_equal(np.vstack([found[i] for i in range(5)]), np.vstack([vectors, extra]))
+
+    # Otro modelo o dtype usa su propio namespace
+    assert len(EmbeddingCache(directory, "fake", max_length=64, dimension=8, dtype="float16")) == 0
+
+
+def test_query_cache_evicts_least_recent_and_expires_entries():
+    cache = QueryEmbeddingCache(max_size=2, ttl_seconds=None)
+    cache.put("¿Costo de civil?", np.ones(4))
+    cache.put("perfil de química", np.zeros(4))
+    assert cache.get("costo de civil") is not None  # normalizada y ahora la más reciente
+    cache.put("semestre 2 de sistemas", np.full(4, 2.0))
+
+    assert cache.get("perfil de química") is None
+    assert cache.get("COSTO DE CIVIL?") is not None
+    stats = cache.get_stats()
+    assert (stats['size'], stats['evictions'], stats['hits'], stats['misses']) == (2, 1, 2, 1)
+
+    expiring = QueryEmbeddingCache(max_size=4, ttl_seconds=0.05)
+    expiring.put("duración de bioingeniería", np.ones(4))
+    assert expiring.get("duración de bioingeniería") is not None
+    time.sleep(0.1)
+    assert expiring.get("duración de bioingeniería") is None
+    assert expiring.get_stats()['expirations'] == 1 and expiring.get_stats()['size'] == 0
+
+    assert QueryEmbeddingCache(max_size=0).get("x") is None
+
+
+def test_micro_batcher_coalesces_concurrent_calls():
+    batches = []
+    batcher = MicroBatcher(lambda items: (batches.append(list(items)), [i * 2 for i in items])[1],
+                           max_batch_size=8, max_wait_ms=200)
+    start = threading.Barrier(6)
+    results = {}
+
+    def call(i):
+        start.wait()
+        results[i] = batcher.process(i, timeout=5)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.close()
+
+    assert results == {i: i * 2 for i in range(6)}
+    assert len(batches) == 1 and sorted(batches[0]) == list(range(6))
+    assert batcher.get_stats()['largest_batch'] == 6
+
+
+def test_query_embeddings_count_one_miss_per_cold_query():
+    if not BGE_AVAILABLE:
+        pytest.skip("FlagEmbedding no instalado")
+
+    model = CountingModel()
+    embedder = _embedder(model)
+    first = embedder.embed_query("¿Cuánto cuesta Bioingeniería?")
+    again = embedder.embed_query("cuánto cuesta bioingeniería")
+    np.testing.assert_array_equal(first, again)
+    assert len(model.calls) == 1
+    stats = embedder.query_cache.get_stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+
+    # Con micro-batching: consultas concurrentes nuevas, un solo encode y un fallo por consulta
+    embedder.enable_query_batching(max_batch_size=8, max_wait_ms=200)
+    start = threading.Barrier(4)
+    threads = [threading.Thread(target=lambda q=q: (start.wait(), embedder.embed_query(q)))
+               for q in ["perfil de civil", "costo de química", "semestre 3 de sistemas", "materias de energías"]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    embedder.disable_query_batching()
+
+    assert len(model.calls) == 2 and len(model.calls[1]) == 4
+    stats = embedder.query_cache.get_stats()
+    assert (stats['hits'], stats['misses']) == (1, 5)
+
+
+if __name__ == "__main__":
+    for test in [test_embedding_cache_reuses_vectors_and_recovers_torn_writes,
+                 test_query_cache_evicts_least_recent_and_expires_entries,
+                 test_micro_batcher_coalesces_concurrent_calls,
+                 test_query_embeddings_count_one_miss_per_cold_query]:
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,101 @@
+"""
+Tests de los backends LLM (sin GPU ni red externa)
+El backend HTTP se prueba contra el servidor Ollama simulado local
+"""
+
+import sys
+sys.path.append('src')
+
+import contextlib
+import io
+import json
+import tempfile
+
+from src.llm.backends import FakeLLMBackend, OllamaBackend, create_llm_backend
+from src.llm.mock_server import MockOllamaServer
+from src.rag.intelligent_chunking import IntelligentCurriculumChunker
+
+CHUNKING_PROMPT = """
+PROGRAMA: Bioingeniería
+
+CONTENIDO:
+### Bioingeniería
+
+**Costo Matricula:** $5.100.000 (💰cop)
+
+**Perfil Ocupacional:** Diseño de dispositivos médicos.
+
+INSTRUCCIONES:
+1. ...
+"""
+
+
+def test_fake_backend_is_deterministic_chunk_plan():
+    backend = FakeLLMBackend()
+    first = backend.generate(CHUNKING_PROMPT)
+    assert first == backend.generate(CHUNKING_PROMPT)
+    assert ''.join(backend.stream(CHUNKING_PROMPT)) == first
+
+    plan = json.loads(first)
+    assert {c['type'] for c in plan['chunks']} >= {'fee', 'occupational_profile'}
+    assert all(c['metadata']['program_name'] == 'Bioingeniería' for c in plan['chunks'])
+
+
+def test_create_backend_by_name():
+    assert isinstance(create_llm_backend('fake'), FakeLLMBackend)
+    backend = create_llm_backend('ollama', base_url="http://127.0.0.1:1", model_name="mistral")
+    assert isinstance(backend, OllamaBackend)
+    assert not backend.is_available() and not backend.is_ready()
+
+    # Un modelo en proceso sin cargar no cuenta como listo para el modo "auto"
+    transformers_backend = create_llm_backend('transformers')
+    assert not transformers_backend.is_ready()
+    transformers_backend._pipeline = object()
+    assert transformers_backend.is_ready()
+
+
+def test_ollama_backend_against_mock_server_reuses_connections():
+    expected = FakeLLMBackend().generate(CHUNKING_PROMPT)
+
+    with MockOllamaServer() as server:
+        backend = OllamaBackend(model_name="fake-llm", base_url=server.base_url, pool_size=2)
+        assert backend.is_available() and backend.is_ready()
+
+        for _ in range(3):
+            assert backend.generate(CHUNKING_PROMPT) == expected
+        assert ''.join(backend.stream(CHUNKING_PROMPT)) == expected
+
+        batch = backend.generate_batch([CHUNKING_PROMPT, "otro prompt"])
+        assert batch[0]['text'] == expected and batch[0]['new_tokens'] > 0
+        assert json.loads(batch[1]['text'])['chunks']
+
+        # Cortar un stream a medias descarta esa conexión pero no rompe las siguientes
+        stream = backend.stream(CHUNKING_PROMPT)
+        next(stream)
+        stream.close()
+        assert backend.generate(CHUNKING_PROMPT) == expected
+
+        stats = backend.get_info()
+        assert stats['requests'] == 8
+        assert stats['connections_reused'] >= 4
+        assert server.stats['connections'] < server.stats['requests']
+
+
+def test_chunker_with_fake_backend_produces_llm_chunks():
+    with contextlib.redirect_stdout(io.StringIO()):
+        chunker = IntelligentCurriculumChunker(llm_backend=FakeLLMBackend(),
+                                               llm_cache_path=tempfile.mktemp(suffix=".sqlite"))
+        chunks = chunker.process_full_curriculum_parallel("data/documentos/Curriculums_Technology_Undergraduate.md")
+
+    assert chunker.stats['llm_chunks'] > 0
+    assert any(c['metadata'].get('llm_generated') for c in chunks)
+    assert any(c['metadata'].get('source') == 'structural_fallback' for c in chunks)
+
+
+if __name__ == "__main__":
+    for test in [test_fake_backend_is_deterministic_chunk_plan,
+                 test_create_backend_by_name,
+                 test_ollama_backend_against_mock_server_reuses_connections,
+                 test_chunker_with_fake_backend_produces_llm_chunks]:
+        test()
+        print(f"✅ {test.__name__}")
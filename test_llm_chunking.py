@@ -0,0 +1,178 @@
+"""
+Tests del chunking con LLM (sin modelos)
+Usa generadores falsos para verificar parseo en streaming, caché y lotes
+"""
+
+import sys
+sys.path.append('src')
+
+import contextlib
+import io
+import json
+import tempfile
+import threading
+
+from src.llm.backends import LLMBackend
+from src.rag.generation_scheduler import GenerationScheduler
+from src.rag.intelligent_chunking import IntelligentCurriculumChunker
+from src.rag.json_stream import StreamingJSONChunkParser
+from src.rag.llm_cache import LLMResponseCache
+
+LLM_JSON = json.dumps({'chunks': [
+    {'content': 'Costo: $5.298.134', 'type': 'fee', 'metadata': {'program_name': 'Ingeniería de Sistemas'}},
+    {'content': 'Perfil {con llaves} y "comillas"', 'type': 'occupational_profile', 'metadata': {}},
+]})
+
+
+def test_streaming_parser_emits_chunks_and_stops_at_top_level_close():
+    parser = StreamingJSONChunkParser()
+    text = "Eco previo sin JSON " + LLM_JSON + " texto sobrante {\"chunks\": []}"
+
+    emitted = []
+    for i in range(0, len(text), 7):
+        emitted.extend(parser.feed(text[i:i + 7]))
+
+    assert [c['type'] for c in emitted] == ['fee', 'occupational_profile']
+    assert parser.done
+    assert parser.result() == json.loads(LLM_JSON)
+    assert parser.consumed_text == LLM_JSON
+
+
+def test_streaming_parser_recovers_complete_chunks_from_truncated_output():
+    parser = StreamingJSONChunkParser()
+    truncated = LLM_JSON[:LLM_JSON.index('"occupational_profile"')]
+    assert [c['type'] for c in parser.feed(truncated)] == ['fee']
+    assert not parser.done and parser.result() is None
+
+
+class _JSONStreamBackend(LLMBackend):
+    name = "stub"
+
+    def __init__(self):
+        super().__init__("stub-model")
+        self.calls = []
+
+    def stream(self, prompt, stop_event=None, **params):
+        self.calls.append(prompt)
+        for i in range(0, len(LLM_JSON), 5):
+            yield LLM_JSON[i:i + 5]
+        yield " tokens que nunca deberían consumirse"
+
+
+def test_streaming_chunker_uses_cache_on_second_run():
+    backend = _JSONStreamBackend()
+    db_path = tempfile.mktemp(suffix=".sqlite")
+    for _ in range(2):
+        with contextlib.redirect_stdout(io.StringIO()):
+            chunker = IntelligentCurriculumChunker(llm_cache_path=db_path, llm_streaming=True, llm_backend=backend)
+            chunks = list(chunker.iter_llm_semantic_chunks("texto del programa", "Programa"))
+        assert [c['metadata']['type'] for c in chunks] == ['fee', 'occupational_profile']
+        assert all(c['metadata']['llm_generated'] for c in chunks)
+
+    assert len(backend.calls) == 1
+    assert chunker.stats['llm_cache_hits'] == 1
+
+
+def test_generation_scheduler_batches_concurrent_prompts():
+    batches = []
+
+    def fake_generate_batch(prompts, **params):
+        batches.append(list(prompts))
+        return [{'text': prompt.upper(), 'new_tokens': 3} for prompt in prompts]
+
+    scheduler = GenerationScheduler(fake_generate_batch, max_batch_size=4, max_wait_ms=200.0)
+    results = {}
+    barrier = threading.Barrier(4)
+
+    def worker(prompt):
+        barrier.wait()
+        results[prompt] = scheduler.generate(prompt)
+
+    threads = [threading.Thread(target=worker, args=(f"p{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    scheduler.close()
+
+    assert results == {f"p{i}": f"P{i}" for i in range(4)}
+    stats = scheduler.get_stats()
+    assert stats['prompts'] == 4 and stats['generated_tokens'] == 12
+    assert stats['batches'] < 4
+
+
+def test_generation_scheduler_preserves_submission_order():
+    batches = []
+
+    def fake_generate_batch(prompts, **params):
+        batches.append(list(prompts))
+        # Salidas de longitud variable: el padding no debe mezclar respuestas entre prompts
+        return [{'text': f"{prompt}:" + "x" * int(prompt[1:]), 'new_tokens': int(prompt[1:])} for prompt in prompts]
+
+    scheduler = GenerationScheduler(fake_generate_batch, max_batch_size=4, max_wait_ms=50.0)
+    prompts = [f"p{i}" for i in range(10)]
+    futures = [scheduler.submit(prompt) for prompt in prompts]
+    outputs = [future.result(timeout=5) for future in futures]
+    scheduler.close()
+
+    assert outputs == [f"p{i}:" + "x" * i for i in range(10)]
+    assert [prompt for batch in batches for prompt in batch] == prompts
+    assert max(len(batch) for batch in batches) <= 4
+    assert scheduler.get_stats()['generated_tokens'] == sum(range(10))
+
+
+def test_llm_cache_hits_persist_and_key_depends_on_model_and_params():
+    db_path = tempfile.mktemp(suffix=".sqlite")
+    params = {'max_tokens': 512, 'temperature': 0.1}
+
+    cache = LLMResponseCache(db_path)
+    assert cache.get("modelo-a", params, "prompt") is None
+    cache.put("modelo-a", params, "prompt", LLM_JSON)
+    assert cache.get("modelo-a", params, "prompt") == LLM_JSON
+    # El orden de los parámetros no cambia la clave
+    assert cache.get("modelo-a", {'temperature': 0.1, 'max_tokens': 512}, "prompt") == LLM_JSON
+
+    assert cache.get("modelo-b", params, "prompt") is None
+    assert cache.get("modelo-a", {**params, 'temperature': 0.7}, "prompt") is None
+    assert cache.get("modelo-a", params, "otro prompt") is None
+
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['writes'], stats['entries']) == (2, 4, 1, 1)
+    cache.close()
+
+    reopened = LLMResponseCache(db_path)
+    assert reopened.get("modelo-a", params, "prompt") == LLM_JSON
+    reopened.close()
+
+
+def test_program_chunks_stream_before_generation_finishes():
+    backend = _JSONStreamBackend()
+    sent = []
+    stream = backend.stream
+    backend.stream = lambda prompt, **params: (sent.append(f) or f for f in stream(prompt, **params))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        chunker = IntelligentCurriculumChunker(llm_cache_path=None, llm_streaming=True, llm_backend=backend)
+        chunks = chunker.iter_program_chunks("Costo Matricula: $5.298.134", "Ingeniería de Sistemas")
+        first = next(chunks)
+        assert first['metadata']['type'] == 'fee'
+        assert len(''.join(sent)) < len(LLM_JSON)  # el primer chunk sale antes de que termine el JSON
+        rest = list(chunks)
+
+    types = [c['metadata']['type'] for c in [first] + rest]
+    assert types[:2] == ['fee', 'occupational_profile']
+    # Los estructurales que el LLM no cubrió salen al final como fallback
+    assert all(c['metadata'].get('source') == 'structural_fallback' for c in rest[1:])
+    assert 'fee' not in types[2:]
+
+
+if __name__ == "__main__":
+    for test in [test_streaming_parser_emits_chunks_and_stops_at_top_level_close,
+                 test_streaming_parser_recovers_complete_chunks_from_truncated_output,
+                 test_streaming_chunker_uses_cache_on_second_run,
+                 test_program_chunks_stream_before_generation_finishes,
+                 test_generation_scheduler_batches_concurrent_prompts,
+                 test_generation_scheduler_preserves_submission_order,
+                 test_llm_cache_hits_persist_and_key_depends_on_model_and_params]:
+        test()
+        print(f"✅ {test.__name__}")
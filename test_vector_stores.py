@@ -0,0 +1,616 @@
+"""
+Tests de los backends de vector store (sin modelos)
+Usa embeddings sintéticos para verificar búsqueda, filtros y sincronización
+"""
+
+import sys
+sys.path.append('src')
+
+import os
+import json
+import tempfile
+
+import numpy as np
+import pytest
+
+from src.rag.colbert_reranker import ColbertIndexedStore, ColbertReranker
+from src.rag.faiss_vector_store import FAISS_AVAILABLE, FaissVectorStore
+from src.rag.ingestion_pipeline import IngestionPipeline
+from src.rag.numpy_vector_store import NumpyVectorStore
+from src.rag.sparse_index import SparseIndex, SparseIndexedStore, fuse_results
+from src.rag.store_utils import (ChunkIdAssigner, build_where, create_vector_store, make_chunk_ids,
+                                 search_with_wheres, sync_vector_store)
+from src.rag.vector_store import LocalVectorStore
+from src.utils import config
+
+
+def _sample_corpus(dimension: int = 32):
+    rng = np.random.default_rng(42)
+    texts = [
+        "Ingeniería de Sistemas\nCosto: $5.298.134 COP",
+        "Bioingeniería\nCosto: $5.100.000 COP",
+        "Ingeniería de Sistemas - Semestre I",
+        "Bioingeniería - Perfil Ocupacional",
+    ]
+    metadatas = [
+        {'type': 'fee', 'program_name': 'Ingeniería de Sistemas', 'fee_amount': 5298134},
+        {'type': 'fee', 'program_name': 'Bioingeniería', 'fee_amount': 5100000},
+        {'type': 'curriculum_semester', 'program_name': 'Ingeniería de Sistemas', 'semester_number': 'I'},
+        {'type': 'occupational_profile', 'program_name': 'Bioingeniería'},
+    ]
+    embeddings = rng.normal(size=(len(texts), dimension)).astype(np.float32)
+    return texts, metadatas, embeddings
+
+
+def test_numpy_store_exact_search():
+    texts, metadatas, embeddings = _sample_corpus()
+    vs = NumpyVectorStore("test_numpy", tempfile.mkdtemp())
+    assert vs.add_documents(texts, metadatas, embeddings)
+
+    results = vs.search(embeddings[2], n_results=2)
+    assert results['documents'][0] == texts[2]
+    assert abs(results['distances'][0]) < 1e-5
+    assert results['distances'] == sorted(results['distances'])
+
+
+def test_numpy_store_where_filters():
+    texts, metadatas, embeddings = _sample_corpus()
+    vs = NumpyVectorStore("test_numpy_where", tempfile.mkdtemp())
+    vs.add_documents(texts, metadatas, embeddings)
+
+    fees = vs.search(embeddings[2], n_results=10, where={'type': 'fee'})
+    assert {m['type'] for m in fees['metadatas']} == {'fee'}
+    assert len(fees['documents']) == 2
+
+    combined = vs.search(embeddings[0], n_results=10, where={
+        '$and': [{'type': 'fee'}, {'fee_amount': {'$lt': 5200000}}]
+    })
+    assert combined['ids'] == [make_chunk_ids(texts, metadatas)[1]]
+
+    assert vs.search(embeddings[0], where={'type': 'inexistente'})['documents'] == []
+
+
+def test_numpy_store_search_batch_matches_single():
+    texts, metadatas, embeddings = _sample_corpus()
+    vs = NumpyVectorStore("test_numpy_batch", tempfile.mkdtemp())
+    vs.add_documents(texts, metadatas, embeddings)
+
+    for where in [None, {'type': 'fee'}]:
+        batch = vs.search_batch(list(embeddings), n_results=3, where=where)
+        assert len(batch) == len(texts)
+        for query_embedding, results in zip(embeddings, batch):
+            single = vs.search(query_embedding, n_results=3, where=where)
+            assert results['ids'] == single['ids']
+            assert np.allclose(results['distances'], single['distances'], atol=1e-5)
+
+
+def test_chunk_ids_are_deterministic_and_sync_embeds_only_changes():
+    texts, metadatas, embeddings = _sample_corpus()
+    texts, metadatas = texts + [texts[0]], metadatas + [metadatas[0]]  # duplicado exacto
+    ids = make_chunk_ids(texts, metadatas)
+    assert ids == make_chunk_ids(texts, metadatas)
+    assert ids[4] == f"{ids[0]}~1" and ids[2].startswith("ingenieria-de-sistemas__curriculum_semester__semI__")
+
+    # Asignando lote a lote se obtienen los mismos IDs que sobre la lista completa
+    assigner = ChunkIdAssigner()
+    assert [assigner.assign(t, m) for t, m in zip(texts, metadatas)] == ids
+
+    embedded = []
+    def embed_fn(batch):
+        embedded.extend(batch)
+        return np.vstack([embeddings[texts.index(t) % len(embeddings)] if t in texts
+                          else np.ones(embeddings.shape[1], dtype=np.float32) for t in batch])
+
+    vs = LocalVectorStore("test_chroma_sync", tempfile.mkdtemp())
+    assert sync_vector_store(vs, texts, metadatas, embed_fn)['added'] == 5
+    assert vs.get_ids() == set(ids) and len(embedded) == 5
+
+    embedded.clear()
+    changed = texts[:1] + ["Bioingeniería\nCosto: $5.200.000 COP"] + texts[2:]
+    summary = sync_vector_store(vs, changed, metadatas, embed_fn)
+    assert (summary['added'], summary['deleted'], summary['unchanged']) == (1, 1, 4)
+    assert embedded == [changed[1]]
+    assert vs.get_ids() == set(make_chunk_ids(changed, metadatas))
+
+    embedded.clear()
+    assert sync_vector_store(vs, changed, metadatas, embed_fn)['added'] == 0 and embedded == []
+
+
+def test_numpy_store_persistence_and_sync():
+    texts, metadatas, embeddings = _sample_corpus()
+    directory = tempfile.mkdtemp()
+    embed_fn = lambda batch: np.vstack([embeddings[texts.index(t)] if t in texts
+                                        else np.ones(embeddings.shape[1], dtype=np.float32)
+                                        for t in batch])
+
+    vs = NumpyVectorStore("test_numpy_sync", directory)
+    summary = sync_vector_store(vs, texts, metadatas, embed_fn)
+    assert summary['added'] == 4 and summary['deleted'] == 0
+
+    changed_texts = texts[:3] + ["Bioingeniería - Perfil Ocupacional actualizado"]
+    summary = sync_vector_store(vs, changed_texts, metadatas, embed_fn)
+    assert (summary['added'], summary['deleted'], summary['unchanged']) == (1, 1, 3)
+
+    reloaded = NumpyVectorStore("test_numpy_sync", directory)
+    assert reloaded.get_ids() == set(make_chunk_ids(changed_texts, metadatas))
+    assert reloaded.count() == 4
+
+
+def test_faiss_store_matches_numpy():
+    pytest.importorskip("faiss")
+
+    texts, metadatas, embeddings = _sample_corpus()
+    directory = tempfile.mkdtemp()
+    exact = NumpyVectorStore("test_exact", directory)
+    exact.add_documents(texts, metadatas, embeddings)
+
+    for factory in ["Flat", "HNSW16"]:
+        vs = FaissVectorStore(f"test_faiss_{factory}", directory, index_factory=factory)
+        vs.add_documents(texts, metadatas, embeddings)
+
+        for where in [None, {'type': 'fee'}]:
+            expected = exact.search(embeddings[1], n_results=3, where=where)
+            found = vs.search(embeddings[1], n_results=3, where=where)
+            assert found['ids'] == expected['ids']
+            assert np.allclose(found['distances'], expected['distances'], atol=1e-4)
+
+        assert vs.delete_documents([expected['ids'][0]])
+        reloaded = FaissVectorStore(f"test_faiss_{factory}", directory, index_factory=factory)
+        assert reloaded.count() == len(texts) - 1
+        assert expected['ids'][0] not in reloaded.search(embeddings[1], n_results=4)['ids']
+
+
+def test_faiss_ivf_trains_once_on_buffered_batches():
+    pytest.importorskip("faiss")
+
+    rng = np.random.default_rng(11)
+    embeddings = rng.normal(size=(300, 32)).astype(np.float32)
+    texts = [f"Chunk {i}" for i in range(300)]
+    metadatas = [{'type': 'fee' if i % 2 else 'profile'} for i in range(300)]
+    chunks = ({'content': t, 'metadata': m} for t, m in zip(texts, metadatas))
+    directory = tempfile.mkdtemp()
+
+    # 64 listas > lotes de 32: sin acumular, el primer lote no alcanzaba para entrenar
+    vs = FaissVectorStore("test_faiss_ivf", directory, index_factory="IVF64,Flat", nprobe=64)
+    summary = IngestionPipeline(vs, lambda batch: embeddings[[texts.index(t) for t in batch]],
+                                batch_size=32).run(chunks)
+    assert summary['success'] and vs.get_stats()['is_trained']
+    assert vs.get_stats()['pending_vectors'] == 0
+    ids = make_chunk_ids(texts, metadatas)
+    assert vs.search(embeddings[5], n_results=1, where={'type': 'fee'})['ids'] == [ids[5]]
+
+    # Por debajo del mínimo los vectores quedan acumulados, con búsqueda exacta y persistencia
+    small = FaissVectorStore("test_faiss_small", directory, index_factory="IVF64,Flat")
+    assert small.add_documents(texts[:10], metadatas[:10], embeddings[:10])
+    assert small.get_stats()['pending_vectors'] == 10
+    reloaded = FaissVectorStore("test_faiss_small", directory, index_factory="IVF64,Flat")
+    assert reloaded.search(embeddings[3], n_results=2)['ids'][0] == ids[3]
+
+
+def test_faiss_trained_indexes_survive_deletes_upserts_and_filters():
+    pytest.importorskip("faiss")
+
+    rng = np.random.default_rng(5)
+    embeddings = rng.normal(size=(600, 32)).astype(np.float32)
+    texts = [f"Chunk {i}" for i in range(600)]
+    metadatas = [{'type': 'fee' if i % 2 else 'profile'} for i in range(600)]
+    ids = [f"id{i}" for i in range(600)]
+    directory = tempfile.mkdtemp()
+
+    for factory in ["IVF8,Flat", "PQ4x4", "HNSW16,PQ4x4"]:
+        vs = FaissVectorStore(f"test_faiss_{factory.replace(',', '_')}", directory, index_factory=factory, nprobe=8)
+        assert vs.add_documents(texts, metadatas, embeddings, ids=ids)
+        assert vs.get_stats()['is_trained']
+        if factory == "HNSW16,PQ4x4":
+            # PQ dentro de HNSW también entrena con 2^nbits centroides por subespacio
+            vs.index_factory = "HNSW16,PQ8"
+            assert vs._training_points() == (256, 39 * 256)
+            vs.index_factory = factory
+
+        # Dos borrados seguidos y un upsert: los IDs siguen apuntando a sus vectores
+        assert vs.delete_documents(["id10", "id11"]) and vs.delete_documents(["id12"])
+        assert vs.upsert_documents(["Chunk 50 v2"], [metadatas[50]], embeddings[50:51], ids=["id50"])
+        found = vs.search_batch([embeddings[i] for i in (50, 51, 52, 53)], n_results=1)
+        assert [r['ids'][0] for r in found] == ["id50", "id51", "id52", "id53"]
+        assert found[0]['documents'] == ["Chunk 50 v2"] and vs.count() == 597
+
+        # Con filtro (IndexPQ no admite selectores: se filtra después de buscar)
+        filtered = vs.search(embeddings[51], n_results=3, where={'type': 'fee'})
+        assert filtered['ids'][0] == "id51" and len(filtered['ids']) == 3
+        assert all(m['type'] == 'fee' for m in filtered['metadatas'])
+
+    # Si el entrenamiento falla, los documentos no quedan registrados
+    vs = FaissVectorStore("test_faiss_rollback", directory, index_factory="IVF8,Flat")
+    def failing_train(vectors):
+        raise RuntimeError("entrenamiento fallido")
+    with vs.deferred_writes():
+        vs.index = vs._new_index(32)
+        vs.index.train = failing_train
+        assert not vs.add_documents(texts[:400], metadatas[:400], embeddings[:400], ids=ids[:400])
+    assert vs.count() == 0 and vs.get_ids() == set() and vs.get_stats()['pending_vectors'] == 0
+
+
+def test_numpy_store_defers_saves_inside_ingest():
+    rng = np.random.default_rng(3)
+    embeddings = rng.normal(size=(200, 16)).astype(np.float32)
+    texts = [f"Chunk {i}" for i in range(200)]
+    metadatas = [{'type': 'fee' if i % 2 else 'profile'} for i in range(200)]
+    directory = tempfile.mkdtemp()
+    embeddings_file = f"{directory}/test_deferred_numpy/embeddings.npy"
+
+    vs = NumpyVectorStore("test_deferred", directory)
+    with vs.deferred_writes():
+        for start in range(0, 200, 20):
+            assert vs.upsert_documents(texts[start:start + 20], metadatas[start:start + 20],
+                                       embeddings[start:start + 20])
+            # Cada lote es consultable (también con filtro) antes de guardar
+            last = start + 19
+            assert vs.search(embeddings[last], n_results=1, where={'type': 'fee'})['ids'] == \
+                [make_chunk_ids(texts, metadatas)[last]]
+        assert not os.path.exists(embeddings_file)
+        assert len(vs._matrix_buffer) < 2 * 200  # capacidad duplicada, no una copia por lote
+    assert os.path.exists(embeddings_file)
+
+    reloaded = NumpyVectorStore("test_deferred", directory)
+    assert reloaded.get_ids() == vs.get_ids()
+    np.testing.assert_allclose(reloaded._matrix, vs._matrix)
+
+
+def test_ingestion_pipeline_streams_batches_and_syncs():
+    texts, metadatas, embeddings = _sample_corpus()
+    texts, metadatas = texts + [texts[0]], metadatas + [metadatas[0]]  # duplicado exacto
+    embed_fn = lambda batch: np.vstack([embeddings[texts.index(t) % len(embeddings)] for t in batch])
+    chunks = ({'content': t, 'metadata': m} for t, m in zip(texts, metadatas))
+
+    vs = NumpyVectorStore("test_pipeline", tempfile.mkdtemp())
+    summary = IngestionPipeline(vs, embed_fn, batch_size=2, queue_size=1).run(chunks)
+    assert summary['success'] and summary['batches'] == 3
+    assert summary['time_to_first_write'] <= summary['total_time']
+    assert vs.get_ids() == set(make_chunk_ids(texts, metadatas))
+
+    changed_texts = texts[:3] + ["Bioingeniería - Perfil Ocupacional actualizado", texts[4]]
+    chunks = ({'content': t, 'metadata': m} for t, m in zip(changed_texts, metadatas))
+    embed_fn = lambda batch: np.ones((len(batch), embeddings.shape[1]), dtype=np.float32)
+    summary = IngestionPipeline(vs, embed_fn, batch_size=2, incremental=True).run(chunks)
+    assert (summary['chunks_written'], summary['chunks_unchanged'], summary['deleted']) == (1, 4, 1)
+    assert vs.get_ids() == set(make_chunk_ids(changed_texts, metadatas))
+
+    failing = IngestionPipeline(vs, lambda batch: 1 / 0, batch_size=1)
+    assert not failing.run({'content': t, 'metadata': m} for t, m in zip(texts, metadatas))['success']
+
+
+def test_chroma_store_writes_in_bounded_batches():
+    rng = np.random.default_rng(7)
+    texts = [f"Asignatura {i}" for i in range(23)]
+    metadatas = [{'type': 'subject', 'program_name': f"Programa {i % 3}"} for i in range(23)]
+    embeddings = rng.normal(size=(23, 16)).astype(np.float32)
+
+    for workers in (1, 3):
+        vs = LocalVectorStore(f"test_chroma_batches_{workers}", tempfile.mkdtemp(),
+                              write_batch_size=5, write_workers=workers)
+        assert vs.add_documents(texts, metadatas, embeddings)
+        assert vs.count() == 23
+        assert vs.stats['last_write']['batches'] == 5
+
+        assert vs.upsert_documents(texts[:6], metadatas[:6], embeddings[:6])
+        assert vs.count() == 23 and vs.stats['write_batches'] == 7
+
+        results = vs.search(embeddings[17], n_results=1)
+        assert results['documents'] == [texts[17]]
+
+
+def test_chroma_store_keeps_facets_in_memory():
+    texts, metadatas, embeddings = _sample_corpus()
+    directory = tempfile.mkdtemp()
+    vs = LocalVectorStore("test_chroma_facets", directory)
+    vs.add_documents(texts, metadatas, embeddings)
+
+    stats = vs.get_stats()
+    assert stats['total_documents'] == 4
+    assert stats['type_counts'] == {'fee': 2, 'curriculum_semester': 1, 'occupational_profile': 1}
+    assert stats['program_counts'] == {'Ingeniería de Sistemas': 2, 'Bioingeniería': 2}
+
+    ids = make_chunk_ids(texts, metadatas)
+    vs.upsert_documents([texts[0]], [{'type': 'program_summary', 'program_name': 'Ingeniería de Sistemas'}],
+                        embeddings[:1], ids=[ids[0]])
+    vs.delete_documents([ids[1]])
+    assert vs.get_stats()['type_counts'] == {'program_summary': 1, 'curriculum_semester': 1, 'occupational_profile': 1}
+
+    reopened = LocalVectorStore("test_chroma_facets", directory)
+    assert reopened.get_ids() == vs.get_ids() == set(ids) - {ids[1]}
+    assert reopened.get_stats()['program_counts'] == {'Ingeniería de Sistemas': 2, 'Bioingeniería': 1}
+
+    reopened.clear_collection()
+    assert reopened.count() == 0 and reopened.get_stats()['document_types'] == []
+
+
+def test_search_with_per_query_program_filters():
+    texts, metadatas, embeddings = _sample_corpus()
+    vs = NumpyVectorStore("test_numpy_wheres", tempfile.mkdtemp())
+    vs.add_documents(texts, metadatas, embeddings)
+
+    assert build_where() is None
+    assert build_where('fee') == {'type': 'fee'}
+    wheres = [build_where('fee', 'Bioingeniería'), None, build_where(None, 'Ingeniería de Sistemas')]
+    assert wheres[0] == {'$and': [{'type': 'fee'}, {'program_name': 'Bioingeniería'}]}
+
+    results = search_with_wheres(vs, [embeddings[0], embeddings[3], embeddings[1]], wheres, n_results=4)
+    assert results[0]['documents'] == [texts[1]]
+    assert results[1]['documents'][0] == texts[3] and len(results[1]['documents']) == 4
+    assert {m['program_name'] for m in results[2]['metadatas']} == {'Ingeniería de Sistemas'}
+
+
+def test_search_with_wheres_merges_program_filters_into_one_search():
+    rng = np.random.default_rng(7)
+    programs = ['Bioingeniería', 'Ingeniería de Sistemas', 'Derecho', 'Medicina']
+    metadatas = [{'program_name': programs[i % 4], 'type': 'fee' if i % 3 == 0 else 'curriculum_semester'}
+                 for i in range(120)]
+    texts = [f"chunk {i}" for i in range(120)]
+    embeddings = rng.normal(size=(120, 16)).astype(np.float32)
+    queries = [embeddings[0], embeddings[1], embeddings[3], embeddings[3] + 0.01, embeddings[5]]
+    wheres = [build_where(None, programs[0]), build_where(None, programs[1]), build_where(None, programs[2]),
+              build_where(None, programs[3]), build_where('fee', programs[1])]
+
+    for vs in (NumpyVectorStore("test_numpy_merge", tempfile.mkdtemp()),
+               LocalVectorStore("test_chroma_merge", tempfile.mkdtemp())):
+        vs.add_documents(texts, metadatas, embeddings)
+        expected = [vs.search_batch([query], n_results=3, where=where)[0] for query, where in zip(queries, wheres)]
+
+        calls = []
+        search_batch = vs.search_batch
+        vs.search_batch = lambda queries, **kwargs: calls.append(kwargs['where']) or search_batch(queries, **kwargs)
+        results = search_with_wheres(vs, queries, wheres, n_results=3)
+
+        assert [r['ids'] for r in results] == [e['ids'] for e in expected]
+        assert calls[0] == {'program_name': {'$in': sorted(programs)}}
+        # Búsqueda conjunta + 'fee' + reintentos solo para programas desplazados del top conjunto
+        assert build_where('fee', programs[1]) in calls and len(calls) < len(queries)
+        assert all('$in' not in json.dumps(where) for where in calls[1:])
+
+
+def test_hybrid_search_keeps_sparse_index_in_sync():
+    texts, metadatas, embeddings = _sample_corpus()
+    directory = tempfile.mkdtemp()
+    vs = SparseIndexedStore(NumpyVectorStore("test_hybrid", directory), SparseIndex(f"{directory}/sparse"))
+    vs.add_documents(texts, metadatas, embeddings)
+    assert len(vs.sparse_index) == vs.count() == 4
+
+    # Una consulta léxica encuentra el chunk aunque el embedding apunte a otro
+    sparse = vs.sparse_index.search("perfil ocupacional bioingenieria", n_results=2)
+    assert sparse['documents'][0] == texts[3] and sparse['distances'][0] == 0.0
+    hybrid = vs.search_hybrid("perfil ocupacional", embeddings[0], n_results=2)
+    assert set(hybrid['documents']) == {texts[0], texts[3]}
+
+    filtered = vs.search_hybrid("costo", embeddings[2], n_results=4, where={'type': 'fee'})
+    assert {m['type'] for m in filtered['metadatas']} == {'fee'}
+
+    fused = fuse_results({'ids': ['a', 'b'], 'documents': ['A', 'B'], 'metadatas': [{}, {}], 'distances': [0.1, 0.2]},
+                         {'ids': ['b'], 'documents': ['B'], 'metadatas': [{}], 'distances': [0.0], 'scores': [3.0]})
+    assert fused['ids'] == ['b', 'a'] and fused['distances'] == sorted(fused['distances'])
+
+    ids = make_chunk_ids(texts, metadatas)
+    vs.delete_documents([ids[3]])
+    assert vs.sparse_index.search("perfil ocupacional", n_results=2)['documents'] == []
+    assert len(SparseIndex(f"{directory}/sparse")) == 3
+
+    vs.clear_collection()
+    assert len(vs.sparse_index) == 0
+
+
+def test_sparse_index_saves_once_per_ingest():
+    texts, metadatas, embeddings = _sample_corpus()
+    directory = tempfile.mkdtemp()
+    sparse_index = SparseIndex(f"{directory}/sparse")
+    saves = []
+    save = sparse_index._save
+    sparse_index._save = lambda: (saves.append(len(sparse_index)), save())[1]
+    vs = SparseIndexedStore(NumpyVectorStore("test_sparse_deferred", directory), sparse_index)
+
+    embed_fn = lambda batch: np.vstack([embeddings[texts.index(t)] for t in batch])
+    chunks = ({'content': t, 'metadata': m} for t, m in zip(texts, metadatas))
+    summary = IngestionPipeline(vs, embed_fn, batch_size=1).run(chunks)
+    assert summary['success'] and summary['batches'] == 4
+    assert saves == [4]  # un solo guardado al terminar, no uno por lote
+
+    reloaded = SparseIndex(f"{directory}/sparse")
+    assert reloaded._ids == sparse_index._ids
+    assert reloaded.search("perfil ocupacional", n_results=1)['documents'] == [texts[3]]
+
+    # Fuera de un bloque diferido cada escritura se guarda de inmediato
+    vs.delete_documents([make_chunk_ids(texts, metadatas)[3]])
+    assert saves == [4, 3] and len(SparseIndex(f"{directory}/sparse")) == 3
+
+
+def test_colbert_reranker_reorders_by_maxsim():
+    texts, metadatas, embeddings = _sample_corpus()
+    ids = make_chunk_ids(texts, metadatas)
+    rng = np.random.default_rng(7)
+    vocabulary = {}
+
+    def colbert_fn(batch):
+        # Un vector aleatorio fijo por palabra: MaxSim premia las palabras compartidas
+        vectors = []
+        for text in batch:
+            words = text.lower().split()
+            for word in words:
+                vocabulary.setdefault(word, rng.normal(size=32).astype(np.float32))
+            matrix = np.stack([vocabulary[word] for word in words])
+            vectors.append(matrix / np.linalg.norm(matrix, axis=1, keepdims=True))
+        return vectors
+
+    for pq_subspaces in (None, 8):
+        directory = tempfile.mkdtemp()
+        vs = ColbertIndexedStore(NumpyVectorStore("test_colbert", directory),
+                                 ColbertReranker(f"{directory}/colbert", dimension=32, pq_subspaces=pq_subspaces),
+                                 colbert_fn=colbert_fn)
+        vs.add_documents(texts, metadatas, embeddings)
+        assert len(vs.reranker) == 4
+
+        # El denso pone primero el chunk 0; MaxSim sube el semestre de Sistemas
+        candidates = vs.search(embeddings[0], n_results=4)
+        reranked = vs.rerank("ingeniería de sistemas - semestre i", candidates, n_results=2)
+        assert reranked['ids'][0] == ids[2] and len(reranked['ids']) == 2
+        assert reranked['distances'] == sorted(reranked['distances'])
+
+        vs.upsert_documents(texts[:2], metadatas[:2], embeddings[:2], ids=ids[:2])
+        vs.delete_documents([ids[3]])
+        reopened = ColbertReranker(f"{directory}/colbert", dimension=32, pq_subspaces=pq_subspaces)
+        assert len(reopened) == 3 and ids[3] not in reopened
+        assert np.isinf(reopened.maxsim(colbert_fn(["bioingeniería"])[0], [ids[3]])[0])
+
+        vs.clear_collection()
+        assert len(vs.reranker) == 0 and vs.reranker.get_stats()['file_bytes'] == 0
+
+
+def test_numpy_store_quantized_search_matches_float32():
+    rng = np.random.default_rng(3)
+    embeddings = rng.normal(size=(300, 64)).astype(np.float32)
+    texts = [f"doc {i}" for i in range(300)]
+    metadatas = [{'type': 'fee' if i % 3 == 0 else 'profile'} for i in range(300)]
+    queries = list(embeddings[:20] + rng.normal(scale=0.1, size=(20, 64)).astype(np.float32))
+
+    exact = NumpyVectorStore("test_exact", tempfile.mkdtemp())
+    exact.add_documents(texts, metadatas, embeddings)
+    expected = [r['ids'] for r in exact.search_batch(queries, n_results=5)]
+    expected_fee = [r['ids'] for r in exact.search_batch(queries, n_results=5, where={'type': 'fee'})]
+
+    for quantization in ("float16", "int8", "binary"):
+        directory = tempfile.mkdtemp()
+        vs = NumpyVectorStore("test_quantized", directory, quantization=quantization, rescore_factor=10)
+        vs.add_documents(texts, metadatas, embeddings)
+        assert vs.get_stats()['memory_bytes'] < exact.get_stats()['memory_bytes']
+
+        # Con rescoring exacto: top-5 idéntico a float32; binario (64 bits) al menos el top-1
+        results = vs.search_batch(queries, n_results=5)
+        fee_results = vs.search_batch(queries, n_results=5, where={'type': 'fee'})
+        if quantization == "binary":
+            assert [r['ids'][0] for r in results] == [ids[0] for ids in expected]
+            assert [r['ids'][0] for r in fee_results] == [ids[0] for ids in expected_fee]
+        else:
+            assert [r['ids'] for r in results] == expected
+            assert [r['ids'] for r in fee_results] == expected_fee
+        assert {m['type'] for r in fee_results for m in r['metadatas']} == {'fee'}
+        np.testing.assert_allclose(results[0]['distances'][0], exact.search(queries[0], n_results=1)['distances'][0], atol=1e-5)
+
+        # Escrituras sobre el float32 mapeado en memoria y recarga desde disco
+        ids = make_chunk_ids(texts, metadatas)
+        vs.upsert_documents(texts[:1], metadatas[:1], embeddings[1:2], ids=ids[:1])
+        vs.delete_documents([ids[2]])
+        reopened = NumpyVectorStore("test_quantized", directory, quantization=quantization)
+        assert reopened.count() == 299 and reopened.search(embeddings[1], n_results=2)['ids'][0] in ids[:2]
+
+        # Ingesta por lotes: solo se codifican las filas nuevas y al final los códigos
+        # coinciden con cuantizar la colección completa (int8 reajusta la escala en flush)
+        streamed = NumpyVectorStore("test_streamed", tempfile.mkdtemp(), quantization=quantization)
+        with streamed.deferred_writes():
+            for start in range(0, 300, 32):
+                streamed.upsert_documents(texts[start:start + 32], metadatas[start:start + 32],
+                                          embeddings[start:start + 32])
+        full_codes = streamed._codes.copy()
+        streamed._quantize()
+        np.testing.assert_array_equal(full_codes, streamed._codes)
+
+
+def test_numpy_store_pca_projection_with_rescoring():
+    rng = np.random.default_rng(5)
+    # Corpus con estructura de baja dimensión, como embeddings reales agrupados por tema
+    basis = rng.normal(size=(12, 64)).astype(np.float32)
+    embeddings = rng.normal(size=(400, 12)).astype(np.float32) @ basis + rng.normal(
+        scale=0.05, size=(400, 64)).astype(np.float32)
+    texts = [f"doc {i}" for i in range(400)]
+    metadatas = [{'type': 'fee' if i % 2 else 'profile'} for i in range(400)]
+    directory = tempfile.mkdtemp()
+
+    vs = NumpyVectorStore("test_pca", directory, projection_dim=16, rescore_factor=5)
+    vs.add_documents(texts, metadatas, embeddings)
+    stats = vs.get_stats()
+    assert stats['projection_dim'] == 16 and stats['explained_variance'] > 0.95
+    assert stats['memory_bytes'] < embeddings.nbytes / 3
+
+    report = vs.recall_report(n_results=10, sample=50)
+    assert report['recall'] >= 0.98 and report['queries'] == 50
+    filtered = vs.search(embeddings[1], n_results=3, where={'type': 'fee'})
+    assert filtered['ids'][0] == make_chunk_ids(texts, metadatas)[1]
+
+    # La proyección se guarda con el índice y se reutiliza al recargar
+    reopened = NumpyVectorStore("test_pca", directory, projection_dim=16)
+    np.testing.assert_array_equal(reopened._projection['components'], vs._projection['components'])
+    assert reopened.search(embeddings[7], n_results=1)['ids'] == vs.search(embeddings[7], n_results=1)['ids']
+
+    # Con menos documentos que dimensiones proyectadas se busca en dimensión completa
+    small = NumpyVectorStore("test_pca_small", tempfile.mkdtemp(), projection_dim=16)
+    small.add_documents(texts[:8], metadatas[:8], embeddings[:8])
+    assert small.get_stats()['projection_dim'] is None
+    assert small.recall_report(n_results=3)['recall'] == 1.0
+
+    # Ingesta por lotes: la PCA se ajusta una sola vez, al terminar, sobre toda la colección
+    streamed = NumpyVectorStore("test_pca_streamed", tempfile.mkdtemp(), projection_dim=16)
+    fits = []
+    fit_projection = streamed._fit_projection
+    streamed._fit_projection = lambda: (fits.append(streamed.count()), fit_projection())
+    with streamed.deferred_writes():
+        for start in range(0, 400, 32):
+            streamed.upsert_documents(texts[start:start + 32], metadatas[start:start + 32],
+                                      embeddings[start:start + 32])
+    assert fits == [400]
+    assert streamed.recall_report(n_results=10, sample=50)['recall'] >= 0.98
+
+
+def test_create_vector_store_uses_config_defaults():
+    saved = (config.VECTORSTORE_BACKEND, config.FAISS_INDEX_FACTORY, config.FAISS_NPROBE,
+             config.CHROMA_WRITE_WORKERS, config.NUMPY_QUANTIZATION, config.NUMPY_PROJECTION_DIM)
+    try:
+        config.VECTORSTORE_BACKEND = "numpy"
+        store = create_vector_store(collection_name="test_config_default", persist_directory=tempfile.mkdtemp())
+        assert isinstance(store, NumpyVectorStore)
+
+        config.NUMPY_QUANTIZATION = "int8"
+        store = create_vector_store("numpy", "test_config_int8", tempfile.mkdtemp())
+        assert store.quantization == "int8" and store.rescore_factor == config.NUMPY_RESCORE_FACTOR
+
+        # Con int8 configurado, una proyección explícita reemplaza la cuantización (y viceversa)
+        store = create_vector_store("numpy", "test_config_pca", tempfile.mkdtemp(), projection_dim=8)
+        assert (store.projection_dim, store.quantization) == (8, "float32")
+        config.NUMPY_QUANTIZATION, config.NUMPY_PROJECTION_DIM = "float32", 8
+        assert create_vector_store("numpy", "test_config_pca2", tempfile.mkdtemp()).projection_dim == 8
+        store = create_vector_store("numpy", "test_config_binary", tempfile.mkdtemp(), quantization="binary")
+        assert (store.projection_dim, store.quantization) == (None, "binary")
+
+        config.CHROMA_WRITE_WORKERS = 3
+        store = create_vector_store("chroma", "test_config_chroma", tempfile.mkdtemp())
+        assert store.write_workers == 3
+
+        if FAISS_AVAILABLE:
+            config.FAISS_INDEX_FACTORY, config.FAISS_NPROBE = "IVF4,Flat", 3
+            store = create_vector_store("faiss", "test_config_faiss", tempfile.mkdtemp())
+            assert (store.index_factory, store.nprobe) == ("IVF4,Flat", 3)
+            # Las opciones explícitas tienen prioridad
+            assert create_vector_store("faiss", "test_config_hnsw", tempfile.mkdtemp(), nprobe=5).nprobe == 5
+    finally:
+        (config.VECTORSTORE_BACKEND, config.FAISS_INDEX_FACTORY, config.FAISS_NPROBE,
+         config.CHROMA_WRITE_WORKERS, config.NUMPY_QUANTIZATION, config.NUMPY_PROJECTION_DIM) = saved
+
+
+if __name__ == "__main__":
+    for test in [test_chunk_ids_are_deterministic_and_sync_embeds_only_changes,
+                 test_numpy_store_exact_search,
+                 test_numpy_store_where_filters,
+                 test_numpy_store_search_batch_matches_single,
+                 test_numpy_store_persistence_and_sync,
+                 test_faiss_trained_indexes_survive_deletes_upserts_and_filters,
+                 test_numpy_store_defers_saves_inside_ingest,
+                 test_faiss_store_matches_numpy,
+                 test_faiss_ivf_trains_once_on_buffered_batches,
+                 test_ingestion_pipeline_streams_batches_and_syncs,
+                 test_chroma_store_writes_in_bounded_batches,
+                 test_chroma_store_keeps_facets_in_memory,
+                 test_search_with_per_query_program_filters,
+                 test_search_with_wheres_merges_program_filters_into_one_search,
+                 test_hybrid_search_keeps_sparse_index_in_sync,
+                 test_sparse_index_saves_once_per_ingest,
+                 test_colbert_reranker_reorders_by_maxsim,
+                 test_numpy_store_quantized_search_matches_float32,
+                 test_numpy_store_pca_projection_with_rescoring,
+                 test_create_vector_store_uses_config_defaults]:
+        test()
+        print(f"✅ {test.__name__}")